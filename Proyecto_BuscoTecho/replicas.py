@@ -0,0 +1,118 @@
+"""
+Ruteo de lecturas a réplicas de la base de datos.
+
+Las vistas de consulta marcadas con @lectura_en_replica (listado, detalle,
+autocompletado, perfil) leen de una de las réplicas de DATABASE_REPLICAS; todo
+lo demás, y todas las escrituras, van a 'default'.
+
+Para que el usuario vea enseguida lo que acaba de escribir (aunque la réplica
+esté atrasada), toda petición que escribe deja la cookie COOKIE_PRIMARIA por
+DATABASE_REPLICAS_RETRASO segundos; mientras esté presente sus lecturas van a
+'default'. Dentro de una misma petición, después de la primera escritura las
+lecturas también pasan a 'default'.
+"""
+import contextlib
+import contextvars
+import functools
+import random
+from django.conf import settings
+
+COOKIE_PRIMARIA = 'db_primaria'
+
+# Se leen siempre de 'default': una sesión recién creada puede no estar en la réplica
+APPS_SOLO_PRIMARIA = {'sessions'}
+
+# Escrituras que no fijan la primaria: SessionMiddleware guarda la sesión cada
+# vez que se modifica (un mensaje, un dato recordado), y como las sesiones ya se
+# leen siempre de 'default' no hace falta fijar a ese usuario por eso.
+APPS_ESCRITURA_AJENA = {'sessions'}
+
+# Estado de la petición en curso: {'replica': alias o None, 'escribio', 'fijada', 'ajena': bool}
+_estado = contextvars.ContextVar('estado_replicas', default=None)
+
+
+class RouterReplicas:
+    """Router de settings.DATABASE_ROUTERS"""
+
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if estado and estado['replica'] and not estado['escribio'] and model._meta.app_label not in APPS_SOLO_PRIMARIA:
+            return estado['replica']
+        return None
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None and not estado['ajena'] and model._meta.app_label not in APPS_ESCRITURA_AJENA:
+            estado['escribio'] = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Las réplicas son copias de 'default': los objetos pueden relacionarse
+        return True
+
+
+class ReplicasMiddleware:
+    """Inicia el estado por petición y fija la primaria después de una escritura"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        estado = {
+            'replica': None,
+            'escribio': False,
+            'fijada': COOKIE_PRIMARIA in request.COOKIES,
+            'ajena': False,
+        }
+        token = _estado.set(estado)
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado.reset(token)
+
+        if estado['escribio'] and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                COOKIE_PRIMARIA, '1',
+                max_age=settings.DATABASE_REPLICAS_RETRASO,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+def lectura_en_replica(vista):
+    """Las lecturas de la vista (GET/HEAD) van a una réplica, salvo que la primaria esté fijada"""
+    @functools.wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        estado = _estado.get()
+        if (
+            estado is None
+            or estado['fijada']
+            or not settings.DATABASE_REPLICAS
+            or request.method not in ('GET', 'HEAD')
+        ):
+            return vista(request, *args, **kwargs)
+
+        estado['replica'] = random.choice(settings.DATABASE_REPLICAS)
+        try:
+            return vista(request, *args, **kwargs)
+        finally:
+            estado['replica'] = None
+    return envoltura
+
+
+@contextlib.contextmanager
+def escritura_ajena():
+    """
+    Escrituras que no son del usuario (ej. el volcado del contador de vistas):
+    no fijan la primaria para quien hizo la petición.
+    """
+    estado = _estado.get()
+    if estado is None:
+        yield
+        return
+    anterior = estado['ajena']
+    estado['ajena'] = True
+    try:
+        yield
+    finally:
+        estado['ajena'] = anterior
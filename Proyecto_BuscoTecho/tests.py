@@ -0,0 +1,66 @@
+from django.contrib.sessions.models import Session
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from propiedades.models import Propiedad
+
+from .replicas import COOKIE_PRIMARIA, ReplicasMiddleware, RouterReplicas, escritura_ajena, lectura_en_replica
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], DATABASE_REPLICAS_RETRASO=10)
+class ReplicasTests(SimpleTestCase):
+    """Lecturas en réplica y fijación de la primaria después de escribir (ver replicas.py)"""
+
+    router = RouterReplicas()
+
+    def _pedir(self, escribir=None, cookies=None):
+        """GET a una vista en réplica; retorna (respuesta, alias de lectura antes y después de escribir)"""
+        lecturas = []
+
+        @lectura_en_replica
+        def vista(request):
+            lecturas.append(self.router.db_for_read(Propiedad))
+            if escribir:
+                escribir()
+            lecturas.append(self.router.db_for_read(Propiedad))
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        return ReplicasMiddleware(vista)(request), lecturas
+
+    def test_lee_de_la_replica_sin_escrituras(self):
+        respuesta, lecturas = self._pedir()
+        self.assertEqual(lecturas, ['replica1', 'replica1'])
+        self.assertNotIn(COOKIE_PRIMARIA, respuesta.cookies)
+
+    def test_escritura_fija_la_primaria(self):
+        respuesta, lecturas = self._pedir(lambda: self.router.db_for_write(Propiedad))
+        # Dentro de la petición las lecturas posteriores ya van a la primaria...
+        self.assertEqual(lecturas, ['replica1', None])
+        # ...y la cookie las mantiene ahí en las próximas
+        self.assertEqual(respuesta.cookies[COOKIE_PRIMARIA]['max-age'], 10)
+
+        _, lecturas = self._pedir(cookies={COOKIE_PRIMARIA: '1'})
+        self.assertEqual(lecturas, [None, None])
+
+    def test_escrituras_ajenas_no_fijan(self):
+        def escribir():
+            self.router.db_for_write(Session)
+            with escritura_ajena():
+                self.router.db_for_write(Propiedad)
+
+        respuesta, lecturas = self._pedir(escribir)
+        self.assertEqual(lecturas, ['replica1', 'replica1'])
+        self.assertNotIn(COOKIE_PRIMARIA, respuesta.cookies)
+
+    def test_sesiones_siempre_de_la_primaria(self):
+        lecturas = []
+
+        @lectura_en_replica
+        def vista(request):
+            lecturas.append(self.router.db_for_read(Session))
+            return HttpResponse()
+
+        ReplicasMiddleware(vista)(RequestFactory().get('/'))
+        self.assertEqual(lecturas, [None])
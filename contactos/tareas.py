@@ -0,0 +1,45 @@
+"""
+Tareas en segundo plano de contactos (ver tareas/cola.py)
+"""
+from django.conf import settings
+from django.core.mail import send_mail
+from tareas.cola import tarea
+
+from .models import SolicitudContacto
+
+
+@tarea
+def enviar_aviso_contacto(solicitud_id):
+    """Email al propietario por una nueva solicitud de contacto"""
+    solicitud = SolicitudContacto.objects.select_related(
+        'usuario', 'propiedad__propietario'
+    ).filter(pk=solicitud_id).first()
+    if solicitud is None:
+        return
+    
+    propiedad = solicitud.propiedad
+    interesado = solicitud.usuario.get_full_name() or solicitud.usuario.username
+    asunto = f'Nueva solicitud de contacto para {propiedad.titulo}'
+    mensaje = f"""
+    Hola {propiedad.propietario.first_name},
+    
+    {interesado} está interesado en tu propiedad "{propiedad.titulo}".
+    
+    Mensaje:
+    {solicitud.mensaje}
+    
+    Datos de contacto:
+    - Email: {solicitud.email}
+    - Teléfono: {solicitud.telefono or 'No proporcionado'}
+    
+    Saludos,
+    Equipo LaColmena
+    """
+    
+    # Sin fail_silently: si el servidor de correo falla, la cola reintenta
+    send_mail(
+        asunto,
+        mensaje,
+        getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@lacolmena.com'),
+        [propiedad.propietario.email],
+    )
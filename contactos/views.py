@@ -1,13 +1,12 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.core.mail import send_mail
-from django.conf import settings
 from django.urls import reverse
 from propiedades.models import Propiedad
 from notificaciones.models import Notificacion
 from .models import SolicitudContacto
 from .forms import SolicitudContactoForm
+from .tareas import enviar_aviso_contacto
 
 @login_required
 def solicitar_contacto(request, propiedad_pk):
@@ -46,32 +45,9 @@ def solicitar_contacto(request, propiedad_pk):
                 url=reverse('contactos:solicitudes_recibidas')
             )
             
-            # Enviar notificación por email al propietario
+            # Enviar notificación por email al propietario (en segundo plano)
             if propiedad.propietario.recibir_notificaciones:
-                asunto = f'Nueva solicitud de contacto para {propiedad.titulo}'
-                mensaje = f"""
-                Hola {propiedad.propietario.first_name},
-                
-                {request.user.get_full_name() or request.user.username} está interesado en tu propiedad "{propiedad.titulo}".
-                
-                Mensaje:
-                {solicitud.mensaje}
-                
-                Datos de contacto:
-                - Email: {solicitud.email}
-                - Teléfono: {solicitud.telefono or 'No proporcionado'}
-                
-                Saludos,
-                Equipo LaColmena
-                """
-                
-                send_mail(
-                    asunto,
-                    mensaje,
-                    settings.DEFAULT_FROM_EMAIL if hasattr(settings, 'DEFAULT_FROM_EMAIL') else 'noreply@lacolmena.com',
-                    [propiedad.propietario.email],
-                    fail_silently=True,
-                )
+                enviar_aviso_contacto.encolar(solicitud.pk, clave=f'aviso-contacto:{solicitud.pk}')
             
             messages.success(request, '¡Solicitud enviada! El propietario se pondrá en contacto contigo pronto.')
             return redirect('propiedades:detalle', pk=propiedad_pk)
@@ -94,7 +70,7 @@ def mis_solicitudes(request):
     """Ver solicitudes de contacto realizadas por el usuario"""
     solicitudes = SolicitudContacto.objects.filter(
         usuario=request.user
-    ).select_related('propiedad').order_by('-fecha_solicitud')
+    ).select_related('propiedad__imagen_portada').order_by('-fecha_solicitud')
     
     return render(request, 'contactos/mis_solicitudes.html', {'solicitudes': solicitudes})
 
@@ -108,7 +84,7 @@ def solicitudes_recibidas(request):
     
     solicitudes = SolicitudContacto.objects.filter(
         propiedad__propietario=request.user
-    ).select_related('usuario', 'propiedad').order_by('-fecha_solicitud')
+    ).select_related('usuario', 'propiedad__imagen_portada').order_by('-fecha_solicitud')
     
     return render(request, 'contactos/solicitudes_recibidas.html', {'solicitudes': solicitudes})
 
@@ -0,0 +1,9 @@
+from .models import Notificacion
+
+
+def notificaciones(request):
+    """Contador de no leídas para los badges del navbar (una lectura de cache)"""
+    usuario = getattr(request, 'user', None)
+    if usuario is None or not usuario.is_authenticated:
+        return {'notificaciones_no_leidas': 0}
+    return {'notificaciones_no_leidas': Notificacion.contar_no_leidas(usuario.pk)}
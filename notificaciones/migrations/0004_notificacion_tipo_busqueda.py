@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificaciones', '0003_alter_notificacion_tipo'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notificacion',
+            name='tipo',
+            field=models.CharField(choices=[('favorito', 'Favorito actualizado'), ('contacto', 'Nueva solicitud de contacto'), ('busqueda', 'Nueva propiedad para una búsqueda guardada'), ('suscripcion', 'Recordatorio de suscripción'), ('valoracion', 'Nueva valoración'), ('validacion', 'Validación completada'), ('sistema', 'Notificación del sistema')], max_length=20),
+        ),
+    ]
@@ -1,11 +1,18 @@
 from django.db import models
 from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Se invalida en cada cambio, también desde procesar_tareas: depende de que la
+# cache sea compartida entre procesos (ver CACHES en settings)
+CACHE_NO_LEIDAS_TIMEOUT = 3600  # segundos
 
 class Notificacion(models.Model):
     """Notificaciones para usuarios"""
     TIPO_CHOICES = [
         ('favorito', 'Favorito actualizado'),
         ('contacto', 'Nueva solicitud de contacto'),
+        ('busqueda', 'Nueva propiedad para una búsqueda guardada'),
         ('suscripcion', 'Recordatorio de suscripción'),
         ('valoracion', 'Nueva valoración'),
         ('validacion', 'Validación completada'),
@@ -35,3 +42,31 @@ class Notificacion(models.Model):
             self.leida = True
             self.fecha_lectura = timezone.now()
             self.save()
+
+    @staticmethod
+    def _clave_no_leidas(usuario_id):
+        return f'notificaciones:no_leidas:{usuario_id}'
+    
+    @classmethod
+    def contar_no_leidas(cls, usuario_id):
+        """Cantidad de notificaciones no leídas, cacheada por usuario"""
+        clave = cls._clave_no_leidas(usuario_id)
+        total = cache.get(clave)
+        if total is None:
+            total = cls.objects.filter(usuario_id=usuario_id, leida=False).count()
+            cache.set(clave, total, CACHE_NO_LEIDAS_TIMEOUT)
+        return total
+    
+    @classmethod
+    def invalidar_no_leidas(cls, usuario_id):
+        cls.invalidar_no_leidas_varios([usuario_id])
+    
+    @classmethod
+    def invalidar_no_leidas_varios(cls, usuario_ids):
+        """
+        Para altas en bloque (bulk_create no dispara señales). Se borra al
+        confirmar la transacción: antes, otra petición volvería a cachear el
+        conteo viejo.
+        """
+        claves = [cls._clave_no_leidas(usuario_id) for usuario_id in usuario_ids]
+        transaction.on_commit(lambda: cache.delete_many(claves))
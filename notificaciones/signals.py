@@ -0,0 +1,12 @@
+"""
+Señales para mantener al día el contador de no leídas
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Notificacion
+
+
+@receiver(post_save, sender=Notificacion)
+@receiver(post_delete, sender=Notificacion)
+def notificacion_modificada(sender, instance, **kwargs):
+    Notificacion.invalidar_no_leidas(instance.usuario_id)
@@ -38,6 +38,7 @@ def marcar_todas_leidas(request):
         leida=True,
         fecha_lectura=timezone.now()
     )
+    Notificacion.invalidar_no_leidas(request.user.pk)  # update() no dispara señales
     messages.success(request, 'Todas las notificaciones marcadas como leídas')
     return redirect('notificaciones:listar')
 
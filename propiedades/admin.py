@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Categoria, Propiedad, ImagenPropiedad, Favorito, Valoracion, ReporteValoracion
+from .models import Categoria, Propiedad, ImagenPropiedad, Favorito, BusquedaGuardada, Valoracion, ReporteValoracion
 
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
@@ -30,6 +30,12 @@ class FavoritoAdmin(admin.ModelAdmin):
     list_filter = ['fecha_agregado']
     search_fields = ['usuario__username', 'propiedad__titulo']
 
+@admin.register(BusquedaGuardada)
+class BusquedaGuardadaAdmin(admin.ModelAdmin):
+    list_display = ['usuario', 'nombre', 'avisar_email', 'fecha_creacion']
+    list_filter = ['avisar_email', 'fecha_creacion']
+    search_fields = ['usuario__username', 'nombre']
+
 @admin.register(Valoracion)
 class ValoracionAdmin(admin.ModelAdmin):
     list_display = ['usuario', 'propiedad', 'promedio_total_display', 'fecha_valoracion', 'reportada', 'total_reportes']
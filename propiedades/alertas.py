@@ -0,0 +1,259 @@
+"""
+Búsquedas guardadas y avisos de nuevas coincidencias al publicar.
+
+Una búsqueda guardada son los parámetros del listado (BusquedaGuardada). Al
+guardarla se indexa en ClaveBusqueda bajo las combinaciones
+tipo|operación|ciudad|banda de precio que acepta, con '*' donde no filtra:
+la ciudad por su primer trigrama sin acentos (el listado filtra por
+"contiene"; quitar acentos conserva esa relación, así que el índice solo
+amplía las candidatas) y el precio por bandas de media octava si el rango
+abarca pocas.
+
+Cuando se publica o cambia una propiedad, la cola de tareas arma las claves
+que la propiedad satisface (su valor o '*' en cada posición, todos sus
+trigramas de ciudad) y trae solo las búsquedas indexadas bajo alguna de
+ellas; sobre esas candidatas se verifican todos los filtros en Python
+(coincide) con la misma semántica que filtrar_propiedades. Cada búsqueda se
+avisa una sola vez por propiedad (CoincidenciaBusqueda) y cada usuario
+recibe una notificación por propiedad aunque coincidan varias búsquedas.
+"""
+import math
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import Q
+from django.urls import reverse
+from notificaciones.models import Notificacion
+
+from .busqueda import CAMPOS_INDEXADOS, MAXIMO_TERMINOS_CONSULTA, normalizar_texto, terminos_ponderados, tokenizar
+from .facetas import PARAMETROS_PAGINACION
+from .geo import distancia_km, en_caja, parametros_geo
+from .models import BusquedaGuardada, ClaveBusqueda, CoincidenciaBusqueda, Propiedad
+
+MAXIMO_BUSQUEDAS_USUARIO = 20
+BANDAS_POR_OCTAVA = 2  # bandas de precio: cada una cubre un factor de √2
+MAXIMO_BANDAS = 8  # rangos de precio más anchos se indexan como '*'
+TAMANO_LOTE = 1000
+
+# Cambios que pueden hacer que una propiedad pase a coincidir con una búsqueda
+CAMPOS_ALERTAS = CAMPOS_INDEXADOS | {
+    'estado', 'tipo', 'operacion', 'precio', 'categoria', 'habitaciones', 'banos', 'area',
+    'tipo_contacto', 'amenidades', 'latitud', 'longitud',
+}
+
+_TIPOS = [valor for valor, _ in Propiedad.TIPO_CHOICES]
+_OPERACIONES = [valor for valor, _ in Propiedad.OPERACION_CHOICES]
+
+
+def parametros_busqueda(params):
+    """Parámetros no vacíos del listado que se guardan (sin los de paginación)"""
+    return {
+        clave: valor for clave, valor in params.items()
+        if valor and clave not in PARAMETROS_PAGINACION and clave != 'csrfmiddlewaretoken'
+    }
+
+
+def nombre_sugerido(parametros):
+    """Nombre por defecto a partir de los filtros principales ('Casa · Alquiler · Lima')"""
+    partes = [
+        dict(Propiedad.TIPO_CHOICES).get(parametros.get('tipo')),
+        dict(Propiedad.OPERACION_CHOICES).get(parametros.get('operacion')),
+        parametros.get('ciudad', '').strip().title(),
+        parametros.get('busqueda', '').strip(),
+    ]
+    return ' · '.join(parte for parte in partes if parte)[:100] or 'Mi búsqueda'
+
+
+def _decimal(valor):
+    try:
+        numero = Decimal(valor)
+    except (InvalidOperation, TypeError):
+        return None
+    return numero if numero.is_finite() else None
+
+
+def _numero(valor):
+    if valor and valor.replace('.', '', 1).isdigit():
+        return float(valor)
+    return None
+
+
+def criterios(parametros):
+    """Filtros de la búsqueda, validados como en filtrar_propiedades"""
+    habitaciones = parametros.get('habitaciones', '')
+    banos = parametros.get('banos', '')
+    categoria = parametros.get('categoria', '')
+    return {
+        'tipo': parametros.get('tipo') if parametros.get('tipo') in _TIPOS else '',
+        'operacion': parametros.get('operacion') if parametros.get('operacion') in _OPERACIONES else '',
+        'ciudad': parametros.get('ciudad', '').strip().lower(),
+        'precio_min': _decimal(parametros.get('precio_min')) or None,
+        'precio_max': _decimal(parametros.get('precio_max')) or None,
+        'categoria': int(categoria) if categoria.isdigit() else None,
+        'habitaciones': int(habitaciones) if habitaciones.isdigit() else None,
+        'banos': int(banos) if banos.isdigit() else None,
+        'area_min': _numero(parametros.get('area_min')),
+        'area_max': _numero(parametros.get('area_max')),
+        'tipo_contacto': parametros.get('tipo_contacto') if parametros.get('tipo_contacto') in ('dueno', 'inmobiliaria') else '',
+        'amenidades': Propiedad.mascara_amenidades([campo for campo in Propiedad.AMENIDADES if parametros.get(campo)]),
+        'terminos': list(dict.fromkeys(tokenizar(parametros.get('busqueda', ''))))[:MAXIMO_TERMINOS_CONSULTA],
+        'geo': parametros_geo(parametros),
+    }
+
+
+def coincide(filtros, propiedad):
+    """Si la propiedad (activa) pasa todos los filtros de criterios()"""
+    if filtros['tipo'] and propiedad.tipo != filtros['tipo']:
+        return False
+    if filtros['operacion'] and propiedad.operacion != filtros['operacion']:
+        return False
+    # Como ciudad__icontains: distingue acentos ('cordoba' no encuentra 'Córdoba')
+    if filtros['ciudad'] and filtros['ciudad'] not in propiedad.ciudad.lower():
+        return False
+    if filtros['precio_min'] is not None and propiedad.precio < filtros['precio_min']:
+        return False
+    if filtros['precio_max'] is not None and propiedad.precio > filtros['precio_max']:
+        return False
+    if filtros['categoria'] is not None and propiedad.categoria_id != filtros['categoria']:
+        return False
+    if filtros['habitaciones'] is not None and propiedad.habitaciones < filtros['habitaciones']:
+        return False
+    if filtros['banos'] is not None and propiedad.banos < filtros['banos']:
+        return False
+    if filtros['area_min'] is not None and float(propiedad.area) < filtros['area_min']:
+        return False
+    if filtros['area_max'] is not None and float(propiedad.area) > filtros['area_max']:
+        return False
+    if filtros['tipo_contacto'] and propiedad.tipo_contacto != filtros['tipo_contacto']:
+        return False
+    if propiedad.amenidades & filtros['amenidades'] != filtros['amenidades']:
+        return False
+    if filtros['terminos']:
+        # Como el índice de texto: cada término es prefijo de alguno de la propiedad
+        propios = list(terminos_ponderados(propiedad))
+        if not all(any(propio.startswith(termino) for propio in propios) for termino in filtros['terminos']):
+            return False
+    if filtros['geo']:
+        if propiedad.latitud is None or propiedad.longitud is None:
+            return False
+        modo, valores = filtros['geo']
+        if modo == 'radio':
+            latitud, longitud, km = valores
+            return distancia_km(latitud, longitud, propiedad.latitud, propiedad.longitud) <= km
+        return en_caja(propiedad.latitud, propiedad.longitud, *valores)
+    return True
+
+
+def _banda(precio):
+    return math.floor(math.log2(max(float(precio), 1.0)) * BANDAS_POR_OCTAVA)
+
+
+def _trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+def claves_busqueda(filtros):
+    """Claves del índice invertido bajo las que se guarda una búsqueda"""
+    tipo = filtros['tipo'] or '*'
+    operacion = filtros['operacion'] or '*'
+    ciudad = normalizar_texto(filtros['ciudad'])
+    ciudad = ciudad[:3] if len(ciudad) >= 3 else '*'
+    bandas = ['*']
+    if filtros['precio_min'] is not None and filtros['precio_max'] is not None:
+        desde, hasta = _banda(filtros['precio_min']), _banda(filtros['precio_max'])
+        if 0 <= hasta - desde < MAXIMO_BANDAS:
+            bandas = [str(banda) for banda in range(desde, hasta + 1)]
+    return [f'{tipo}|{operacion}|{ciudad}|{banda}' for banda in bandas]
+
+
+def claves_propiedad(propiedad):
+    """Claves de todas las búsquedas que podrían aceptar a la propiedad"""
+    ciudades = _trigramas(normalizar_texto(propiedad.ciudad)) | {'*'}
+    return [
+        f'{tipo}|{operacion}|{ciudad}|{banda}'
+        for tipo in (propiedad.tipo, '*')
+        for operacion in (propiedad.operacion, '*')
+        for ciudad in sorted(ciudades)
+        for banda in (str(_banda(propiedad.precio)), '*')
+    ]
+
+
+def indexar_busqueda(busqueda):
+    """Reemplaza las claves de una búsqueda guardada"""
+    with transaction.atomic():
+        ClaveBusqueda.objects.filter(busqueda=busqueda).delete()
+        ClaveBusqueda.objects.bulk_create([
+            ClaveBusqueda(busqueda=busqueda, clave=clave)
+            for clave in claves_busqueda(criterios(busqueda.parametros))
+        ])
+
+
+def reconstruir_claves(tamano_lote=500):
+    """Reindexa todas las búsquedas guardadas; retorna la cantidad"""
+    total = 0
+    with transaction.atomic():
+        ClaveBusqueda.objects.all().delete()
+        lote = []
+        for busqueda in BusquedaGuardada.objects.only('pk', 'parametros').iterator(chunk_size=tamano_lote):
+            lote.extend(
+                ClaveBusqueda(busqueda_id=busqueda.pk, clave=clave)
+                for clave in claves_busqueda(criterios(busqueda.parametros))
+            )
+            total += 1
+            if len(lote) >= tamano_lote:
+                ClaveBusqueda.objects.bulk_create(lote)
+                lote = []
+        ClaveBusqueda.objects.bulk_create(lote)
+    return total
+
+
+def busquedas_candidatas(propiedad):
+    """Búsquedas indexadas bajo alguna clave de la propiedad, aún no avisadas y de usuarios que reciben notificaciones"""
+    return BusquedaGuardada.objects.filter(
+        pk__in=ClaveBusqueda.objects.filter(clave__in=claves_propiedad(propiedad)).values('busqueda_id'),
+        usuario__recibir_notificaciones=True,
+    ).exclude(
+        Q(usuario_id=propiedad.propietario_id)
+        | Q(pk__in=CoincidenciaBusqueda.objects.filter(propiedad=propiedad).values('busqueda_id'))
+    ).only('pk', 'usuario_id', 'nombre', 'parametros', 'avisar_email').order_by()
+
+
+def avisar_coincidencias(propiedad_id):
+    """
+    Notifica a los usuarios con búsquedas guardadas que aceptan la propiedad.
+
+    Returns:
+        list: Búsquedas que coincidieron por primera vez
+    """
+    propiedad = Propiedad.objects.filter(pk=propiedad_id, estado='activa').first()
+    if propiedad is None:
+        return []
+
+    coincidentes = [
+        busqueda for busqueda in busquedas_candidatas(propiedad).iterator(chunk_size=TAMANO_LOTE)
+        if coincide(criterios(busqueda.parametros), propiedad)
+    ]
+    if not coincidentes:
+        return []
+
+    por_usuario = {}
+    for busqueda in coincidentes:
+        por_usuario.setdefault(busqueda.usuario_id, busqueda)
+    url = reverse('propiedades:detalle', args=[propiedad.pk])
+    with transaction.atomic():
+        CoincidenciaBusqueda.objects.bulk_create(
+            [CoincidenciaBusqueda(busqueda=busqueda, propiedad=propiedad) for busqueda in coincidentes],
+            batch_size=TAMANO_LOTE, ignore_conflicts=True,
+        )
+        Notificacion.objects.bulk_create([
+            Notificacion(
+                usuario_id=usuario_id,
+                tipo='busqueda',
+                titulo='Nueva propiedad para tu búsqueda',
+                mensaje=f'"{propiedad.titulo}" coincide con tu búsqueda "{busqueda.nombre}"',
+                url=url,
+            )
+            for usuario_id, busqueda in por_usuario.items()
+        ], batch_size=TAMANO_LOTE)
+    # bulk_create no dispara señales
+    Notificacion.invalidar_no_leidas_varios(por_usuario)
+    return coincidentes
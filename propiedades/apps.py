@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PropiedadesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'propiedades'
+
+    def ready(self):
+        # Registrar señales que mantienen los datos precalculados
+        from . import signals  # noqa: F401
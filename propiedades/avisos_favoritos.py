@@ -0,0 +1,91 @@
+"""
+Avisos "Favorito actualizado" a quienes guardaron una propiedad.
+
+Cuando una propiedad activa cambia de precio, se alquila o se suspende, la
+señal (o el UPDATE en bloque de las suspensiones por suscripción) solo
+encola una tarea. El trabajador resuelve con una consulta los usuarios que
+la tienen en favoritos y aceptan notificaciones, y crea las notificaciones
+con bulk_create por lotes dentro de una transacción, de modo que un
+reintento no duplica avisos.
+"""
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import F
+from django.template.defaultfilters import floatformat
+from django.urls import reverse
+from notificaciones.models import Notificacion
+
+from .models import Favorito, Propiedad
+
+TAMANO_LOTE = 1000
+
+# Cambio -> (título, mensaje)
+CAMBIOS = {
+    'precio': ('Cambió el precio de un favorito', '"{titulo}" pasó de ${anterior} a ${actual}'),
+    'alquilada': ('Un favorito fue alquilado', '"{titulo}" ya fue alquilada y no está disponible'),
+    'suspendida': ('Un favorito no está disponible', '"{titulo}" fue suspendida por el momento'),
+}
+
+
+def cambio_favoritos(anterior, actual):
+    """
+    Cambio a avisar entre dos (estado, precio) de una propiedad.
+
+    Returns:
+        tuple: (cambio, precio anterior) o None si no hay nada que avisar
+    """
+    if anterior is None:
+        return None
+    estado_anterior, precio_anterior = anterior
+    estado, precio = actual
+    if estado_anterior != 'activa':
+        return None
+    if estado in ('alquilada', 'suspendida'):
+        return estado, None
+    if estado == 'activa' and precio != precio_anterior:
+        return 'precio', precio_anterior
+    return None
+
+
+def notificar_favoritos(propiedad_ids, cambio, precio_anterior=None, tamano_lote=TAMANO_LOTE):
+    """
+    Notifica el cambio a quienes tienen las propiedades en favoritos.
+
+    Returns:
+        int: Cantidad de notificaciones creadas
+    """
+    titulo, plantilla = CAMBIOS[cambio]
+    propiedades = Propiedad.objects.only('pk', 'titulo', 'precio').in_bulk(propiedad_ids)
+    favoritos = Favorito.objects.filter(
+        propiedad_id__in=list(propiedades), usuario__recibir_notificaciones=True
+    ).exclude(usuario_id=F('propiedad__propietario_id')).values_list('usuario_id', 'propiedad_id').order_by()
+
+    mensajes = {
+        pk: (
+            plantilla.format(
+                titulo=propiedad.titulo,
+                anterior=floatformat(Decimal(precio_anterior), 0) if precio_anterior is not None else '',
+                actual=floatformat(propiedad.precio, 0),
+            ),
+            reverse('propiedades:detalle', args=[pk]),
+        )
+        for pk, propiedad in propiedades.items()
+    }
+
+    total = 0
+    lote = []
+    usuarios = set()
+    with transaction.atomic():
+        for usuario_id, propiedad_id in favoritos.iterator(chunk_size=tamano_lote):
+            mensaje, url = mensajes[propiedad_id]
+            lote.append(Notificacion(usuario_id=usuario_id, tipo='favorito', titulo=titulo, mensaje=mensaje, url=url))
+            usuarios.add(usuario_id)
+            if len(lote) >= tamano_lote:
+                Notificacion.objects.bulk_create(lote)
+                total += len(lote)
+                lote = []
+        Notificacion.objects.bulk_create(lote)
+        total += len(lote)
+    # bulk_create no dispara señales; después del bloque, con las notificaciones ya confirmadas
+    Notificacion.invalidar_no_leidas_varios(usuarios)
+    return total
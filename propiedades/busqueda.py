@@ -0,0 +1,172 @@
+"""
+Índice invertido para la búsqueda de texto libre de propiedades.
+
+Cada propiedad se descompone en términos normalizados (sin acentos, en
+minúsculas y con plurales simples reducidos) que se guardan en
+TerminoBusqueda con un peso según el campo de origen. La búsqueda recorre
+el índice por rango de prefijo, por lo que su costo depende de la cantidad
+de coincidencias y no del tamaño de la tabla de propiedades.
+"""
+import re
+import unicodedata
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+
+from .models import Propiedad, TerminoBusqueda
+
+
+# Peso de cada campo en la relevancia
+PESOS_CAMPOS = {
+    'titulo': 3,
+    'ciudad': 2,
+    'distrito': 2,
+    'descripcion': 1,
+}
+
+CAMPOS_INDEXADOS = set(PESOS_CAMPOS)
+
+STOPWORDS = {
+    'a', 'al', 'con', 'de', 'del', 'e', 'el', 'en', 'es', 'la', 'las', 'lo', 'los',
+    'o', 'para', 'por', 'que', 'se', 'sin', 'su', 'sus', 'u', 'un', 'una', 'unos',
+    'unas', 'y', 'muy', 'mas', 'como', 'este', 'esta', 'tiene',
+}
+
+LONGITUD_MAXIMA_TERMINO = 50
+MAXIMO_TERMINOS_CONSULTA = 8
+
+_SEPARADORES = re.compile(r'[^a-z0-9]+')
+_VOCALES = 'aeiou'
+
+
+def normalizar_texto(texto):
+    """Minúsculas y sin acentos ('Peñalolén' -> 'penalolen')"""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def reducir_termino(palabra):
+    """
+    Stemming mínimo para plurales en español. Singular y plural quedan en la
+    misma raíz: primero se quita la 's' final y después una 'e' final
+    (ambiente/ambientes -> ambient, balcon/balcones -> balcon, luz/luces -> luz).
+    """
+    if len(palabra) > 4 and palabra.endswith('ces'):
+        return palabra[:-3] + 'z'
+    if len(palabra) > 3 and palabra.endswith('s'):
+        palabra = palabra[:-1]
+    if len(palabra) > 3 and palabra.endswith('e'):
+        palabra = palabra[:-1]
+    return palabra
+
+
+def tokenizar(texto):
+    """Retorna los términos indexables de un texto, en orden y con repeticiones"""
+    terminos = []
+    for palabra in _SEPARADORES.split(normalizar_texto(texto)):
+        if len(palabra) < 2 or palabra in STOPWORDS:
+            continue
+        terminos.append(reducir_termino(palabra)[:LONGITUD_MAXIMA_TERMINO])
+    return terminos
+
+
+def terminos_ponderados(propiedad):
+    """Retorna {termino: peso} sumando el peso del campo por cada aparición"""
+    pesos = {}
+    for campo, peso in PESOS_CAMPOS.items():
+        for termino in tokenizar(getattr(propiedad, campo)):
+            pesos[termino] = pesos.get(termino, 0) + peso
+    return pesos
+
+
+def indexar_propiedad(propiedad):
+    """Reemplaza las entradas del índice de una propiedad"""
+    TerminoBusqueda.objects.filter(propiedad_id=propiedad.pk).delete()
+    TerminoBusqueda.objects.bulk_create([
+        TerminoBusqueda(propiedad_id=propiedad.pk, termino=termino, peso=peso)
+        for termino, peso in terminos_ponderados(propiedad).items()
+    ])
+
+
+def reconstruir_indice(tamano_lote=500):
+    """
+    Reconstruye el índice completo.
+
+    Returns:
+        int: Cantidad de propiedades indexadas
+    """
+    TerminoBusqueda.objects.all().delete()
+
+    total = 0
+    lote = []
+    propiedades = Propiedad.objects.only(*CAMPOS_INDEXADOS).order_by('pk')
+    for propiedad in propiedades.iterator(chunk_size=tamano_lote):
+        lote.extend(
+            TerminoBusqueda(propiedad_id=propiedad.pk, termino=termino, peso=peso)
+            for termino, peso in terminos_ponderados(propiedad).items()
+        )
+        total += 1
+        if len(lote) >= tamano_lote:
+            TerminoBusqueda.objects.bulk_create(lote)
+            lote = []
+
+    if lote:
+        TerminoBusqueda.objects.bulk_create(lote)
+    return total
+
+
+def _filtro_prefijo(termino):
+    """Rango [termino, termino + U+FFFF) que aprovecha el índice sobre termino"""
+    return Q(termino__gte=termino, termino__lt=termino + '\uffff')
+
+
+def propiedades_coincidentes(texto):
+    """
+    Consulta sobre el índice con las propiedades que contienen todos los
+    términos del texto (como prefijo), anotadas con su relevancia.
+
+    Returns:
+        QuerySet de valores (propiedad_id, relevancia), o None si el texto no
+        tiene términos indexables
+    """
+    terminos = list(dict.fromkeys(tokenizar(texto)))[:MAXIMO_TERMINOS_CONSULTA]
+    if not terminos:
+        return None
+
+    cualquiera = Q()
+    for termino in terminos:
+        cualquiera |= _filtro_prefijo(termino)
+
+    # Una única agregación: relevancia total + coincidencias por término
+    coincidencias = {
+        f'_coincide_{i}': Count('pk', filter=_filtro_prefijo(termino))
+        for i, termino in enumerate(terminos)
+    }
+    return TerminoBusqueda.objects.filter(cualquiera).values('propiedad_id').annotate(
+        relevancia=Sum('peso'),
+        **coincidencias
+    ).filter(**{f'{nombre}__gt': 0 for nombre in coincidencias})
+
+
+def filtrar_por_texto(queryset, texto):
+    """
+    Filtra un queryset de Propiedad por texto libre usando el índice invertido.
+
+    La selección se resuelve dentro del índice (recorrido por rango de
+    término) y la relevancia se anota como subconsulta por propiedad
+    coincidente, para ordenar por ella.
+
+    Args:
+        queryset: QuerySet de Propiedad
+        texto: Texto ingresado por el usuario
+
+    Returns:
+        QuerySet: filtrado y anotado con 'relevancia', o el original si el
+        texto no tiene términos
+    """
+    coincidentes = propiedades_coincidentes(texto)
+    if coincidentes is None:
+        return queryset
+
+    relevancia = coincidentes.filter(propiedad_id=OuterRef('pk')).values('relevancia')
+    return queryset.filter(
+        pk__in=coincidentes.values('propiedad_id')
+    ).annotate(relevancia=Subquery(relevancia))
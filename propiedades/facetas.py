@@ -0,0 +1,130 @@
+"""
+Conteos de facetas para los filtros del listado ("Casa (124)").
+
+Todas las facetas se cuentan en una sola consulta de agregación con
+Count(filter=Q(...)) condicionales. El conteo de cada opción respeta todos
+los filtros aplicados salvo el de su propia faceta, de modo que indica
+cuántos resultados habría al elegirla: "Casa (124)" con tipo=departamento
+marcado cuenta las casas con el resto de los filtros. Las amenidades se
+combinan (todas las marcadas), así que su conteo suma la casilla a las ya
+marcadas.
+
+El resultado se guarda en cache por filtros normalizados, bajo la
+generación del catálogo de paginas.py: cualquier cambio de propiedades
+descarta todos los conteos a la vez.
+"""
+import hashlib
+from django.core.cache import cache
+from django.db.models import Count, F, Q
+
+from .forms import BusquedaForm
+from .models import Categoria, Propiedad
+from .paginas import generacion_catalogo
+from .utils import filtrar_propiedades
+
+CACHE_FACETAS_TIMEOUT = 600  # segundos
+
+# Facetas de valor único: parámetro GET -> opciones
+FACETAS = {
+    'tipo': [valor for valor, _ in Propiedad.TIPO_CHOICES],
+    'operacion': [valor for valor, _ in Propiedad.OPERACION_CHOICES],
+    'tipo_contacto': [valor for valor, _ in Propiedad.TIPO_CONTACTO_CHOICES],
+    'categoria': None,  # ids de Categoria
+}
+
+# Parámetros que no cambian el conjunto de resultados
+PARAMETROS_PAGINACION = {'despues', 'antes', 'page'}
+
+
+def _opciones(faceta):
+    if faceta == 'categoria':
+        return list(Categoria.objects.values_list('pk', flat=True))
+    return FACETAS[faceta]
+
+
+def _seleccion(params):
+    """{faceta: valor elegido} y amenidades marcadas, validados como en filtrar_propiedades"""
+    elegidas = {}
+    for faceta in FACETAS:
+        valor = params.get(faceta)
+        if not valor:
+            continue
+        if faceta == 'categoria':
+            if valor.isdigit():
+                elegidas[faceta] = int(valor)
+        elif valor in FACETAS[faceta]:
+            elegidas[faceta] = valor
+    marcadas = [campo for campo in Propiedad.AMENIDADES if params.get(campo)]
+    return elegidas, marcadas
+
+
+def _condicion(elegidas, marcadas, sin=None):
+    """Filtros de facetas elegidos, salvo el de la faceta `sin`"""
+    condicion = Q()
+    for faceta, valor in elegidas.items():
+        if faceta != sin:
+            condicion &= Q(**{f'{faceta}_id' if faceta == 'categoria' else faceta: valor})
+    if marcadas:
+        condicion &= Q(amenidades_facetas=Propiedad.mascara_amenidades(marcadas))
+    return condicion
+
+
+def clave_filtros(params):
+    """Filtros normalizados: parámetros no vacíos ordenados, sin los de paginación"""
+    parametros = sorted(
+        (clave, valor) for clave, valores in params.lists()
+        if clave not in PARAMETROS_PAGINACION for valor in valores if valor
+    )
+    return hashlib.md5(repr(parametros).encode('utf-8')).hexdigest()
+
+
+def contar_facetas(params):
+    """
+    Conteos de todas las facetas para los filtros actuales.
+
+    Returns:
+        dict: 'total', {faceta: {opción: cantidad}} y 'amenidades': {campo: cantidad}
+    """
+    elegidas, marcadas = _seleccion(params)
+
+    # Filtros que no son facetas (texto, ciudad, precio, espacios, mapa...)
+    resto = params.copy()
+    for clave in list(FACETAS) + Propiedad.AMENIDADES:
+        resto.pop(clave, None)
+    propiedades = filtrar_propiedades(
+        Propiedad.objects.filter(estado='activa').order_by(), BusquedaForm(resto), resto
+    )
+    if marcadas:
+        propiedades = propiedades.alias(amenidades_facetas=F('amenidades').bitand(Propiedad.mascara_amenidades(marcadas)))
+    for campo in Propiedad.AMENIDADES:
+        propiedades = propiedades.alias(**{f'amenidad_{campo}': F('amenidades').bitand(Propiedad.mascara_amenidades([campo]))})
+
+    conteos = {'total': Count('pk', filter=_condicion(elegidas, marcadas))}
+    opciones = {faceta: _opciones(faceta) for faceta in FACETAS}
+    for faceta, valores in opciones.items():
+        sin_faceta = _condicion(elegidas, marcadas, sin=faceta)
+        campo = 'categoria_id' if faceta == 'categoria' else faceta
+        for valor in valores:
+            conteos[f'{faceta}__{valor}'] = Count('pk', filter=sin_faceta & Q(**{campo: valor}))
+    todas = _condicion(elegidas, marcadas)
+    for campo in Propiedad.AMENIDADES:
+        conteos[f'amenidad__{campo}'] = Count(
+            'pk', filter=todas & Q(**{f'amenidad_{campo}': Propiedad.mascara_amenidades([campo])})
+        )
+
+    resultado = propiedades.aggregate(**conteos)
+    facetas = {'total': resultado['total']}
+    for faceta, valores in opciones.items():
+        facetas[faceta] = {valor: resultado[f'{faceta}__{valor}'] for valor in valores}
+    facetas['amenidades'] = {campo: resultado[f'amenidad__{campo}'] for campo in Propiedad.AMENIDADES}
+    return facetas
+
+
+def obtener_facetas(params):
+    """Conteos de facetas desde la cache (una consulta de agregación si faltan)"""
+    clave = f'facetas:{generacion_catalogo()}:{clave_filtros(params)}'
+    facetas = cache.get(clave)
+    if facetas is None:
+        facetas = contar_facetas(params)
+        cache.set(clave, facetas, CACHE_FACETAS_TIMEOUT)
+    return facetas
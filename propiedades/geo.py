@@ -0,0 +1,220 @@
+"""
+Búsqueda geográfica sin PostGIS: por radio alrededor de un punto y por área
+visible del mapa (caja sur/oeste/norte/este).
+
+Cada propiedad guarda el geohash de su latitud/longitud (Propiedad.geohash,
+con índice). Una búsqueda traduce el área a un puñado de celdas de geohash
+que la cubren y filtra por rango de prefijo sobre el índice; sobre esos
+candidatos se aplica el filtro exacto: latitud/longitud dentro de la caja y,
+para el radio, la distancia haversine calculada en la consulta.
+"""
+import math
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+PRECISION_GEOHASH = 9  # celdas de ~5 m
+RADIO_TIERRA_KM = 6371.0
+KM_POR_GRADO = 111.32
+
+MAXIMO_CELDAS = 32  # celdas de la cobertura de un área (condiciones OR en la consulta)
+MAXIMO_RADIO_KM = 100
+
+
+def _bits(precision):
+    """(bits de latitud, bits de longitud): el geohash intercala empezando por longitud"""
+    bits = 5 * precision
+    return bits // 2, (bits + 1) // 2
+
+
+def _indices(latitud, longitud, bits_lat, bits_lng):
+    """Fila y columna de la celda que contiene el punto"""
+    fila = int((latitud + 90) / 180 * (1 << bits_lat))
+    columna = int((longitud + 180) / 360 * (1 << bits_lng))
+    return min(max(fila, 0), (1 << bits_lat) - 1), min(max(columna, 0), (1 << bits_lng) - 1)
+
+
+def _geohash_celda(fila, columna, precision):
+    bits_lat, bits_lng = _bits(precision)
+    valor = 0
+    for k in range(bits_lat + bits_lng):
+        if k % 2 == 0:
+            bit = (columna >> (bits_lng - 1 - k // 2)) & 1
+        else:
+            bit = (fila >> (bits_lat - 1 - k // 2)) & 1
+        valor = (valor << 1) | bit
+    return ''.join(BASE32[(valor >> (5 * (precision - 1 - n))) & 31] for n in range(precision))
+
+
+def codificar_geohash(latitud, longitud, precision=PRECISION_GEOHASH):
+    """Geohash del punto ('' si falta alguna coordenada)"""
+    if latitud is None or longitud is None:
+        return ''
+    bits_lat, bits_lng = _bits(precision)
+    fila, columna = _indices(float(latitud), float(longitud), bits_lat, bits_lng)
+    return _geohash_celda(fila, columna, precision)
+
+
+def cubrir_caja(sur, oeste, norte, este, precision, maximo=MAXIMO_CELDAS):
+    """
+    Celdas de geohash de la precisión indicada que cubren la caja. Una caja
+    con oeste > este cruza el antimeridiano.
+
+    Returns:
+        list: Celdas ordenadas, o None si son más de `maximo`
+    """
+    tramos = [(oeste, este)] if oeste <= este else [(oeste, 180.0), (-180.0, este)]
+    bits_lat, bits_lng = _bits(precision)
+    rangos = []
+    for desde, hasta in tramos:
+        fila_sur, columna_oeste = _indices(sur, desde, bits_lat, bits_lng)
+        fila_norte, columna_este = _indices(norte, hasta, bits_lat, bits_lng)
+        rangos.append((fila_sur, fila_norte, columna_oeste, columna_este))
+    if sum((fn - fs + 1) * (ce - co + 1) for fs, fn, co, ce in rangos) > maximo:
+        return None
+    return sorted({
+        _geohash_celda(fila, columna, precision)
+        for fs, fn, co, ce in rangos
+        for fila in range(fs, fn + 1)
+        for columna in range(co, ce + 1)
+    })
+
+
+def celdas_caja(sur, oeste, norte, este):
+    """
+    Prefijos de geohash que cubren la caja, con la mayor precisión que no
+    supere MAXIMO_CELDAS.
+
+    Returns:
+        list: Prefijos ordenados, o None si el área es demasiado grande para
+        que las celdas filtren algo
+    """
+    for precision in range(PRECISION_GEOHASH, 0, -1):
+        celdas = cubrir_caja(sur, oeste, norte, este, precision)
+        if celdas is not None:
+            return celdas
+    return None
+
+
+def caja_radio(latitud, longitud, km):
+    """Caja (sur, oeste, norte, este) que contiene el círculo"""
+    delta_lat = km / KM_POR_GRADO
+    coseno = math.cos(math.radians(latitud))
+    if coseno < 0.01 or abs(latitud) + delta_lat >= 90:
+        return max(latitud - delta_lat, -90.0), -180.0, min(latitud + delta_lat, 90.0), 180.0
+    delta_lng = min(km / (KM_POR_GRADO * coseno), 180.0)
+    oeste, este = longitud - delta_lng, longitud + delta_lng
+    if oeste < -180:
+        oeste += 360
+    if este > 180:
+        este -= 360
+    return latitud - delta_lat, oeste, latitud + delta_lat, este
+
+
+def filtro_celdas(celdas):
+    """Rango [celda, celda + U+FFFF) por celda: aprovecha el índice sobre geohash"""
+    filtro = Q()
+    for celda in celdas:
+        filtro |= Q(geohash__gte=celda, geohash__lt=celda + '\uffff')
+    return filtro
+
+
+def filtrar_por_caja(queryset, sur, oeste, norte, este):
+    """Propiedades dentro de la caja (celdas por índice + coordenadas exactas)"""
+    queryset = queryset.filter(latitud__gte=sur, latitud__lte=norte)
+    if oeste <= este:
+        queryset = queryset.filter(longitud__gte=oeste, longitud__lte=este)
+    else:
+        queryset = queryset.filter(Q(longitud__gte=oeste) | Q(longitud__lte=este))
+    celdas = celdas_caja(sur, oeste, norte, este)
+    if celdas:
+        queryset = queryset.filter(filtro_celdas(celdas))
+    return queryset
+
+
+def distancia_haversine(latitud, longitud):
+    """Expresión con la distancia en km desde el punto a cada propiedad"""
+    lat_propiedad = Radians(Cast('latitud', FloatField()))
+    lng_propiedad = Radians(Cast('longitud', FloatField()))
+    lat_punto = math.radians(latitud)
+    a = (
+        Power(Sin((lat_propiedad - Value(lat_punto)) / 2), 2)
+        + Value(math.cos(lat_punto)) * Cos(lat_propiedad)
+        * Power(Sin((lng_propiedad - Value(math.radians(longitud))) / 2), 2)
+    )
+    return Value(2 * RADIO_TIERRA_KM) * ASin(Sqrt(a))
+
+
+def distancia_km(lat1, lng1, lat2, lng2):
+    """Distancia haversine en km entre dos puntos (la misma que distancia_haversine)"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (float(lat1), float(lng1), float(lat2), float(lng2)))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def en_caja(latitud, longitud, sur, oeste, norte, este):
+    """Si el punto está dentro de la caja (con oeste > este cruza el antimeridiano)"""
+    latitud, longitud = float(latitud), float(longitud)
+    if not sur <= latitud <= norte:
+        return False
+    if oeste <= este:
+        return oeste <= longitud <= este
+    return longitud >= oeste or longitud <= este
+
+
+def filtrar_por_radio(queryset, latitud, longitud, km):
+    """Propiedades a menos de km del punto, anotadas con 'distancia' (km)"""
+    queryset = filtrar_por_caja(queryset, *caja_radio(latitud, longitud, km))
+    return queryset.annotate(
+        distancia=distancia_haversine(latitud, longitud)
+    ).filter(distancia__lte=km)
+
+
+def _numero(params, clave, minimo, maximo):
+    try:
+        valor = float(params.get(clave, ''))
+    except ValueError:
+        return None
+    return valor if minimo <= valor <= maximo and math.isfinite(valor) else None
+
+
+def parametros_caja(params):
+    """(sur, oeste, norte, este) de los parámetros GET, o None si falta o no es válida"""
+    caja = (
+        _numero(params, 'sur', -90, 90),
+        _numero(params, 'oeste', -180, 180),
+        _numero(params, 'norte', -90, 90),
+        _numero(params, 'este', -180, 180),
+    )
+    if None in caja or caja[0] > caja[2]:
+        return None
+    return caja
+
+
+def parametros_geo(params):
+    """
+    Lee la búsqueda geográfica de los parámetros GET.
+
+    Returns:
+        tuple: ('radio', (lat, lng, km)), ('caja', (sur, oeste, norte, este)) o
+        None si no hay una búsqueda geográfica válida
+    """
+    latitud = _numero(params, 'lat', -90, 90)
+    longitud = _numero(params, 'lng', -180, 180)
+    radio = _numero(params, 'radio', 0, MAXIMO_RADIO_KM)
+    if latitud is not None and longitud is not None and radio:
+        return 'radio', (latitud, longitud, radio)
+
+    caja = parametros_caja(params)
+    return ('caja', caja) if caja else None
+
+
+def filtrar_geo(queryset, params):
+    """Aplica la búsqueda geográfica de los parámetros, si la hay"""
+    busqueda = parametros_geo(params)
+    if busqueda is None:
+        return queryset
+    modo, valores = busqueda
+    if modo == 'radio':
+        return filtrar_por_radio(queryset, *valores)
+    return filtrar_por_caja(queryset, *valores)
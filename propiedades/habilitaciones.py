@@ -0,0 +1,200 @@
+"""
+Habilitaciones de un propietario: suscripción vigente, límites del plan,
+publicaciones activas y cupo de destacados.
+
+Las vistas de propietario toman todas sus decisiones de cupo de una misma
+foto por usuario, que se calcula con tres consultas y se guarda en cache
+junto con las versiones (del usuario y global) con que se calculó. La foto y
+las versiones se leen con un único get_many; si alguna versión cambió la foto
+se descarta. Las señales de Suscripcion, Propiedad y Destacado incrementan la
+versión del usuario, y los cambios de plan o las operaciones en bloque, la
+global. Esas señales también corren en procesar_tareas y en los comandos
+programados, por eso la cache tiene que ser compartida (ver CACHES en settings).
+"""
+import time
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+from suscripciones.models import Suscripcion
+
+from .models import Destacado, Propiedad
+
+CACHE_HABILITACIONES = 'habilitaciones:{}'
+CACHE_HABILITACIONES_VERSION = 'habilitaciones:{}:version'
+CACHE_HABILITACIONES_GLOBAL = 'habilitaciones:version'
+CACHE_HABILITACIONES_TIMEOUT = 3600  # segundos
+CACHE_VERSIONES_TIMEOUT = 86400
+
+
+def inicio_de_mes(ahora=None):
+    """Comienzo del mes en curso: los destacados incluidos se cuentan por mes"""
+    ahora = ahora or timezone.now()
+    return ahora.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+class Habilitaciones:
+    """
+    Foto de las habilitaciones de un propietario (ver obtener_habilitaciones).
+
+    La vigencia de la suscripción se evalúa al consultarla (esta_activa()
+    compara con la hora actual), por lo que una foto cacheada no extiende una
+    suscripción vencida.
+    """
+
+    def __init__(self, suscripcion, propiedades, destacados_activos, destacados_mes, mes):
+        self.suscripcion = suscripcion  # Fila en estado 'activa' (puede estar vencida por fecha)
+        self.ids_propiedades = [pk for pk, _ in propiedades]  # Por fecha de publicación
+        self.ids_activas = {pk for pk, estado in propiedades if estado == 'activa'}
+        self.destacados_activos = destacados_activos
+        self.destacados_mes = destacados_mes
+        self.mes = mes
+        self.versiones = None
+
+    @property
+    def tiene_suscripcion(self):
+        return self.suscripcion is not None and self.suscripcion.esta_activa()
+
+    @property
+    def plan(self):
+        """Plan de la suscripción vigente, o None"""
+        return self.suscripcion.plan if self.tiene_suscripcion else None
+
+    @property
+    def vencimiento(self):
+        return self.suscripcion.fecha_vencimiento if self.tiene_suscripcion else None
+
+    @property
+    def total_propiedades(self):
+        return len(self.ids_propiedades)
+
+    @property
+    def activas(self):
+        return len(self.ids_activas)
+
+    @property
+    def primera_propiedad_id(self):
+        return self.ids_propiedades[0] if self.ids_propiedades else None
+
+    @property
+    def limite_publicaciones(self):
+        """Publicaciones activas permitidas: la primera gratis + las del plan"""
+        return 1 + self.plan.max_publicaciones if self.plan else 1
+
+    @property
+    def destacados_incluidos(self):
+        return self.plan.destacados_incluidos_mes if self.plan else 0
+
+    @property
+    def destacados_disponibles_mes(self):
+        """Destacados incluidos que quedan en el mes (los vencidos siguen contando)"""
+        return self.destacados_incluidos - self.destacados_mes
+
+    @property
+    def destacados_disponibles(self):
+        """Destacados incluidos que se pueden tener encendidos a la vez"""
+        return self.destacados_incluidos - self.destacados_activos
+
+    @property
+    def puede_comprar_destacados(self):
+        return bool(self.plan and self.plan.puede_comprar_destacados)
+
+    def activas_sin(self, propiedad_id=None):
+        """Publicaciones activas sin contar la indicada (la que se quiere activar)"""
+        return len(self.ids_activas - {propiedad_id})
+
+    def puede_activar(self, propiedad_id=None):
+        """
+        Verifica si se puede activar una propiedad adicional.
+
+        Args:
+            propiedad_id: ID de la propiedad a activar (None para nueva propiedad)
+
+        Returns:
+            tuple: (puede_activar: bool, mensaje: str, es_primera: bool)
+        """
+        if not self.ids_propiedades:
+            return (True, 'Tu primera publicación es gratis y permanente', True)
+
+        if propiedad_id and self.primera_propiedad_id == propiedad_id:
+            return (True, 'Esta es tu primera publicación (gratis y permanente)', True)
+
+        if not self.tiene_suscripcion:
+            return (False, 'Tu primera publicación es gratis. Para publicaciones adicionales necesitas una suscripción activa.', False)
+
+        activas = self.activas_sin(propiedad_id)
+        limite_total = self.limite_publicaciones
+        if activas >= limite_total:
+            return (False, f'Has alcanzado el límite de {limite_total} publicaciones activas (1 gratis + {self.plan.max_publicaciones} de tu plan {self.plan.nombre})', False)
+
+        return (True, f'Puedes activar esta propiedad. Tienes {limite_total - activas} espacio(s) disponible(s)', False)
+
+
+def _calcular(usuario_id):
+    suscripcion = Suscripcion.objects.filter(
+        usuario_id=usuario_id,
+        estado='activa'
+    ).select_related('plan').first()
+
+    propiedades = list(
+        Propiedad.objects.filter(propietario_id=usuario_id)
+        .order_by('fecha_publicacion', 'pk').values_list('pk', 'estado')
+    )
+
+    mes = inicio_de_mes()
+    destacados = Destacado.objects.filter(propiedad__propietario_id=usuario_id).aggregate(
+        activos=Count('pk', filter=Q(activo=True)),
+        # Los vencidos siguen contando en el mes
+        del_mes=Count('pk', filter=Q(fecha_compra__gte=mes) & (Q(activo=True) | Q(fecha_fin__lte=timezone.now()))),
+    )
+    return Habilitaciones(suscripcion, propiedades, destacados['activos'], destacados['del_mes'], mes)
+
+
+def _asegurar_version(clave, version):
+    """Versión guardada, o una nueva si no hay (ninguna foto anterior coincidirá)"""
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(clave, version, CACHE_VERSIONES_TIMEOUT):
+            version = cache.get(clave, version)
+    return version
+
+
+def obtener_habilitaciones(usuario_id):
+    """Habilitaciones del usuario: una lectura de cache, o tres consultas si cambiaron"""
+    clave = CACHE_HABILITACIONES.format(usuario_id)
+    clave_version = CACHE_HABILITACIONES_VERSION.format(usuario_id)
+    valores = cache.get_many([clave, clave_version, CACHE_HABILITACIONES_GLOBAL])
+
+    versiones = (valores.get(clave_version), valores.get(CACHE_HABILITACIONES_GLOBAL))
+    foto = valores.get(clave)
+    if foto is not None and None not in versiones and foto.versiones == versiones and foto.mes == inicio_de_mes():
+        return foto
+
+    # Las versiones se fijan antes de consultar: una escritura concurrente las
+    # incrementa y la foto que se guarde con las anteriores queda descartada
+    versiones = (
+        _asegurar_version(clave_version, versiones[0]),
+        _asegurar_version(CACHE_HABILITACIONES_GLOBAL, versiones[1]),
+    )
+    foto = _calcular(usuario_id)
+    foto.versiones = versiones
+    cache.set(clave, foto, CACHE_HABILITACIONES_TIMEOUT)
+    return foto
+
+
+def _incrementar(clave):
+    try:
+        cache.incr(clave)
+    except ValueError:
+        pass  # Sin versión guardada ninguna foto coincide: se recalcula igual
+
+
+def invalidar_habilitaciones(usuarios_ids=None):
+    """
+    Descarta las fotos de los usuarios indicados, o las de todos si no se
+    indica ninguno (cambios de plan y UPDATEs en bloque).
+    """
+    if usuarios_ids is None:
+        _incrementar(CACHE_HABILITACIONES_GLOBAL)
+        return
+    for usuario_id in set(usuarios_ids):
+        _incrementar(CACHE_HABILITACIONES_VERSION.format(usuario_id))
@@ -0,0 +1,79 @@
+"""
+Variantes redimensionadas de las imágenes de propiedades.
+
+Al subir una imagen se generan, en la cola de tareas, tres tamaños fijos
+(card, detalle y completa) en WebP con respaldo JPEG, con la orientación
+EXIF aplicada y sin metadatos. Las rutas y dimensiones quedan en
+ImagenPropiedad.variantes y el tag {% imagen_responsive %} arma el srcset.
+Mientras una imagen no tenga variantes se sigue usando el original.
+"""
+import io
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import ImagenPropiedad, Propiedad
+from .paginas import invalidar_paginas
+
+# Ancho máximo de cada variante; el alto se limita al doble del ancho
+# (no se amplían imágenes más chicas)
+TAMANOS = {
+    'card': 480,
+    'detalle': 1280,
+    'completa': 2048,
+}
+
+FORMATOS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+
+def ruta_variante(imagen, tamano, extension):
+    return f'propiedades/variantes/{imagen.pk}/{tamano}.{extension}'
+
+
+def generar_variantes(imagen_id):
+    """
+    Genera y guarda todas las variantes de una imagen.
+
+    Returns:
+        dict: Variantes registradas, o None si la imagen ya no existe
+    """
+    imagen = ImagenPropiedad.objects.filter(pk=imagen_id).first()
+    if imagen is None or not imagen.imagen:
+        return None
+
+    storage = imagen.imagen.storage
+    with imagen.imagen.open('rb') as archivo:
+        original = ImageOps.exif_transpose(Image.open(archivo))
+        # Copia sin metadatos: solo los píxeles pasan a las variantes
+        original = original.convert('RGB')
+
+    variantes = {}
+    for tamano, lado in TAMANOS.items():
+        copia = original.copy()
+        copia.thumbnail((lado, lado * 2), Image.LANCZOS)
+        variantes[tamano] = {'ancho': copia.width, 'alto': copia.height}
+        for extension, opciones in FORMATOS.items():
+            contenido = io.BytesIO()
+            copia.save(contenido, **opciones)
+            ruta = ruta_variante(imagen, tamano, extension)
+            if storage.exists(ruta):
+                storage.delete(ruta)
+            variantes[tamano][extension] = storage.save(ruta, ContentFile(contenido.getvalue()))
+
+    ImagenPropiedad.objects.filter(pk=imagen_id).update(variantes=variantes)
+    # Si es la portada, las tarjetas cacheadas deben pasar a usar las variantes
+    if Propiedad.objects.filter(pk=imagen.propiedad_id, imagen_portada_id=imagen_id).update(
+        fecha_actualizacion=timezone.now()
+    ):
+        invalidar_paginas()
+    return variantes
+
+
+def eliminar_variantes(imagen):
+    storage = imagen.imagen.storage
+    for variante in (imagen.variantes or {}).values():
+        for extension in FORMATOS:
+            if variante.get(extension) and storage.exists(variante[extension]):
+                storage.delete(variante[extension])
@@ -0,0 +1,94 @@
+import re
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.http import QueryDict
+from propiedades.forms import BusquedaForm
+from propiedades.models import Propiedad
+from propiedades.utils import filtrar_propiedades
+
+
+# Combinaciones reales de filtros del listado (querystring de listado_propiedades)
+ESCENARIOS_LISTADO = [
+    ('listado sin filtros', ''),
+    ('listado por tipo', 'tipo=departamento'),
+    ('listado por operación', 'operacion=venta'),
+    ('listado tipo + operación', 'tipo=casa&operacion=alquiler'),
+    ('listado por rango de precio', 'precio_min=100&precio_max=900'),
+    ('listado por categoría', 'categoria=1'),
+    ('listado por ciudad', 'ciudad=lima'),
+    ('listado especial estudiantes', 'especial_estudiantes=1'),
+    ('listado con comodidades', 'amoblado=1&mascotas=1&balcon=1'),
+    ('listado tipo + precio + comodidades', 'tipo=departamento&precio_max=1500&estacionamiento=1&ascensor=1'),
+    ('listado por tipo de contacto', 'tipo_contacto=inmobiliaria'),
+    ('listado texto libre', 'busqueda=casa+jardin'),
+    ('listado por radio', 'lat=-12.0464&lng=-77.0428&radio=3'),
+    ('listado por área del mapa', 'sur=-12.13&oeste=-77.05&norte=-12.09&este=-77.01'),
+]
+
+# Patrones de recorrido completo de tabla según el motor
+PATRONES_SCAN = {
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING\b)(\w+)'),
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+}
+PATRONES_ORDEN = {
+    'sqlite': re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    'postgresql': re.compile(r'Sort Key:'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta EXPLAIN sobre las consultas de listados y señala recorridos completos de tabla'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estricto', action='store_true', help='Termina con error si algún escenario recorre una tabla completa')
+        parser.add_argument('--analyze', action='store_true', help='Actualiza las estadísticas del planificador antes de auditar')
+
+    def escenarios(self):
+        """Consultas tal como las arman las vistas públicas"""
+        base = Propiedad.objects.filter(estado='activa').select_related('propietario', 'categoria')
+        for nombre, querystring in ESCENARIOS_LISTADO:
+            params = QueryDict(querystring)
+            yield nombre, filtrar_propiedades(base, BusquedaForm(params), params)[:12]
+
+        yield 'estudiantes', Propiedad.objects.filter(estado='activa', especial_estudiantes=True)[:12]
+        yield 'inversiones', Propiedad.objects.filter(estado='activa', operacion='venta')[:12]
+        # Reconstrucción del índice de ubicaciones del autocompletado
+        yield 'ubicaciones por ciudad', Propiedad.objects.filter(
+            estado='activa'
+        ).order_by().values('ciudad').annotate(total=Count('id'))
+        yield 'ubicaciones por distrito', Propiedad.objects.filter(
+            estado='activa'
+        ).order_by().values('distrito', 'ciudad').annotate(total=Count('id'))
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        patron_scan = PATRONES_SCAN.get(vendor)
+        patron_orden = PATRONES_ORDEN.get(vendor)
+        if patron_scan is None:
+            self.stdout.write(self.style.WARNING(f'Motor "{vendor}" sin reglas de auditoría: se muestran los planes sin evaluar'))
+
+        if options['analyze']:
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        con_scan = []
+        for nombre, queryset in self.escenarios():
+            plan = queryset.explain()
+            tablas = sorted(set(patron_scan.findall(plan))) if patron_scan else []
+            ordena = bool(patron_orden and patron_orden.search(plan))
+
+            if tablas:
+                con_scan.append(nombre)
+                self.stdout.write(self.style.ERROR(f'✗ {nombre}: recorrido completo de {", ".join(tablas)}'))
+            elif ordena:
+                self.stdout.write(self.style.WARNING(f'! {nombre}: ordenamiento sin índice'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'✓ {nombre}'))
+
+            if options['verbosity'] >= 2 or tablas or patron_scan is None:
+                for linea in plan.splitlines():
+                    self.stdout.write(f'    {linea}')
+
+        if con_scan and options['estricto']:
+            raise CommandError(f'{len(con_scan)} consulta(s) con recorrido completo de tabla')
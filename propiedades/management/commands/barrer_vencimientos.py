@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from propiedades.vencimientos import barrer_vencimientos
+from tareas.checks import exigir_cache_compartida
+
+
+class Command(BaseCommand):
+    help = 'Pasa a su estado final los destacados, suscripciones y publicaciones vencidas (correr periódicamente)'
+
+    def handle(self, *args, **options):
+        exigir_cache_compartida(self)
+        resultado = barrer_vencimientos()
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Vencidos: {resultado['destacados']} destacado(s), "
+            f"{resultado['suscripciones']} suscripción(es), {resultado['propiedades']} publicación(es)"
+        ))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from propiedades.imagenes import generar_variantes
+from propiedades.models import ImagenPropiedad
+
+
+class Command(BaseCommand):
+    help = 'Genera las variantes redimensionadas de las imágenes de propiedades'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true', help='Regenera también las imágenes que ya tienen variantes')
+
+    def handle(self, *args, **options):
+        imagenes = ImagenPropiedad.objects.order_by('pk')
+        if not options['todas']:
+            imagenes = imagenes.filter(variantes={})
+
+        generadas, fallidas = 0, 0
+        for imagen_id in imagenes.values_list('pk', flat=True).iterator():
+            try:
+                generar_variantes(imagen_id)
+                generadas += 1
+            except (OSError, ValueError) as e:
+                fallidas += 1
+                self.stdout.write(self.style.WARNING(f'! Imagen {imagen_id}: {e}'))
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Variantes generadas para {generadas} imagen(es), {fallidas} con error'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from propiedades.puntuaciones import reconciliar_puntuaciones
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los agregados de valoraciones de propiedades y perfiles desde cero'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Filas por lote al guardar')
+
+    def handle(self, *args, **options):
+        propiedades, perfiles = reconciliar_puntuaciones(tamano_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Agregados corregidos: {propiedades} propiedad(es), {perfiles} perfil(es)'
+        ))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from propiedades.alertas import reconstruir_claves
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice invertido de búsquedas guardadas (claves para los avisos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Tamaño de lote para bulk_create')
+
+    def handle(self, *args, **options):
+        total = reconstruir_claves(tamano_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Índice de búsquedas guardadas reconstruido: {total} búsquedas'))
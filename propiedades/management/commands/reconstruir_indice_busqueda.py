@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from propiedades.busqueda import reconstruir_indice
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice invertido de búsqueda de texto libre'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=500, help='Tamaño de lote para bulk_create')
+
+    def handle(self, *args, **options):
+        total = reconstruir_indice(tamano_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Índice de búsqueda reconstruido: {total} propiedades indexadas'))
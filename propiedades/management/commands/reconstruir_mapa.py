@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from propiedades.mapa import reconstruir_mapa
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los clusters del mapa (agregados por celda de geohash) desde las propiedades activas'
+
+    def handle(self, *args, **options):
+        total = reconstruir_mapa()
+        self.stdout.write(self.style.SUCCESS(f'✓ Mapa reconstruido: {total} celdas'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from propiedades.recomendaciones import reconstruir_recomendaciones
+
+
+class Command(BaseCommand):
+    help = 'Recalcula las recomendaciones por co-ocurrencia (favoritos, contactos y vistas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Solo las propiedades de usuarios con interacciones nuevas desde la corrida anterior',
+        )
+        parser.add_argument('--lote', type=int, default=500, help='Tamaño de lote para bulk_update')
+
+    def handle(self, *args, **options):
+        total = reconstruir_recomendaciones(incremental=options['incremental'], tamano_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Recomendaciones actualizadas: {total} propiedades'))
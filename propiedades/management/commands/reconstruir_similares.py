@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from propiedades.similares import VECINAS, reconstruir_similares
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el índice de propiedades similares (vecinas más cercanas por características)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vecinas', type=int, default=VECINAS, help='Similares guardadas por propiedad')
+        parser.add_argument('--lote', type=int, default=500, help='Tamaño de lote para bulk_update')
+
+    def handle(self, *args, **options):
+        total = reconstruir_similares(k=options['vecinas'], tamano_lote=options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Índice de similares reconstruido: {total} propiedades'))
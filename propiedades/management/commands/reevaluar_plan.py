@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+from propiedades.utils import reevaluar_plan
+from suscripciones.models import PlanSuscripcion
+
+
+class Command(BaseCommand):
+    help = 'Re-evalúa activas/suspendidas de todos los propietarios suscriptos a un plan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('plan_id', type=int, help='ID del PlanSuscripcion')
+        parser.add_argument('--lote', type=int, default=200, help='Propietarios por lote')
+        parser.add_argument('--simular', action='store_true', help='Solo informa los cambios, sin aplicarlos')
+
+    def handle(self, *args, **options):
+        plan = PlanSuscripcion.objects.filter(pk=options['plan_id']).first()
+        if plan is None:
+            raise CommandError(f'No existe el plan {options["plan_id"]}')
+
+        con_cambios = reevaluar_plan(plan, tamano_lote=options['lote'], simular=options['simular'])
+        for propietario_id, resumen in con_cambios.items():
+            self.stdout.write(f'Propietario {propietario_id} (límite {resumen["limite_total"]}):')
+            for cambio in resumen['cambios']:
+                self.stdout.write(f'    {cambio}')
+
+        total = sum(len(resumen['cambios']) for resumen in con_cambios.values())
+        prefijo = 'Simulación: se aplicarían' if options['simular'] else '✓ Aplicados'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefijo} {total} cambio(s) en {len(con_cambios)} propietario(s) del plan {plan.nombre}'
+        ))
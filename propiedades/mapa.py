@@ -0,0 +1,193 @@
+"""
+Clusters de marcadores del mapa, agregados en el servidor.
+
+CeldaMapa guarda, para cada nivel de la grilla (largo del prefijo de
+geohash, NIVELES) y cada celda con propiedades activas, la cantidad, la suma
+de coordenadas (el centroide es suma / cantidad) y el precio mínimo y
+máximo. El endpoint del mapa elige el nivel según el zoom y el tamaño del
+área visible y lee solo las celdas que la cubren: la respuesta y la consulta
+crecen con la cantidad de clusters, no de propiedades.
+
+El alta, la baja o el cambio de estado, coordenadas o precio de una
+propiedad ajusta sus celdas (una por nivel) con un UPDATE. Solo cuando una
+baja se lleva el precio mínimo o máximo de una celda hay que recalcularla
+desde la base. Los UPDATE en bloque recalculan las celdas de las propiedades
+afectadas (recalcular_celdas_propiedades); reconstruir_mapa rehace todo.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, FloatField, Max, Min, Q, Sum, Value
+from django.db.models.functions import Cast, Greatest, Least, Substr
+
+from .geo import cubrir_caja, filtro_celdas, MAXIMO_CELDAS
+from .models import CeldaMapa, Propiedad
+
+NIVELES = range(1, 8)  # De ~5000 km a ~150 m de lado
+
+# Nivel de la grilla para cada zoom del mapa (0-20): unas 10 celdas de ancho en pantalla
+NIVEL_POR_ZOOM = [1, 1, 1, 2, 2, 2, 3, 3, 4, 4, 4, 5, 5, 5, 6, 6, 7, 7, 7, 7, 7]
+
+MAXIMO_CLUSTERS = 256
+
+
+def _celdas_punto(geohash):
+    """(nivel, celda) de un punto en cada nivel de la grilla"""
+    return [(nivel, geohash[:nivel]) for nivel in NIVELES]
+
+
+def _filtro(celdas):
+    filtro = Q()
+    for nivel, celda in celdas:
+        filtro |= Q(nivel=nivel, celda=celda)
+    return filtro
+
+
+def _agregar(geohash, latitud, longitud, precio, recalculadas=()):
+    celdas = [celda for celda in _celdas_punto(geohash) if celda not in recalculadas]
+    if not celdas:
+        return
+    precio = Value(precio, output_field=DecimalField(max_digits=10, decimal_places=2))
+    actualizadas = CeldaMapa.objects.filter(_filtro(celdas)).update(
+        cantidad=F('cantidad') + 1,
+        suma_latitud=F('suma_latitud') + latitud,
+        suma_longitud=F('suma_longitud') + longitud,
+        precio_min=Least('precio_min', precio),
+        precio_max=Greatest('precio_max', precio),
+    )
+    if actualizadas == len(celdas):
+        return
+
+    existentes = set(CeldaMapa.objects.filter(_filtro(celdas)).values_list('nivel', 'celda'))
+    nuevas = [celda for celda in celdas if celda not in existentes]
+    try:
+        with transaction.atomic():
+            CeldaMapa.objects.bulk_create([
+                CeldaMapa(
+                    nivel=nivel, celda=celda, cantidad=1,
+                    suma_latitud=latitud, suma_longitud=longitud,
+                    precio_min=precio.value, precio_max=precio.value,
+                )
+                for nivel, celda in nuevas
+            ])
+    except IntegrityError:
+        # Otra alta creó alguna de estas celdas al mismo tiempo
+        recalcular_celdas(nuevas)
+
+
+def _quitar(geohash, latitud, longitud, precio):
+    """Retorna las celdas que hubo que recalcular desde la base"""
+    filtro = _filtro(_celdas_punto(geohash))
+    CeldaMapa.objects.filter(filtro).update(
+        cantidad=F('cantidad') - 1,
+        suma_latitud=F('suma_latitud') - latitud,
+        suma_longitud=F('suma_longitud') - longitud,
+    )
+    CeldaMapa.objects.filter(filtro, cantidad__lte=0).delete()
+    # Se fue el precio mínimo o máximo de la celda: el siguiente solo lo sabe la base
+    extremos = list(
+        CeldaMapa.objects.filter(filtro).filter(Q(precio_min=precio) | Q(precio_max=precio))
+        .values_list('nivel', 'celda')
+    )
+    if extremos:
+        recalcular_celdas(extremos)
+    return set(extremos)
+
+
+def actualizar_punto(anterior, actual):
+    """
+    Ajusta las celdas cuando una propiedad entra, sale o se mueve en el mapa.
+    anterior/actual son Propiedad.punto_mapa() (o None).
+    """
+    if anterior == actual:
+        return
+    with transaction.atomic():
+        recalculadas = _quitar(*anterior) if anterior is not None else set()
+        if actual is not None:
+            # Las recalculadas ya incluyen el punto actual (se leyeron después de guardarlo)
+            _agregar(*actual, recalculadas=recalculadas)
+
+
+def _agregados(nivel, celdas=None):
+    """Celdas del nivel calculadas desde la base (todas, o solo las indicadas)"""
+    activas = Propiedad.objects.filter(estado='activa').exclude(geohash='').order_by()
+    if celdas is not None:
+        if len(celdas) <= MAXIMO_CELDAS:
+            activas = activas.filter(filtro_celdas(celdas))
+        else:
+            activas = activas.annotate(celda=Substr('geohash', 1, nivel)).filter(celda__in=celdas)
+    filas = activas.values(celda=Substr('geohash', 1, nivel)).annotate(
+        cantidad=Count('pk'),
+        suma_latitud=Sum(Cast('latitud', FloatField())),
+        suma_longitud=Sum(Cast('longitud', FloatField())),
+        precio_min=Min('precio'),
+        precio_max=Max('precio'),
+    )
+    return [CeldaMapa(nivel=nivel, **fila) for fila in filas]
+
+
+def recalcular_celdas(celdas):
+    """Recalcula desde la base las celdas [(nivel, celda)] (una consulta por nivel)"""
+    por_nivel = {}
+    for nivel, celda in celdas:
+        por_nivel.setdefault(nivel, set()).add(celda)
+    nuevas = []
+    for nivel, prefijos in por_nivel.items():
+        nuevas += _agregados(nivel, sorted(prefijos))
+    with transaction.atomic():
+        for nivel, prefijos in por_nivel.items():
+            CeldaMapa.objects.filter(nivel=nivel, celda__in=prefijos).delete()
+        CeldaMapa.objects.bulk_create(nuevas)
+
+
+def recalcular_celdas_propiedades(ids):
+    """Celdas de las propiedades indicadas, después de un UPDATE en bloque (sin señales)"""
+    geohashes = set(
+        Propiedad.objects.filter(pk__in=ids).exclude(geohash='').values_list('geohash', flat=True)
+    )
+    recalcular_celdas({celda for geohash in geohashes for celda in _celdas_punto(geohash)})
+
+
+def reconstruir_mapa():
+    """Rehace todas las celdas desde la base; retorna la cantidad de celdas"""
+    nuevas = [celda for nivel in NIVELES for celda in _agregados(nivel)]
+    with transaction.atomic():
+        CeldaMapa.objects.all().delete()
+        CeldaMapa.objects.bulk_create(nuevas, batch_size=500)
+    return len(nuevas)
+
+
+def nivel_para_area(sur, oeste, norte, este, zoom):
+    """
+    Nivel de la grilla para el zoom, o uno menor si con ese el área visible
+    tendría más de MAXIMO_CLUSTERS celdas (en el primer nivel hay 32).
+
+    Returns:
+        tuple: (nivel, celdas que cubren el área en ese nivel)
+    """
+    nivel = NIVEL_POR_ZOOM[min(max(zoom, 0), len(NIVEL_POR_ZOOM) - 1)]
+    celdas = cubrir_caja(sur, oeste, norte, este, nivel, maximo=MAXIMO_CLUSTERS)
+    while celdas is None:
+        nivel -= 1
+        celdas = cubrir_caja(sur, oeste, norte, este, nivel, maximo=MAXIMO_CLUSTERS)
+    return nivel, celdas
+
+
+def clusters(sur, oeste, norte, este, zoom):
+    """
+    Clusters del área visible: una fila por celda con propiedades activas.
+
+    Returns:
+        list: dicts con celda, cantidad, lat/lng del centroide y precio_min/max
+    """
+    nivel, celdas = nivel_para_area(sur, oeste, norte, este, zoom)
+    filas = CeldaMapa.objects.filter(nivel=nivel, celda__in=celdas).order_by('celda')
+    return [
+        {
+            'celda': fila.celda,
+            'cantidad': fila.cantidad,
+            'lat': round(fila.suma_latitud / fila.cantidad, 6),
+            'lng': round(fila.suma_longitud / fila.cantidad, 6),
+            'precio_min': float(fila.precio_min),
+            'precio_max': float(fila.precio_max),
+        }
+        for fila in filas
+    ]
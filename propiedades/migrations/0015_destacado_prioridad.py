@@ -0,0 +1,49 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:14
+
+from django.db import migrations, models
+
+
+PESO_PLAN = {'Avanzado': 1000, 'Intermedio': 500, 'Básico': 100}
+
+
+def calcular_prioridades(apps, schema_editor):
+    """Materializa la prioridad de los destacados existentes"""
+    from django.utils import timezone
+    Destacado = apps.get_model('propiedades', 'Destacado')
+    Suscripcion = apps.get_model('suscripciones', 'Suscripcion')
+    
+    ahora = timezone.now()
+    planes = {}
+    for suscripcion in Suscripcion.objects.filter(estado='activa').select_related('plan').order_by('-fecha_inicio'):
+        if suscripcion.usuario_id not in planes:
+            planes[suscripcion.usuario_id] = suscripcion.plan.nombre if suscripcion.fecha_vencimiento > ahora else ''
+    
+    destacados = list(Destacado.objects.select_related('propiedad'))
+    for destacado in destacados:
+        destacado.prioridad = (
+            PESO_PLAN.get(planes.get(destacado.propiedad.propietario_id), 0)
+            + (50 if destacado.tipo == 'premium' else 25)
+            + int(destacado.fecha_compra.timestamp() / 1000)
+        )
+    Destacado.objects.bulk_update(destacados, ['prioridad'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0014_propiedad_accesibilidad_propiedad_aire_acondicionado_and_more'),
+        ('suscripciones', '0003_plansuscripcion_destacados_incluidos_mes_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='destacado',
+            name='prioridad',
+            field=models.IntegerField(default=0, editable=False, help_text='Prioridad materializada para el ranking de la portada'),
+        ),
+        migrations.AddIndex(
+            model_name='destacado',
+            index=models.Index(fields=['activo', 'prioridad'], name='propiedades_activo_c1c8c2_idx'),
+        ),
+        migrations.RunPython(calcular_prioridades, migrations.RunPython.noop),
+    ]
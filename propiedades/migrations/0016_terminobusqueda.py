@@ -0,0 +1,30 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0015_destacado_prioridad'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminoBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('termino', models.CharField(max_length=50)),
+                ('peso', models.IntegerField(default=1)),
+                ('propiedad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terminos_busqueda', to='propiedades.propiedad')),
+            ],
+            options={
+                'verbose_name': 'Término de búsqueda',
+                'verbose_name_plural': 'Términos de búsqueda',
+                'indexes': [models.Index(fields=['termino', 'propiedad', 'peso'], name='propiedades_termino_ad80b4_idx')],
+                'unique_together': {('propiedad', 'termino')},
+            },
+        ),
+        # La carga inicial del índice la hace 0029_reindexar_terminos_busqueda
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0016_terminobusqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='propiedad',
+            index=models.Index(fields=['estado', '-fecha_publicacion'], name='prop_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propiedad',
+            index=models.Index(fields=['propietario', 'fecha_publicacion'], name='prop_propietario_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propiedad',
+            index=models.Index(condition=models.Q(('estado', 'activa')), fields=['-fecha_publicacion'], name='prop_activa_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propiedad',
+            index=models.Index(condition=models.Q(('estado', 'activa')), fields=['tipo', '-fecha_publicacion'], name='prop_activa_tipo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propiedad',
+            index=models.Index(condition=models.Q(('estado', 'activa')), fields=['operacion', '-fecha_publicacion'], name='prop_activa_operacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propiedad',
+            index=models.Index(condition=models.Q(('estado', 'activa')), fields=['categoria', '-fecha_publicacion'], name='prop_activa_categoria_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propiedad',
+            index=models.Index(condition=models.Q(('estado', 'activa')), fields=['precio'], name='prop_activa_precio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propiedad',
+            index=models.Index(condition=models.Q(('estado', 'activa')), fields=['ciudad', 'distrito'], name='prop_activa_ubicacion_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propiedad',
+            index=models.Index(condition=models.Q(('especial_estudiantes', True), ('estado', 'activa')), fields=['-fecha_publicacion'], name='prop_activa_estudiantes_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:17
+
+from django.db import migrations, models
+
+
+AMENIDADES = [
+    'estacionamiento', 'amoblado', 'mascotas', 'incluye_expensas',
+    'balcon', 'patio', 'parrilla', 'aire_acondicionado', 'calefaccion', 'ascensor',
+    'seguridad', 'amenities', 'accesibilidad', 'especial_estudiantes',
+]
+
+
+def calcular_amenidades(apps, schema_editor):
+    """Empaqueta las amenidades de las propiedades existentes"""
+    Propiedad = apps.get_model('propiedades', 'Propiedad')
+    propiedades = list(Propiedad.objects.only('pk', *AMENIDADES))
+    for propiedad in propiedades:
+        propiedad.amenidades = sum(1 << bit for bit, campo in enumerate(AMENIDADES) if getattr(propiedad, campo))
+    Propiedad.objects.bulk_update(propiedades, ['amenidades'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0017_propiedad_indices_listado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propiedad',
+            name='amenidades',
+            field=models.IntegerField(default=0, editable=False, help_text='Máscara de bits de AMENIDADES (se calcula al guardar)'),
+        ),
+        migrations.AddIndex(
+            model_name='propiedad',
+            index=models.Index(condition=models.Q(('estado', 'activa')), fields=['amenidades', '-fecha_publicacion'], name='prop_activa_amenidades_idx'),
+        ),
+        migrations.RunPython(calcular_amenidades, migrations.RunPython.noop),
+    ]
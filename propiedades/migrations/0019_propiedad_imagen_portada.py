@@ -0,0 +1,32 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:19
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def asignar_portadas(apps, schema_editor):
+    """La portada de cada propiedad es su primera imagen según el orden"""
+    Propiedad = apps.get_model('propiedades', 'Propiedad')
+    ImagenPropiedad = apps.get_model('propiedades', 'ImagenPropiedad')
+    
+    portadas = {}
+    for imagen in ImagenPropiedad.objects.order_by('propiedad_id', 'orden', '-es_principal', 'pk').only('pk', 'propiedad_id'):
+        portadas.setdefault(imagen.propiedad_id, imagen.pk)
+    for propiedad_id, imagen_id in portadas.items():
+        Propiedad.objects.filter(pk=propiedad_id).update(imagen_portada_id=imagen_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0018_propiedad_amenidades'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propiedad',
+            name='imagen_portada',
+            field=models.ForeignKey(blank=True, editable=False, help_text='Primera imagen según el orden (se mantiene al crear/ordenar/eliminar imágenes)', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='propiedades.imagenpropiedad'),
+        ),
+        migrations.RunPython(asignar_portadas, migrations.RunPython.noop),
+    ]
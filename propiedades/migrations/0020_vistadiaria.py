@@ -0,0 +1,29 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0019_propiedad_imagen_portada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VistaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('vistas', models.IntegerField(default=0)),
+                ('propiedad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vistas_diarias', to='propiedades.propiedad')),
+            ],
+            options={
+                'verbose_name': 'Vistas diarias',
+                'verbose_name_plural': 'Vistas diarias',
+                'ordering': ['-fecha'],
+                'unique_together': {('propiedad', 'fecha')},
+            },
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:23
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+CAMPOS_PUBLICACION = ['claridad_informacion', 'coincidencia_fotos', 'ubicacion_correcta']
+CAMPOS_PROPIETARIO = ['tiempo_respuesta', 'trato', 'confiabilidad']
+
+
+def calcular_agregados(apps, schema_editor):
+    Propiedad = apps.get_model('propiedades', 'Propiedad')
+    Valoracion = apps.get_model('propiedades', 'Valoracion')
+    Perfil = apps.get_model('usuarios', 'Perfil')
+
+    expresiones = {'cantidad_valoraciones': Count('pk')}
+    for campo in CAMPOS_PUBLICACION:
+        expresiones[f'suma_{campo}'] = Sum(campo)
+        expresiones[f'conteo_{campo}'] = Count(campo)
+    for campo in CAMPOS_PROPIETARIO:
+        expresiones[f'suma_{campo}'] = Sum(campo)
+
+    for fila in Valoracion.objects.order_by().values('propiedad_id').annotate(**expresiones):
+        Propiedad.objects.filter(pk=fila['propiedad_id']).update(
+            **{campo: fila[campo] or 0 for campo in expresiones}
+        )
+
+    expresiones = {'total': Count('pk'), **{campo: Sum(campo) for campo in CAMPOS_PROPIETARIO}}
+    for fila in Valoracion.objects.order_by().values('propiedad__propietario_id').annotate(**expresiones):
+        suma = sum(fila[campo] or 0 for campo in CAMPOS_PROPIETARIO)
+        Perfil.objects.filter(usuario_id=fila['propiedad__propietario_id']).update(
+            total_valoraciones=fila['total'],
+            puntuacion_promedio=(Decimal(suma) / (3 * fila['total'])).quantize(Decimal('0.01')),
+            **{f'suma_{campo}': fila[campo] or 0 for campo in CAMPOS_PROPIETARIO}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0020_vistadiaria'),
+        ('usuarios', '0004_perfil_sumas_valoraciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propiedad',
+            name='cantidad_valoraciones',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propiedad',
+            name='conteo_claridad_informacion',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propiedad',
+            name='conteo_coincidencia_fotos',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propiedad',
+            name='conteo_ubicacion_correcta',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propiedad',
+            name='suma_claridad_informacion',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propiedad',
+            name='suma_coincidencia_fotos',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propiedad',
+            name='suma_confiabilidad',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propiedad',
+            name='suma_tiempo_respuesta',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propiedad',
+            name='suma_trato',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propiedad',
+            name='suma_ubicacion_correcta',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(calcular_agregados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0021_propiedad_agregados_valoraciones'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagenpropiedad',
+            name='variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Versiones redimensionadas: {tamaño: {webp, jpeg, ancho, alto}} (ver imagenes.py)'),
+        ),
+    ]
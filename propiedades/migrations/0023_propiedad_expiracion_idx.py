@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0022_imagenpropiedad_variantes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='propiedad',
+            index=models.Index(condition=models.Q(('estado', 'activa'), ('fecha_expiracion__isnull', False)), fields=['fecha_expiracion'], name='prop_activa_expiracion_idx'),
+        ),
+    ]
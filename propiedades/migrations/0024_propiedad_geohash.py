@@ -0,0 +1,33 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+def calcular_geohashes(apps, schema_editor):
+    """Geohash de las propiedades que ya tienen coordenadas"""
+    from propiedades.geo import codificar_geohash
+    Propiedad = apps.get_model('propiedades', 'Propiedad')
+    
+    con_coordenadas = Propiedad.objects.filter(latitud__isnull=False, longitud__isnull=False)
+    for pk, latitud, longitud in con_coordenadas.values_list('pk', 'latitud', 'longitud'):
+        Propiedad.objects.filter(pk=pk).update(geohash=codificar_geohash(latitud, longitud))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0023_propiedad_expiracion_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propiedad',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, help_text='Geohash de latitud/longitud para la búsqueda por mapa (se calcula al guardar, ver geo.py)', max_length=12),
+        ),
+        migrations.AddIndex(
+            model_name='propiedad',
+            index=models.Index(condition=models.Q(('estado', 'activa')), fields=['geohash'], name='prop_activa_geohash_idx'),
+        ),
+        migrations.RunPython(calcular_geohashes, migrations.RunPython.noop),
+    ]
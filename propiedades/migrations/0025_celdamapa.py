@@ -0,0 +1,52 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:44
+
+from django.db import migrations, models
+
+
+def cargar_celdas(apps, schema_editor):
+    """Carga inicial de las celdas con las propiedades activas existentes"""
+    Propiedad = apps.get_model('propiedades', 'Propiedad')
+    CeldaMapa = apps.get_model('propiedades', 'CeldaMapa')
+    
+    celdas = {}
+    activas = Propiedad.objects.filter(estado='activa').exclude(geohash='')
+    for geohash, latitud, longitud, precio in activas.values_list('geohash', 'latitud', 'longitud', 'precio'):
+        for nivel in range(1, 8):
+            celda = celdas.setdefault((nivel, geohash[:nivel]), CeldaMapa(
+                nivel=nivel, celda=geohash[:nivel], precio_min=precio, precio_max=precio
+            ))
+            celda.cantidad += 1
+            celda.suma_latitud += float(latitud)
+            celda.suma_longitud += float(longitud)
+            celda.precio_min = min(celda.precio_min, precio)
+            celda.precio_max = max(celda.precio_max, precio)
+    CeldaMapa.objects.bulk_create(celdas.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0024_propiedad_geohash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CeldaMapa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nivel', models.PositiveSmallIntegerField(help_text='Largo del prefijo de geohash')),
+                ('celda', models.CharField(max_length=12)),
+                ('cantidad', models.IntegerField(default=0)),
+                ('suma_latitud', models.FloatField(default=0)),
+                ('suma_longitud', models.FloatField(default=0)),
+                ('precio_min', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('precio_max', models.DecimalField(decimal_places=2, max_digits=10)),
+            ],
+            options={
+                'verbose_name': 'Celda del mapa',
+                'verbose_name_plural': 'Celdas del mapa',
+                'unique_together': {('nivel', 'celda')},
+            },
+        ),
+        migrations.RunPython(cargar_celdas, migrations.RunPython.noop),
+    ]
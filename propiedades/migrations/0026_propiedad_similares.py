@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0025_celdamapa'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propiedad',
+            name='similares',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Vecinas más cercanas entre las activas: [[id, distancia], ...] (ver similares.py)'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:51
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('propiedades', '0026_propiedad_similares'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propiedad',
+            name='recomendadas',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text='Activas con más interacciones en común: [[id, similitud], ...] (ver recomendaciones.py)'),
+        ),
+        migrations.CreateModel(
+            name='VistaUsuario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField()),
+                ('propiedad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vistas_usuarios', to='propiedades.propiedad')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vistas_propiedades', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Vista de usuario',
+                'verbose_name_plural': 'Vistas de usuarios',
+                'indexes': [models.Index(fields=['fecha'], name='propiedades_fecha_08d653_idx')],
+                'unique_together': {('usuario', 'propiedad')},
+            },
+        ),
+    ]
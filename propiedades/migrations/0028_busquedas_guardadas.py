@@ -0,0 +1,59 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('propiedades', '0027_recomendaciones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusquedaGuardada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=100)),
+                ('parametros', models.JSONField(default=dict, help_text='Parámetros GET del listado: {parámetro: valor}')),
+                ('avisar_email', models.BooleanField(default=False, help_text='Además de la notificación, avisar por email')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='busquedas_guardadas', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Búsqueda guardada',
+                'verbose_name_plural': 'Búsquedas guardadas',
+                'ordering': ['-fecha_creacion'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CoincidenciaBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(auto_now_add=True)),
+                ('busqueda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coincidencias', to='propiedades.busquedaguardada')),
+                ('propiedad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='coincidencias_busquedas', to='propiedades.propiedad')),
+            ],
+            options={
+                'verbose_name': 'Coincidencia de búsqueda',
+                'verbose_name_plural': 'Coincidencias de búsquedas',
+                'unique_together': {('busqueda', 'propiedad')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ClaveBusqueda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(db_index=True, max_length=60)),
+                ('busqueda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='claves', to='propiedades.busquedaguardada')),
+            ],
+            options={
+                'verbose_name': 'Clave de búsqueda',
+                'verbose_name_plural': 'Claves de búsquedas',
+                'unique_together': {('busqueda', 'clave')},
+            },
+        ),
+    ]
@@ -0,0 +1,78 @@
+import re
+import unicodedata
+from django.db import migrations
+
+# Copia congelada de la tokenización de propiedades/busqueda.py a la fecha de
+# esta migración: si el código vivo cambia, la migración sigue produciendo el
+# mismo índice (para reindexar con el código actual: reconstruir_indice_busqueda)
+PESOS_CAMPOS = {
+    'titulo': 3,
+    'ciudad': 2,
+    'distrito': 2,
+    'descripcion': 1,
+}
+
+STOPWORDS = {
+    'a', 'al', 'con', 'de', 'del', 'e', 'el', 'en', 'es', 'la', 'las', 'lo', 'los',
+    'o', 'para', 'por', 'que', 'se', 'sin', 'su', 'sus', 'u', 'un', 'una', 'unos',
+    'unas', 'y', 'muy', 'mas', 'como', 'este', 'esta', 'tiene',
+}
+
+LONGITUD_MAXIMA_TERMINO = 50
+
+_SEPARADORES = re.compile(r'[^a-z0-9]+')
+
+
+def normalizar_texto(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in texto if not unicodedata.combining(c)).lower()
+
+
+def reducir_termino(palabra):
+    if len(palabra) > 4 and palabra.endswith('ces'):
+        return palabra[:-3] + 'z'
+    if len(palabra) > 3 and palabra.endswith('s'):
+        palabra = palabra[:-1]
+    if len(palabra) > 3 and palabra.endswith('e'):
+        palabra = palabra[:-1]
+    return palabra
+
+
+def terminos_ponderados(propiedad):
+    pesos = {}
+    for campo, peso in PESOS_CAMPOS.items():
+        for palabra in _SEPARADORES.split(normalizar_texto(getattr(propiedad, campo))):
+            if len(palabra) < 2 or palabra in STOPWORDS:
+                continue
+            termino = reducir_termino(palabra)[:LONGITUD_MAXIMA_TERMINO]
+            pesos[termino] = pesos.get(termino, 0) + peso
+    return pesos
+
+
+def reindexar(apps, schema_editor):
+    """Términos con la reducción de plurales corregida (singular y plural en la misma raíz)"""
+    Propiedad = apps.get_model('propiedades', 'Propiedad')
+    TerminoBusqueda = apps.get_model('propiedades', 'TerminoBusqueda')
+    
+    TerminoBusqueda.objects.all().delete()
+    lote = []
+    for propiedad in Propiedad.objects.only(*PESOS_CAMPOS).order_by('pk').iterator(chunk_size=500):
+        lote.extend(
+            TerminoBusqueda(propiedad_id=propiedad.pk, termino=termino, peso=peso)
+            for termino, peso in terminos_ponderados(propiedad).items()
+        )
+        if len(lote) >= 500:
+            TerminoBusqueda.objects.bulk_create(lote)
+            lote = []
+    TerminoBusqueda.objects.bulk_create(lote)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0028_busquedas_guardadas'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindexar, migrations.RunPython.noop),
+    ]
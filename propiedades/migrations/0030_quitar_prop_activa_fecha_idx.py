@@ -0,0 +1,17 @@
+# Generated by Django 4.2.27 on 2026-10-18 14:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0029_reindexar_terminos_busqueda'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='propiedad',
+            name='prop_activa_fecha_idx',
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.27 on 2026-10-18 14:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('propiedades', '0030_quitar_prop_activa_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoIndice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=50, unique=True)),
+                ('datos', models.JSONField(default=dict)),
+                ('fecha_actualizacion', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estado de índice',
+                'verbose_name_plural': 'Estados de índices',
+            },
+        ),
+    ]
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
+from urllib.parse import urlencode
 from django.db import models
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator, MinLengthValidator, MaxLengthValidator
 
+from .geo import codificar_geohash
+
 class Categoria(models.Model):
     """Categorías de propiedades"""
     nombre = models.CharField(max_length=50, unique=True)
@@ -47,6 +50,14 @@ class Propiedad(models.Model):
         ('inactiva', 'Inactiva'),
     ]
     
+    # Características booleanas empaquetadas en el campo amenidades (bit = posición).
+    # Solo agregar al final: cambiar el orden invalida las máscaras guardadas.
+    AMENIDADES = [
+        'estacionamiento', 'amoblado', 'mascotas', 'incluye_expensas',
+        'balcon', 'patio', 'parrilla', 'aire_acondicionado', 'calefaccion', 'ascensor',
+        'seguridad', 'amenities', 'accesibilidad', 'especial_estudiantes',
+    ]
+    
     # Relaciones
     propietario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='publicaciones')
     categoria = models.ForeignKey(Categoria, on_delete=models.SET_NULL, null=True, blank=True, related_name='propiedades')
@@ -66,6 +77,7 @@ class Propiedad(models.Model):
     direccion = models.CharField(max_length=255)
     latitud = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
     longitud = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
+    geohash = models.CharField(max_length=12, blank=True, editable=False, help_text='Geohash de latitud/longitud para la búsqueda por mapa (se calcula al guardar, ver geo.py)')
     
     # Características
     area = models.DecimalField(max_digits=10, decimal_places=2, help_text='Área en m²')
@@ -97,6 +109,22 @@ class Propiedad(models.Model):
     vistas = models.IntegerField(default=0)
     destacada = models.BooleanField(default=False)
     especial_estudiantes = models.BooleanField(default=False, help_text='Propiedad especial para estudiantes')
+    imagen_portada = models.ForeignKey('ImagenPropiedad', on_delete=models.SET_NULL, null=True, blank=True, editable=False, related_name='+', help_text='Primera imagen según el orden (se mantiene al crear/ordenar/eliminar imágenes)')
+    amenidades = models.IntegerField(default=0, editable=False, help_text='Máscara de bits de AMENIDADES (se calcula al guardar)')
+    similares = models.JSONField(default=list, blank=True, editable=False, help_text='Vecinas más cercanas entre las activas: [[id, distancia], ...] (ver similares.py)')
+    recomendadas = models.JSONField(default=list, blank=True, editable=False, help_text='Activas con más interacciones en común: [[id, similitud], ...] (ver recomendaciones.py)')
+    
+    # Agregados de valoraciones (suma y cantidad por dimensión, ver puntuaciones.py)
+    cantidad_valoraciones = models.IntegerField(default=0, editable=False)
+    suma_claridad_informacion = models.IntegerField(default=0, editable=False)
+    conteo_claridad_informacion = models.IntegerField(default=0, editable=False)
+    suma_coincidencia_fotos = models.IntegerField(default=0, editable=False)
+    conteo_coincidencia_fotos = models.IntegerField(default=0, editable=False)
+    suma_ubicacion_correcta = models.IntegerField(default=0, editable=False)
+    conteo_ubicacion_correcta = models.IntegerField(default=0, editable=False)
+    suma_tiempo_respuesta = models.IntegerField(default=0, editable=False)
+    suma_trato = models.IntegerField(default=0, editable=False)
+    suma_confiabilidad = models.IntegerField(default=0, editable=False)
     
     # Fechas
     fecha_publicacion = models.DateTimeField(auto_now_add=True)
@@ -107,46 +135,125 @@ class Propiedad(models.Model):
         verbose_name = 'Propiedad'
         verbose_name_plural = 'Propiedades'
         ordering = ['-fecha_publicacion']
+        # Los listados públicos siempre filtran estado='activa' y ordenan por fecha:
+        # índices parciales sobre las activas para cada columna selectiva del filtro
+        indexes = [
+            models.Index(fields=['estado', '-fecha_publicacion'], name='prop_estado_fecha_idx'),
+            models.Index(fields=['propietario', 'fecha_publicacion'], name='prop_propietario_fecha_idx'),
+            models.Index(fields=['tipo', '-fecha_publicacion'], name='prop_activa_tipo_idx', condition=models.Q(estado='activa')),
+            models.Index(fields=['operacion', '-fecha_publicacion'], name='prop_activa_operacion_idx', condition=models.Q(estado='activa')),
+            models.Index(fields=['categoria', '-fecha_publicacion'], name='prop_activa_categoria_idx', condition=models.Q(estado='activa')),
+            models.Index(fields=['precio'], name='prop_activa_precio_idx', condition=models.Q(estado='activa')),
+            models.Index(fields=['ciudad', 'distrito'], name='prop_activa_ubicacion_idx', condition=models.Q(estado='activa')),
+            models.Index(fields=['-fecha_publicacion'], name='prop_activa_estudiantes_idx', condition=models.Q(estado='activa', especial_estudiantes=True)),
+            models.Index(fields=['amenidades', '-fecha_publicacion'], name='prop_activa_amenidades_idx', condition=models.Q(estado='activa')),
+            models.Index(fields=['fecha_expiracion'], name='prop_activa_expiracion_idx', condition=models.Q(estado='activa', fecha_expiracion__isnull=False)),
+            models.Index(fields=['geohash'], name='prop_activa_geohash_idx', condition=models.Q(estado='activa')),
+        ]
         
     def __str__(self):
         return self.titulo
     
-    def incrementar_vistas(self):
-        """Incrementa el contador de vistas"""
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Estado y ubicación guardados, para ajustar el índice de ubicaciones al cambiar
+        if not {'estado', 'ciudad', 'distrito'} & instancia.get_deferred_fields():
+            instancia._ubicacion_guardada = instancia.ubicacion_indexada()
+        # Y su punto en el mapa, para ajustar los clusters (ver mapa.py)
+        if not {'estado', 'geohash', 'latitud', 'longitud', 'precio'} & instancia.get_deferred_fields():
+            instancia._punto_guardado = instancia.punto_mapa()
+        # Y estado y precio, para avisar a quienes la tienen en favoritos (ver avisos_favoritos.py)
+        if not {'estado', 'precio'} & instancia.get_deferred_fields():
+            instancia._estado_precio_guardado = (instancia.estado, instancia.precio)
+        return instancia
+    
+    def ubicacion_indexada(self):
+        """(ciudad, distrito) si cuenta para el autocompletado (solo activas), o None"""
+        if self.estado != 'activa':
+            return None
+        return self.ciudad, self.distrito
+    
+    def punto_mapa(self):
+        """(geohash, latitud, longitud, precio) si cuenta para los clusters del mapa (activas con coordenadas), o None"""
+        if self.estado != 'activa' or not self.geohash:
+            return None
+        return self.geohash, float(self.latitud), float(self.longitud), self.precio
+    
+    def save(self, *args, **kwargs):
+        # Mantener la máscara de amenidades sincronizada con los campos booleanos
+        self.amenidades = self.calcular_amenidades()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and set(update_fields) & set(self.AMENIDADES) and 'amenidades' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['amenidades']
+        # Y el geohash con las coordenadas
+        self.geohash = codificar_geohash(self.latitud, self.longitud)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitud', 'longitud'} & set(update_fields) and 'geohash' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['geohash']
+        super().save(*args, **kwargs)
+    
+    def calcular_amenidades(self):
+        """Empaqueta los campos de AMENIDADES en un entero"""
+        mascara = 0
+        for bit, campo in enumerate(self.AMENIDADES):
+            if getattr(self, campo):
+                mascara |= 1 << bit
+        return mascara
+    
+    @classmethod
+    def mascara_amenidades(cls, campos):
+        """Máscara con los bits de los campos indicados"""
+        mascara = 0
+        for campo in campos:
+            mascara |= 1 << cls.AMENIDADES.index(campo)
+        return mascara
+    
+    def incrementar_vistas(self, usuario_id=None):
+        """Incrementa el contador de vistas (se escribe en lote, ver vistas.py)"""
+        from .vistas import registrar_vista
+        registrar_vista(self.pk, usuario_id)
         self.vistas += 1
-        self.save(update_fields=['vistas'])
     
     @property
     def imagen_principal(self):
-        """Retorna la primera imagen o None"""
-        return self.imagenes.first()
+        """Retorna la imagen de portada o None (listados: select_related('imagen_portada'))"""
+        return self.imagen_portada
     
     def puntuacion_promedio(self):
-        """Calcula la puntuación promedio de las valoraciones"""
-        valoraciones = self.valoraciones.all()
-        if valoraciones:
-            return sum(v.puntuacion for v in valoraciones) / len(valoraciones)
+        """
+        Puntuación promedio a partir de los agregados guardados (sin consultas).
+        Media de cada dimensión; publicación y propietario pesan lo mismo.
+        """
+        if not self.cantidad_valoraciones:
+            return None
+        propietario = sum(
+            getattr(self, f'suma_{campo}') for campo in Valoracion.CAMPOS_PROPIETARIO
+        ) / (len(Valoracion.CAMPOS_PROPIETARIO) * self.cantidad_valoraciones)
+        publicacion = [
+            getattr(self, f'suma_{campo}') / getattr(self, f'conteo_{campo}')
+            for campo in Valoracion.CAMPOS_PUBLICACION if getattr(self, f'conteo_{campo}')
+        ]
+        if not publicacion:
+            return propietario
+        return (sum(publicacion) / len(publicacion) + propietario) / 2
     
     def tiene_destacado_activo(self):
-        """Verifica si la propiedad tiene un destacado activo"""
+        """
+        Verifica si la propiedad tiene un destacado activo. Se filtra también
+        por fecha: barrer_vencimientos apaga los vencidos solo cada tanto.
+        """
         from django.utils import timezone
-        return self.destacados.filter(
-            activo=True,
-            fecha_fin__gt=timezone.now()
-        ).exists()
+        return self.destacados.filter(activo=True, fecha_fin__gt=timezone.now()).exists()
     
     def obtener_destacado_activo(self):
         """Obtiene el destacado activo actual de la propiedad"""
         from django.utils import timezone
-        return self.destacados.filter(
-            activo=True,
-            fecha_fin__gt=timezone.now()
-        ).first()
-        return 0
+        return self.destacados.filter(activo=True, fecha_fin__gt=timezone.now()).first()
     
     def total_valoraciones(self):
         """Retorna el total de valoraciones"""
-        return self.valoraciones.count()
+        return self.cantidad_valoraciones
 
 
 class ImagenPropiedad(models.Model):
@@ -156,6 +263,7 @@ class ImagenPropiedad(models.Model):
     orden = models.IntegerField(default=0)
     es_principal = models.BooleanField(default=False)
     fecha_subida = models.DateTimeField(auto_now_add=True)
+    variantes = models.JSONField(default=dict, blank=True, editable=False, help_text='Versiones redimensionadas: {tamaño: {webp, jpeg, ancho, alto}} (ver imagenes.py)')
     
     class Meta:
         verbose_name = 'Imagen de propiedad'
@@ -166,6 +274,40 @@ class ImagenPropiedad(models.Model):
         return f'Imagen {self.orden} de {self.propiedad.titulo}'
 
 
+class VistaDiaria(models.Model):
+    """Vistas por propiedad y día, para ver la tendencia sin escribir en cada visita"""
+    propiedad = models.ForeignKey(Propiedad, on_delete=models.CASCADE, related_name='vistas_diarias')
+    fecha = models.DateField()
+    vistas = models.IntegerField(default=0)
+    
+    class Meta:
+        verbose_name = 'Vistas diarias'
+        verbose_name_plural = 'Vistas diarias'
+        unique_together = ['propiedad', 'fecha']
+        ordering = ['-fecha']
+        
+    def __str__(self):
+        return f'{self.propiedad_id} - {self.fecha}: {self.vistas}'
+
+
+class VistaUsuario(models.Model):
+    """Última vista de cada usuario con sesión a cada propiedad (para las recomendaciones)"""
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='vistas_propiedades')
+    propiedad = models.ForeignKey(Propiedad, on_delete=models.CASCADE, related_name='vistas_usuarios')
+    fecha = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = 'Vista de usuario'
+        verbose_name_plural = 'Vistas de usuarios'
+        unique_together = ['usuario', 'propiedad']
+        indexes = [
+            models.Index(fields=['fecha']),
+        ]
+        
+    def __str__(self):
+        return f'{self.usuario_id} - {self.propiedad_id}: {self.fecha}'
+
+
 class Favorito(models.Model):
     """Propiedades marcadas como favoritas por usuarios"""
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='favoritos')
@@ -182,6 +324,59 @@ class Favorito(models.Model):
         return f'{self.usuario.username} - {self.propiedad.titulo}'
 
 
+class BusquedaGuardada(models.Model):
+    """Filtros del listado guardados por un usuario, con aviso de nuevas coincidencias (ver alertas.py)"""
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='busquedas_guardadas')
+    nombre = models.CharField(max_length=100)
+    parametros = models.JSONField(default=dict, help_text='Parámetros GET del listado: {parámetro: valor}')
+    avisar_email = models.BooleanField(default=False, help_text='Además de la notificación, avisar por email')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Búsqueda guardada'
+        verbose_name_plural = 'Búsquedas guardadas'
+        ordering = ['-fecha_creacion']
+        
+    def __str__(self):
+        return f'{self.usuario.username} - {self.nombre}'
+    
+    def consulta(self):
+        """Parámetros como query string del listado"""
+        return urlencode(sorted(self.parametros.items()))
+
+
+class ClaveBusqueda(models.Model):
+    """
+    Índice invertido de búsquedas guardadas: una fila por combinación de
+    tipo|operación|ciudad|banda de precio que acepta la búsqueda ('*' = cualquiera)
+    """
+    busqueda = models.ForeignKey(BusquedaGuardada, on_delete=models.CASCADE, related_name='claves')
+    clave = models.CharField(max_length=60, db_index=True)
+    
+    class Meta:
+        verbose_name = 'Clave de búsqueda'
+        verbose_name_plural = 'Claves de búsquedas'
+        unique_together = ['busqueda', 'clave']
+        
+    def __str__(self):
+        return self.clave
+
+
+class CoincidenciaBusqueda(models.Model):
+    """Propiedad ya avisada para una búsqueda guardada (no se avisa dos veces)"""
+    busqueda = models.ForeignKey(BusquedaGuardada, on_delete=models.CASCADE, related_name='coincidencias')
+    propiedad = models.ForeignKey(Propiedad, on_delete=models.CASCADE, related_name='coincidencias_busquedas')
+    fecha = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Coincidencia de búsqueda'
+        verbose_name_plural = 'Coincidencias de búsquedas'
+        unique_together = ['busqueda', 'propiedad']
+        
+    def __str__(self):
+        return f'{self.busqueda_id} - {self.propiedad_id}'
+
+
 class Valoracion(models.Model):
     """Valoraciones de propiedades y propietarios"""
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='valoraciones')
@@ -207,6 +402,9 @@ class Valoracion(models.Model):
     reportada = models.BooleanField(default=False)
     total_reportes = models.IntegerField(default=0)
     
+    CAMPOS_PUBLICACION = ['claridad_informacion', 'coincidencia_fotos', 'ubicacion_correcta']
+    CAMPOS_PROPIETARIO = ['tiempo_respuesta', 'trato', 'confiabilidad']
+    
     class Meta:
         verbose_name = 'Valoración'
         verbose_name_plural = 'Valoraciones'
@@ -216,6 +414,18 @@ class Valoracion(models.Model):
     def __str__(self):
         return f'{self.usuario.username} - {self.propiedad.titulo} - {self.promedio_total():.1f}⭐'
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Puntajes guardados: al editar solo se aplica la diferencia a los agregados
+        if not instancia.get_deferred_fields():
+            instancia._puntajes_guardados = instancia.puntajes()
+        return instancia
+    
+    def puntajes(self):
+        """Retorna {campo: valor} de todas las dimensiones valoradas"""
+        return {campo: getattr(self, campo) for campo in self.CAMPOS_PUBLICACION + self.CAMPOS_PROPIETARIO}
+    
     def promedio_publicacion(self):
         """Promedio de valoración de la publicación (solo si tiene valores)"""
         campos = [self.claridad_informacion, self.coincidencia_fotos, self.ubicacion_correcta]
@@ -291,6 +501,13 @@ class Destacado(models.Model):
         'premium': {7: 59.90, 15: 99.90, 30: 149.90},
     }
     
+    # Peso de cada plan en el algoritmo de ordenamiento
+    PESO_PLAN = {
+        'Avanzado': 1000,
+        'Intermedio': 500,
+        'Básico': 100,
+    }
+    
     propiedad = models.ForeignKey(Propiedad, on_delete=models.CASCADE, related_name='destacados')
     tipo = models.CharField(max_length=20, choices=TIPO_CHOICES, default='normal')
     duracion_dias = models.IntegerField(choices=DURACION_CHOICES)
@@ -301,6 +518,7 @@ class Destacado(models.Model):
     fecha_compra = models.DateTimeField(auto_now_add=True)
     
     activo = models.BooleanField(default=True)
+    prioridad = models.IntegerField(default=0, editable=False, help_text='Prioridad materializada para el ranking de la portada')
     
     class Meta:
         verbose_name = 'Destacado'
@@ -309,6 +527,7 @@ class Destacado(models.Model):
         indexes = [
             models.Index(fields=['activo', 'fecha_fin']),
             models.Index(fields=['tipo', 'fecha_inicio']),
+            models.Index(fields=['activo', 'prioridad']),
         ]
     
     def __str__(self):
@@ -331,29 +550,38 @@ class Destacado(models.Model):
         """Obtiene el precio para un tipo y duración específicos"""
         return cls.PRECIOS.get(tipo, {}).get(duracion, 0)
     
-    def calcular_prioridad(self):
+    def save(self, *args, **kwargs):
+        # La prioridad se materializa en cada escritura para que la portada no la recalcule
+        self.prioridad = self.calcular_prioridad()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'prioridad' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['prioridad']
+        super().save(*args, **kwargs)
+    
+    def calcular_prioridad(self, plan_nombre=None):
         """
         Calcula la prioridad de la propiedad para el algoritmo de ordenamiento.
         Mayor número = mayor prioridad
+        
+        Si se indica plan_nombre ('' = sin plan) se usa directamente para
+        recalcular en lote; si no, se consulta la suscripción del propietario.
         """
+        from django.utils import timezone
         from suscripciones.models import Suscripcion
         
         prioridad = 0
         
         # 1. Prioridad por Plan (más peso)
-        suscripcion = Suscripcion.objects.filter(
-            usuario=self.propiedad.propietario,
-            estado='activa'
-        ).first()
+        if plan_nombre is None:
+            suscripcion = Suscripcion.objects.filter(
+                usuario_id=self.propiedad.propietario_id,
+                estado='activa'
+            ).select_related('plan').first()
+            
+            if suscripcion and suscripcion.esta_activa():
+                plan_nombre = suscripcion.plan.nombre
         
-        if suscripcion and suscripcion.esta_activa():
-            plan_nombre = suscripcion.plan.nombre
-            if plan_nombre == 'Avanzado':
-                prioridad += 1000
-            elif plan_nombre == 'Intermedio':
-                prioridad += 500
-            elif plan_nombre == 'Básico':
-                prioridad += 100
+        prioridad += self.PESO_PLAN.get(plan_nombre, 0)
         
         # 2. Prioridad por Tipo de Destacado
         if self.tipo == 'premium':
@@ -363,6 +591,67 @@ class Destacado(models.Model):
         
         # 3. Prioridad por fecha de compra (más reciente = más prioridad)
         # Usamos timestamp en segundos para tener granularidad fina
-        prioridad += int(self.fecha_compra.timestamp() / 1000)
+        fecha_compra = self.fecha_compra or timezone.now()
+        prioridad += int(fecha_compra.timestamp() / 1000)
         
         return prioridad
+
+
+class TerminoBusqueda(models.Model):
+    """Índice invertido para la búsqueda de texto libre (ver busqueda.py)"""
+    propiedad = models.ForeignKey(Propiedad, on_delete=models.CASCADE, related_name='terminos_busqueda')
+    termino = models.CharField(max_length=50)
+    peso = models.IntegerField(default=1)
+    
+    class Meta:
+        verbose_name = 'Término de búsqueda'
+        verbose_name_plural = 'Términos de búsqueda'
+        unique_together = ['propiedad', 'termino']
+        indexes = [
+            models.Index(fields=['termino', 'propiedad', 'peso']),
+        ]
+        
+    def __str__(self):
+        return f'{self.termino} ({self.peso}) - {self.propiedad_id}'
+
+
+class CeldaMapa(models.Model):
+    """Agregados de las propiedades activas por celda de geohash, en cada nivel de la grilla (ver mapa.py)"""
+    nivel = models.PositiveSmallIntegerField(help_text='Largo del prefijo de geohash')
+    celda = models.CharField(max_length=12)
+    cantidad = models.IntegerField(default=0)
+    suma_latitud = models.FloatField(default=0)
+    suma_longitud = models.FloatField(default=0)
+    precio_min = models.DecimalField(max_digits=10, decimal_places=2)
+    precio_max = models.DecimalField(max_digits=10, decimal_places=2)
+    
+    class Meta:
+        verbose_name = 'Celda del mapa'
+        verbose_name_plural = 'Celdas del mapa'
+        unique_together = ['nivel', 'celda']
+        
+    def __str__(self):
+        return f'{self.celda} ({self.cantidad})'
+
+
+class EstadoIndice(models.Model):
+    """Estado guardado entre corridas de un índice precalculado (escala de similares.py, marca de recomendaciones.py)"""
+    nombre = models.CharField(max_length=50, unique=True)
+    datos = models.JSONField(default=dict)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Estado de índice'
+        verbose_name_plural = 'Estados de índices'
+        
+    def __str__(self):
+        return self.nombre
+    
+    @classmethod
+    def leer(cls, nombre):
+        """Datos guardados bajo el nombre, o None si el índice nunca se construyó"""
+        return cls.objects.filter(nombre=nombre).values_list('datos', flat=True).first()
+    
+    @classmethod
+    def guardar(cls, nombre, datos):
+        cls.objects.update_or_create(nombre=nombre, defaults={'datos': datos})
@@ -0,0 +1,223 @@
+"""
+Paginación por cursor (keyset) para los listados de propiedades.
+
+En lugar de COUNT(*) + OFFSET, cada página se pide "a partir de" la última
+fila vista: WHERE (fecha, id) < (fecha_cursor, id_cursor) ORDER BY fecha DESC,
+id DESC LIMIT n. El costo de la página 500 es el mismo que el de la página 1.
+El total que se muestra en el encabezado es aproximado y se guarda en cache.
+"""
+import base64
+import binascii
+import hashlib
+import json
+import math
+from datetime import datetime
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+CACHE_CONTEO_TIMEOUT = 120  # segundos
+
+# Tipo de valor esperado en el cursor según el tipo interno del campo de orden
+TIPOS_CURSOR = {
+    'DateTimeField': 'fecha',
+    'AutoField': 'entero',
+    'BigAutoField': 'entero',
+    'SmallAutoField': 'entero',
+    'IntegerField': 'entero',
+    'BigIntegerField': 'entero',
+    'SmallIntegerField': 'entero',
+    'PositiveIntegerField': 'entero',
+    'PositiveBigIntegerField': 'entero',
+    'PositiveSmallIntegerField': 'entero',
+    'FloatField': 'numero',
+    'DecimalField': 'numero',
+}
+
+
+def contar_aproximado(queryset, timeout=CACHE_CONTEO_TIMEOUT):
+    """COUNT(*) cacheado por consulta: puede estar desfasado hasta `timeout` segundos"""
+    clave = 'conteo:' + hashlib.md5(str(queryset.query).encode('utf-8')).hexdigest()
+    total = cache.get(clave)
+    if total is None:
+        total = queryset.count()
+        cache.set(clave, total, timeout)
+    return total
+
+
+def _codificar_cursor(valores):
+    datos = [v.isoformat() if isinstance(v, datetime) else v for v in valores]
+    return base64.urlsafe_b64encode(json.dumps(datos).encode('utf-8')).decode('ascii')
+
+
+def _valor_valido(valor, tipo):
+    """
+    Si el valor decodificado corresponde al tipo del campo de orden. None no se
+    acepta en ningún caso: los campos de orden no son nulos y `campo__lt=None`
+    falla al armar la consulta.
+    """
+    if isinstance(valor, bool):
+        return False
+    if tipo in ('pk', 'entero'):
+        return isinstance(valor, int)
+    if tipo == 'numero':
+        return isinstance(valor, (int, float))
+    return isinstance(valor, str)
+
+
+def _decodificar_cursor(cursor, tipos):
+    """
+    Retorna la lista de valores del cursor o None si es inválido.
+
+    Cada valor se contrasta con el tipo de su campo de orden ('pk', 'fecha',
+    'entero', 'numero' o 'texto'): un cursor manipulado no debe llegar al
+    filtro de la consulta, se trata como si no hubiera cursor (primera página).
+    """
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if not isinstance(datos, list) or len(datos) != len(tipos):
+            return None
+        if not all(_valor_valido(v, tipo) for v, tipo in zip(datos, tipos)):
+            return None
+        return [datetime.fromisoformat(v) if tipo == 'fecha' else v for v, tipo in zip(datos, tipos)]
+    except (ValueError, TypeError, binascii.Error):
+        return None
+
+
+class PaginaCursor:
+    """Página con la misma interfaz que usan los templates de django.core.paginator.Page"""
+
+    def __init__(self, object_list, paginador, params, number, cursor_anterior, cursor_siguiente):
+        self.object_list = object_list
+        self.paginator = paginador
+        self.number = number
+        self._params = params
+        self.cursor_anterior = cursor_anterior
+        self.cursor_siguiente = cursor_siguiente
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, indice):
+        return self.object_list[indice]
+
+    def has_next(self):
+        return self.cursor_siguiente is not None
+
+    def has_previous(self):
+        return self.cursor_anterior is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def _querystring(self, **cambios):
+        params = self._params.copy()
+        for clave in ('despues', 'antes', 'page'):
+            params.pop(clave, None)
+        for clave, valor in cambios.items():
+            params[clave] = valor
+        return params.urlencode()
+
+    @property
+    def query_primera(self):
+        return self._querystring()
+
+    @property
+    def query_anterior(self):
+        return self._querystring(antes=self.cursor_anterior, page=self.number - 1)
+
+    @property
+    def query_siguiente(self):
+        return self._querystring(despues=self.cursor_siguiente, page=self.number + 1)
+
+
+class PaginadorCursor:
+    """
+    Pagina un queryset ordenado de forma descendente por `campos` + pk.
+
+    Args:
+        queryset: QuerySet a paginar (se reordena por campos + pk)
+        por_pagina: Elementos por página
+        campos: Campos de orden descendente (ej. ['fecha_publicacion'] o
+            ['relevancia', 'fecha_publicacion'] para la búsqueda por texto)
+    """
+
+    def __init__(self, queryset, por_pagina, campos=('fecha_publicacion',)):
+        self.campos = list(campos) + ['pk']
+        self.queryset = queryset.order_by(*[f'-{campo}' for campo in self.campos])
+        self.por_pagina = por_pagina
+
+    @cached_property
+    def count(self):
+        return contar_aproximado(self.queryset.order_by())
+
+    @property
+    def num_pages(self):
+        return max(1, math.ceil(self.count / self.por_pagina))
+
+    def _tipos(self):
+        """Tipo de cada campo del cursor, según el campo del modelo o la salida de la anotación"""
+        tipos = []
+        for campo in self.campos:
+            if campo == 'pk':
+                tipos.append('pk')
+                continue
+            if campo in self.queryset.query.annotations:
+                campo_modelo = self.queryset.query.annotations[campo].output_field
+            else:
+                campo_modelo = self.queryset.model._meta.get_field(campo)
+            tipos.append(TIPOS_CURSOR.get(campo_modelo.get_internal_type(), 'texto'))
+        return tipos
+
+    def _condicion(self, valores, posteriores):
+        """(c1, c2, ..., pk) < valores en orden lexicográfico (o > si posteriores)"""
+        operador = 'gt' if posteriores else 'lt'
+        condicion = Q()
+        for i, campo in enumerate(self.campos):
+            tramo = Q(**{f'{campo}__{operador}': valores[i]})
+            for previo, valor in zip(self.campos[:i], valores[:i]):
+                tramo &= Q(**{previo: valor})
+            condicion |= tramo
+        return condicion
+
+    def _valores(self, objeto):
+        return [getattr(objeto, campo) for campo in self.campos]
+
+    def get_page(self, params):
+        """
+        Página indicada por los parámetros GET 'despues' o 'antes' (cursores).
+        Sin cursor (o con un cursor inválido) se devuelve la primera página.
+        """
+        tipos = self._tipos()
+        despues = _decodificar_cursor(params.get('despues', ''), tipos) if params.get('despues') else None
+        antes = _decodificar_cursor(params.get('antes', ''), tipos) if params.get('antes') else None
+        numero = params.get('page', '')
+        numero = int(numero) if numero.isdigit() and (despues or antes) else 1
+
+        if antes:
+            # Página anterior: se recorre hacia atrás y se invierte
+            filas = list(
+                self.queryset.filter(self._condicion(antes, posteriores=True))
+                .reverse()[:self.por_pagina + 1]
+            )
+            hay_mas_antes = len(filas) > self.por_pagina
+            filas = list(reversed(filas[:self.por_pagina]))
+            hay_previa, hay_siguiente = hay_mas_antes, True
+        else:
+            queryset = self.queryset
+            if despues:
+                queryset = queryset.filter(self._condicion(despues, posteriores=False))
+            filas = list(queryset[:self.por_pagina + 1])
+            hay_siguiente = len(filas) > self.por_pagina
+            filas = filas[:self.por_pagina]
+            hay_previa = despues is not None
+
+        if not filas:
+            return PaginaCursor([], self, params, 1, None, None)
+
+        cursor_anterior = _codificar_cursor(self._valores(filas[0])) if hay_previa else None
+        cursor_siguiente = _codificar_cursor(self._valores(filas[-1])) if hay_siguiente else None
+        return PaginaCursor(filas, self, params, max(numero, 1), cursor_anterior, cursor_siguiente)
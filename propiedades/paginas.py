@@ -0,0 +1,94 @@
+"""
+Cache de páginas completas para visitantes anónimos.
+
+Las páginas públicas del catálogo (inicio, listado, estudiantes, inversiones)
+se guardan enteras, por ruta y querystring normalizado, bajo un número de
+generación del catálogo. Cualquier cambio en propiedades, destacados o
+imágenes incrementa la generación (invalidar_paginas) y con ello deja sin uso
+todas las páginas guardadas a la vez. La generación también es el ETag, así
+que navegadores y proxies revalidan con un 304 sin cuerpo.
+
+La generación se incrementa también desde procesar_tareas y los comandos
+programados (vencimientos, suspensiones en bloque), así que depende de la
+cache compartida de settings.CACHES; con una cache por proceso cada servidor
+seguiría mostrando la generación vieja hasta CACHE_PAGINAS_TIMEOUT. El
+incremento se hace al confirmar la transacción, para que ninguna petición
+guarde bajo la nueva generación una página armada con datos sin confirmar.
+"""
+import functools
+import hashlib
+import time
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+CACHE_GENERACION = 'paginas:generacion'
+CACHE_PAGINAS_TIMEOUT = 600  # segundos
+
+
+def generacion_catalogo():
+    generacion = cache.get(CACHE_GENERACION)
+    if generacion is None:
+        generacion = time.time_ns()
+        if not cache.add(CACHE_GENERACION, generacion, None):
+            generacion = cache.get(CACHE_GENERACION, generacion)
+    return generacion
+
+
+def _incrementar_generacion():
+    try:
+        cache.incr(CACHE_GENERACION)
+    except ValueError:
+        pass  # Sin generación guardada la próxima lectura crea una nueva
+
+
+def invalidar_paginas():
+    """Nueva generación del catálogo: las páginas guardadas dejan de servirse"""
+    transaction.on_commit(_incrementar_generacion)
+
+
+def _clave(request, generacion):
+    """Clave por ruta y parámetros ordenados, sin los vacíos (?tipo=&page=2 == ?page=2)"""
+    parametros = sorted(
+        (clave, valor) for clave, valores in request.GET.lists() for valor in valores if valor
+    )
+    firma = hashlib.md5(f'{request.path}?{parametros}'.encode('utf-8')).hexdigest()
+    return f'pagina:{generacion}:{firma}'
+
+
+def _cacheable(request):
+    # Con mensajes pendientes (ej. "Sesión cerrada") la página es única para esa visita
+    return (
+        request.method in ('GET', 'HEAD')
+        and not request.user.is_authenticated
+        and not len(messages.get_messages(request))
+    )
+
+
+def cachear_para_anonimos(vista):
+    """Sirve la vista desde la cache para anónimos; sin efecto para usuarios con sesión"""
+    @functools.wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if not _cacheable(request):
+            return vista(request, *args, **kwargs)
+
+        generacion = generacion_catalogo()
+        etag = f'"{generacion}"'
+        no_modificada = get_conditional_response(request, etag=etag)
+        if no_modificada is not None:
+            no_modificada['ETag'] = etag
+            return no_modificada
+
+        clave = _clave(request, generacion)
+        respuesta = cache.get(clave)
+        if respuesta is None:
+            respuesta = vista(request, *args, **kwargs)
+            # Una página con token CSRF o cookies propias no se comparte
+            if respuesta.status_code == 200 and not respuesta.cookies and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+                respuesta['ETag'] = etag
+                patch_cache_control(respuesta, public=True, max_age=0, must_revalidate=True)
+                patch_vary_headers(respuesta, ['Cookie'])
+                cache.set(clave, respuesta, CACHE_PAGINAS_TIMEOUT)
+        return respuesta
+    return envoltura
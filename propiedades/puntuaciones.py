@@ -0,0 +1,133 @@
+"""
+Agregados de valoraciones mantenidos en forma incremental.
+
+Propiedad guarda suma y cantidad por dimensión de sus valoraciones y Perfil
+las sumas de las dimensiones del propietario. Al crear, editar o eliminar
+una Valoracion se aplica solo la diferencia con un UPDATE atómico
+(campo = campo + delta), sin leer el resto de las valoraciones.
+reconciliar_puntuaciones() recalcula todo desde cero como respaldo.
+"""
+from django.db.models import Count, F, FloatField, Sum, Value
+from django.db.models.expressions import Case, When
+from django.db.models.lookups import GreaterThan
+from usuarios.models import Perfil
+
+from .models import Propiedad, Valoracion
+
+# Campos agregados de Propiedad
+CAMPOS_AGREGADOS = ['cantidad_valoraciones'] + [
+    f'{prefijo}_{campo}' for campo in Valoracion.CAMPOS_PUBLICACION for prefijo in ('suma', 'conteo')
+] + [f'suma_{campo}' for campo in Valoracion.CAMPOS_PROPIETARIO]
+
+# Campos de Propiedad que también se acumulan en el Perfil del propietario
+CAMPOS_PERFIL = {
+    'cantidad_valoraciones': 'total_valoraciones',
+    **{f'suma_{campo}': f'suma_{campo}' for campo in Valoracion.CAMPOS_PROPIETARIO},
+}
+
+
+def _aportes(puntajes):
+    """Lo que aporta una valoración a los agregados de Propiedad (None = ninguna)"""
+    if puntajes is None:
+        return {}
+    aportes = {'cantidad_valoraciones': 1}
+    for campo in Valoracion.CAMPOS_PUBLICACION:
+        aportes[f'suma_{campo}'] = puntajes[campo] or 0
+        aportes[f'conteo_{campo}'] = 0 if puntajes[campo] is None else 1
+    for campo in Valoracion.CAMPOS_PROPIETARIO:
+        aportes[f'suma_{campo}'] = puntajes[campo]
+    return aportes
+
+
+def _promedio_perfil(nuevos):
+    """Expresión de puntuacion_promedio con los valores posteriores al UPDATE"""
+    suma = sum((nuevos[f'suma_{campo}'] for campo in Valoracion.CAMPOS_PROPIETARIO), Value(0))
+    total = nuevos['total_valoraciones']
+    return Case(
+        When(GreaterThan(total, 0), then=suma * Value(1.0) / (total * Value(len(Valoracion.CAMPOS_PROPIETARIO)))),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def aplicar_valoracion(propiedad_id, antes, despues):
+    """
+    Aplica a los agregados el cambio de una valoración.
+
+    Args:
+        propiedad_id: Propiedad valorada
+        antes: puntajes() guardados previamente, o None si es nueva
+        despues: puntajes() actuales, o None si se eliminó
+    """
+    nuevos, previos = _aportes(despues), _aportes(antes)
+    deltas = {campo: nuevos.get(campo, 0) - previos.get(campo, 0) for campo in nuevos.keys() | previos.keys()}
+    deltas = {campo: delta for campo, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    Propiedad.objects.filter(pk=propiedad_id).update(
+        **{campo: F(campo) + delta for campo, delta in deltas.items()}
+    )
+
+    if any(deltas.get(campo) for campo in CAMPOS_PERFIL):
+        valores_perfil = {
+            campo_perfil: F(campo_perfil) + deltas.get(campo, 0)
+            for campo, campo_perfil in CAMPOS_PERFIL.items()
+        }
+        Perfil.objects.filter(usuario__publicaciones=propiedad_id).update(
+            puntuacion_promedio=_promedio_perfil(valores_perfil),
+            **valores_perfil
+        )
+
+
+def _agregados(agrupar_por, campos):
+    """Una sola consulta agregada: {clave: {campo: valor}}"""
+    expresiones = {'cantidad_valoraciones': Count('pk')}
+    for campo in campos:
+        expresiones[f'suma_{campo}'] = Sum(campo)
+        if campo in Valoracion.CAMPOS_PUBLICACION:
+            expresiones[f'conteo_{campo}'] = Count(campo)
+    filas = Valoracion.objects.order_by().values(agrupar_por).annotate(**expresiones)
+    return {
+        fila[agrupar_por]: {campo: fila[campo] or 0 for campo in expresiones}
+        for fila in filas
+    }
+
+
+def reconciliar_puntuaciones(tamano_lote=500):
+    """
+    Recalcula los agregados de todas las propiedades y perfiles.
+
+    Returns:
+        tuple: (propiedades corregidas, perfiles corregidos)
+    """
+    campos = Valoracion.CAMPOS_PUBLICACION + Valoracion.CAMPOS_PROPIETARIO
+    por_propiedad = _agregados('propiedad_id', campos)
+    ceros = dict.fromkeys(CAMPOS_AGREGADOS, 0)
+
+    propiedades = []
+    for propiedad in Propiedad.objects.only('pk', *CAMPOS_AGREGADOS).iterator(chunk_size=tamano_lote):
+        esperado = por_propiedad.get(propiedad.pk, ceros)
+        if any(getattr(propiedad, campo) != valor for campo, valor in esperado.items()):
+            for campo, valor in esperado.items():
+                setattr(propiedad, campo, valor)
+            propiedades.append(propiedad)
+    Propiedad.objects.bulk_update(propiedades, CAMPOS_AGREGADOS, batch_size=tamano_lote)
+
+    por_propietario = _agregados('propiedad__propietario_id', Valoracion.CAMPOS_PROPIETARIO)
+    campos_perfil = ['total_valoraciones', 'puntuacion_promedio'] + [f'suma_{campo}' for campo in Valoracion.CAMPOS_PROPIETARIO]
+
+    perfiles = []
+    for perfil in Perfil.objects.only('pk', 'usuario_id', *campos_perfil).iterator(chunk_size=tamano_lote):
+        esperado = por_propietario.get(perfil.usuario_id, {})
+        valores = {CAMPOS_PERFIL[campo]: esperado.get(campo, 0) for campo in CAMPOS_PERFIL}
+        actual = {campo: getattr(perfil, campo) for campo in valores}
+        for campo, valor in valores.items():
+            setattr(perfil, campo, valor)
+        promedio = perfil.calcular_promedio()
+        if actual != valores or perfil.puntuacion_promedio != promedio:
+            perfil.puntuacion_promedio = promedio
+            perfiles.append(perfil)
+    Perfil.objects.bulk_update(perfiles, campos_perfil, batch_size=tamano_lote)
+
+    return len(propiedades), len(perfiles)
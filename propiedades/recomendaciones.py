@@ -0,0 +1,263 @@
+"""
+Recomendaciones ítem a ítem: "quienes guardaron esta también guardaron" en
+el detalle y la fila personalizada de la portada.
+
+Las interacciones de cada usuario (favoritos, solicitudes de contacto y
+vistas con sesión iniciada, ponderadas con PESOS_EVENTOS) forman una matriz
+dispersa usuario × propiedad en formato coordenado (arreglos de NumPy). La
+co-ocurrencia entre propiedades es XᵀX, calculada expandiendo por bloques
+los pares de propiedades de cada usuario, y la similitud es el coseno. Las
+RECOMENDADAS más similares (activas) de cada propiedad se guardan en
+Propiedad.recomendadas.
+
+manage.py reconstruir_recomendaciones recalcula todo. Con --incremental solo
+recalcula las listas de las propiedades que tocaron los usuarios con
+interacciones nuevas desde la corrida anterior (la marca se guarda en
+EstadoIndice), y solo lee las interacciones de los usuarios a dos saltos de
+ellas: las necesarias para sus co-ocurrencias y para las normas de las
+columnas con que se comparan. Las demás listas pueden quedar con
+similitudes algo viejas hasta la próxima reconstrucción completa.
+
+La fila personalizada suma las listas precalculadas de las últimas
+propiedades con las que interactuó el usuario y se guarda en cache.
+"""
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+from django.core.cache import cache
+from django.utils import timezone
+from contactos.models import SolicitudContacto
+
+from .models import EstadoIndice, Favorito, Propiedad, VistaUsuario
+
+PESOS_EVENTOS = {
+    'contacto': 5.0,
+    'favorito': 3.0,
+    'vista': 1.0,
+}
+RECOMENDADAS = 8
+MAXIMO_INTERACCIONES_USUARIO = 200  # las más recientes: acota los pares por usuario
+PARES_POR_BLOQUE = 2_000_000
+TAMANO_IN = 500  # ids por consulta en los saltos de la corrida incremental
+
+ESTADO_RECOMENDACIONES = 'recomendaciones'  # EstadoIndice: {'marca': fecha de la última corrida}
+CACHE_RECOMENDADAS_USUARIO = 'recomendaciones:usuario:{}'
+CACHE_RECOMENDADAS_USUARIO_TIMEOUT = 3600  # segundos
+INTERACCIONES_RECIENTES = 20
+
+
+def _consultas_eventos():
+    """(consulta, campo de fecha, peso) de cada fuente de interacciones"""
+    return [
+        (Favorito.objects.order_by(), 'fecha_agregado', PESOS_EVENTOS['favorito']),
+        (SolicitudContacto.objects.order_by(), 'fecha_solicitud', PESOS_EVENTOS['contacto']),
+        (VistaUsuario.objects.order_by(), 'fecha', PESOS_EVENTOS['vista']),
+    ]
+
+
+def _por_lotes(consulta, campo, ids):
+    """La consulta filtrada por campo__in, en lotes de TAMANO_IN ids"""
+    ids = sorted(ids)
+    for inicio in range(0, len(ids), TAMANO_IN):
+        yield consulta.filter(**{f'{campo}__in': ids[inicio:inicio + TAMANO_IN]})
+
+
+def _relacionados(campo, ids, destino):
+    """Valores distintos de `destino` en las interacciones cuyo `campo` está en ids"""
+    resultado = set()
+    for consulta, _, _ in _consultas_eventos():
+        for lote in _por_lotes(consulta, campo, ids):
+            resultado.update(lote.values_list(destino, flat=True).distinct())
+    return resultado
+
+
+def _eventos(usuario_ids=None):
+    """Arreglos (usuarios, propiedades, pesos, fechas) de las interacciones de todos o de los usuarios indicados"""
+    usuarios, propiedades, pesos, fechas = [], [], [], []
+    for consulta, campo_fecha, peso in _consultas_eventos():
+        lotes = [consulta] if usuario_ids is None else _por_lotes(consulta, 'usuario_id', usuario_ids)
+        for lote in lotes:
+            for usuario_id, propiedad_id, fecha in lote.values_list('usuario_id', 'propiedad_id', campo_fecha).iterator():
+                usuarios.append(usuario_id)
+                propiedades.append(propiedad_id)
+                pesos.append(peso)
+                fechas.append(fecha.timestamp())
+    return (
+        np.array(usuarios, dtype=np.int64), np.array(propiedades, dtype=np.int64),
+        np.array(pesos, dtype=float), np.array(fechas, dtype=float),
+    )
+
+
+def _usuarios_nuevos(marca):
+    """Usuarios con interacciones posteriores a la marca"""
+    desde = datetime.fromisoformat(marca)
+    usuarios = set()
+    for consulta, campo_fecha, _ in _consultas_eventos():
+        usuarios.update(consulta.filter(**{f'{campo_fecha}__gt': desde}).values_list('usuario_id', flat=True).distinct())
+    return usuarios
+
+
+def _matriz(usuarios, propiedades, pesos, fechas):
+    """
+    Entradas de la matriz usuario × propiedad: suma de pesos por par, y solo
+    las MAXIMO_INTERACCIONES_USUARIO más recientes de cada usuario.
+
+    Returns:
+        tuple: (usuarios, propiedades, pesos) ordenados por usuario
+    """
+    pares, inversa = np.unique(np.column_stack([usuarios, propiedades]), axis=0, return_inverse=True)
+    inversa = inversa.ravel()
+    peso = np.bincount(inversa, weights=pesos, minlength=len(pares))
+    ultima = np.full(len(pares), -np.inf)
+    np.maximum.at(ultima, inversa, fechas)
+
+    orden = np.lexsort((-ultima, pares[:, 0]))
+    usuarios, propiedades, peso = pares[orden, 0], pares[orden, 1], peso[orden]
+    inicios = np.flatnonzero(np.r_[True, usuarios[1:] != usuarios[:-1]])
+    tamanos = np.diff(np.r_[inicios, len(usuarios)])
+    posicion = np.arange(len(usuarios)) - np.repeat(inicios, tamanos)
+    recientes = posicion < MAXIMO_INTERACCIONES_USUARIO
+    return usuarios[recientes], propiedades[recientes], peso[recientes]
+
+
+def _coocurrencias(usuarios, propiedades, pesos, filas=None):
+    """
+    XᵀX: para cada par (a, b) de propiedades del mismo usuario, la suma de
+    peso(a) * peso(b). Con `filas` solo se calculan las de esas propiedades.
+
+    Returns:
+        tuple: (a, b, co-ocurrencia)
+    """
+    if not len(usuarios):
+        vacio = np.array([], dtype=np.int64)
+        return vacio, vacio, np.array([], dtype=float)
+    inicios = np.flatnonzero(np.r_[True, usuarios[1:] != usuarios[:-1]])
+    tamanos = np.diff(np.r_[inicios, len(usuarios)])
+    grupo = np.repeat(np.arange(len(inicios)), tamanos)
+
+    izquierda = np.arange(len(usuarios)) if filas is None else np.flatnonzero(np.isin(propiedades, filas))
+    pares_por_fila = tamanos[grupo[izquierda]]
+    limites = np.searchsorted(np.cumsum(pares_por_fila), np.arange(PARES_POR_BLOQUE, pares_por_fila.sum(), PARES_POR_BLOQUE))
+
+    parciales = []
+    for bloque in np.split(izquierda, limites):
+        if not len(bloque):
+            continue
+        cantidad = tamanos[grupo[bloque]]
+        fila = np.repeat(bloque, cantidad)
+        desplazamiento = np.arange(cantidad.sum()) - np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+        columna = np.repeat(inicios[grupo[bloque]], cantidad) + desplazamiento
+        distintas = fila != columna
+        fila, columna = fila[distintas], columna[distintas]
+        parciales.append((propiedades[fila], propiedades[columna], pesos[fila] * pesos[columna]))
+
+    if not parciales:
+        vacio = np.array([], dtype=np.int64)
+        return vacio, vacio, np.array([], dtype=float)
+    a = np.concatenate([p[0] for p in parciales])
+    b = np.concatenate([p[1] for p in parciales])
+    valores = np.concatenate([p[2] for p in parciales])
+    pares, inversa = np.unique(np.column_stack([a, b]), axis=0, return_inverse=True)
+    return pares[:, 0], pares[:, 1], np.bincount(inversa.ravel(), weights=valores, minlength=len(pares))
+
+
+def _listas(usuarios, propiedades, pesos, filas=None, cantidad=RECOMENDADAS):
+    """{propiedad_id: [[id, similitud], ...]} por similitud coseno, solo hacia activas"""
+    a, b, coocurrencia = _coocurrencias(usuarios, propiedades, pesos, filas)
+    activas = np.array(list(Propiedad.objects.filter(estado='activa').values_list('pk', flat=True)), dtype=np.int64)
+    hacia_activas = np.isin(b, activas)
+    a, b, coocurrencia = a[hacia_activas], b[hacia_activas], coocurrencia[hacia_activas]
+
+    # Norma de cada columna de X: raíz de la suma de pesos² de sus usuarios
+    ids, inversa = np.unique(propiedades, return_inverse=True)
+    normas = np.sqrt(np.bincount(inversa.ravel(), weights=pesos ** 2))
+    similitud = coocurrencia / (normas[np.searchsorted(ids, a)] * normas[np.searchsorted(ids, b)])
+
+    orden = np.lexsort((-similitud, a))
+    a, b, similitud = a[orden], b[orden], similitud[orden]
+    inicios = np.flatnonzero(np.r_[True, a[1:] != a[:-1]]) if len(a) else np.array([], dtype=np.int64)
+    posicion = np.arange(len(a)) - np.repeat(inicios, np.diff(np.r_[inicios, len(a)]))
+    listas = defaultdict(list)
+    for propiedad_id, recomendada, valor in zip(*(x[posicion < cantidad].tolist() for x in (a, b, similitud))):
+        listas[propiedad_id].append([recomendada, round(valor, 4)])
+    return listas
+
+
+def _guardar(listas, tamano_lote=500):
+    Propiedad.objects.bulk_update(
+        [Propiedad(pk=pk, recomendadas=lista) for pk, lista in listas.items()],
+        ['recomendadas'], batch_size=tamano_lote,
+    )
+
+
+def reconstruir_recomendaciones(incremental=False, tamano_lote=500):
+    """
+    Recalcula las listas de recomendadas.
+
+    Args:
+        incremental: Solo las propiedades de los usuarios con interacciones
+            nuevas desde la corrida anterior (todas si no hay corrida anterior)
+
+    Returns:
+        int: Cantidad de listas guardadas
+    """
+    ahora = timezone.now()
+    estado = EstadoIndice.leer(ESTADO_RECOMENDACIONES) if incremental else None
+
+    if estado is not None:
+        # Propiedades de los usuarios nuevos; sus filas de XᵀX necesitan todos sus
+        # usuarios, y las normas de las columnas, todos los usuarios de esas columnas
+        filas = _relacionados('usuario_id', _usuarios_nuevos(estado['marca']), 'propiedad_id')
+        columnas = _relacionados('usuario_id', _relacionados('propiedad_id', filas, 'usuario_id'), 'propiedad_id')
+        usuarios, propiedades, pesos, fechas = _eventos(_relacionados('propiedad_id', columnas, 'usuario_id'))
+        filas = np.array(sorted(filas), dtype=np.int64)
+        listas = {}
+        if len(usuarios):
+            usuarios, propiedades, pesos = _matriz(usuarios, propiedades, pesos, fechas)
+            listas = _listas(usuarios, propiedades, pesos, filas) if len(filas) else {}
+        listas.update({pk: [] for pk in filas.tolist() if pk not in listas})
+    else:
+        usuarios, propiedades, pesos, fechas = _eventos()
+        if len(usuarios):
+            usuarios, propiedades, pesos = _matriz(usuarios, propiedades, pesos, fechas)
+        listas = _listas(usuarios, propiedades, pesos)
+        # Las que ya no tienen co-ocurrencias quedan vacías
+        listas.update({
+            pk: [] for pk in Propiedad.objects.exclude(recomendadas=[]).values_list('pk', flat=True)
+            if pk not in listas
+        })
+
+    existentes = set(Propiedad.objects.filter(pk__in=list(listas)).values_list('pk', flat=True))
+    _guardar({pk: lista for pk, lista in listas.items() if pk in existentes}, tamano_lote)
+    EstadoIndice.guardar(ESTADO_RECOMENDACIONES, {'marca': ahora.isoformat()})
+    return len(existentes)
+
+
+def recomendadas_para(usuario_id, cantidad=4):
+    """
+    Ids de propiedades recomendadas para el usuario: suma de las listas de
+    sus últimas interacciones, sin las que ya vio, guardó o contactó.
+    """
+    clave = CACHE_RECOMENDADAS_USUARIO.format(usuario_id)
+    ids = cache.get(clave)
+    if ids is not None:
+        return ids
+
+    vistas = {}
+    for consulta, campo_fecha, peso in _consultas_eventos():
+        recientes = consulta.filter(usuario_id=usuario_id).order_by('-' + campo_fecha)
+        for propiedad_id in recientes.values_list('propiedad_id', flat=True)[:INTERACCIONES_RECIENTES]:
+            vistas[propiedad_id] = vistas.get(propiedad_id, 0) + peso
+
+    puntajes = defaultdict(float)
+    for propiedad_id, lista in Propiedad.objects.filter(pk__in=list(vistas)).values_list('pk', 'recomendadas'):
+        for recomendada, similitud in lista:
+            if recomendada not in vistas:
+                puntajes[recomendada] += vistas[propiedad_id] * similitud
+    ids = sorted(puntajes, key=puntajes.get, reverse=True)[:cantidad * 2]  # margen para las que ya no están activas
+    cache.set(clave, ids, CACHE_RECOMENDADAS_USUARIO_TIMEOUT)
+    return ids
+
+
+def invalidar_recomendadas_usuario(usuario_id):
+    cache.delete(CACHE_RECOMENDADAS_USUARIO.format(usuario_id))
@@ -0,0 +1,236 @@
+"""
+Señales para mantener sincronizados los datos precalculados de propiedades
+"""
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+from contactos.models import SolicitudContacto
+from suscripciones.models import PlanSuscripcion, Suscripcion
+from .models import BusquedaGuardada, Propiedad, Destacado, Favorito, ImagenPropiedad, Valoracion
+from .alertas import CAMPOS_ALERTAS, indexar_busqueda
+from .avisos_favoritos import cambio_favoritos
+from .busqueda import CAMPOS_INDEXADOS, indexar_propiedad
+from .habilitaciones import invalidar_habilitaciones
+from .imagenes import eliminar_variantes
+from .mapa import actualizar_punto
+from .paginas import invalidar_paginas
+from .recomendaciones import invalidar_recomendadas_usuario
+from .similares import CAMPOS_SIMILARES
+from .tareas import (
+    actualizar_similares_propiedad, avisar_busquedas_guardadas, generar_variantes_imagen, notificar_cambio_favoritos,
+    reevaluar_suscriptores_plan,
+)
+from .puntuaciones import aplicar_valoracion
+from .ubicaciones import actualizar_ubicacion, invalidar_ubicaciones
+from .utils import actualizar_portada, invalidar_slots_destacados, recalcular_prioridades
+
+
+@receiver(post_save, sender=Destacado)
+@receiver(post_delete, sender=Destacado)
+def destacado_modificado(sender, instance, **kwargs):
+    """La prioridad ya se guardó en Destacado.save(); cambian el ranking y el cupo del propietario"""
+    invalidar_slots_destacados()
+    if Destacado.propiedad.is_cached(instance):
+        propietario_id = instance.propiedad.propietario_id
+    else:
+        # En el borrado en cascada la propiedad puede no existir ya (y la invalida ella)
+        propietario_id = Propiedad.objects.filter(
+            pk=instance.propiedad_id
+        ).values_list('propietario_id', flat=True).first()
+    if propietario_id is not None:
+        invalidar_habilitaciones([propietario_id])
+
+
+@receiver(post_save, sender=Propiedad)
+@receiver(post_delete, sender=Propiedad)
+def propiedad_modificada(sender, instance, **kwargs):
+    """Una propiedad que deja de estar activa sale de los slots de la portada"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and 'estado' not in update_fields:
+        return
+    invalidar_slots_destacados()
+    invalidar_habilitaciones([instance.propietario_id])
+
+
+@receiver(post_save, sender=Propiedad)
+def actualizar_indice_busqueda(sender, instance, **kwargs):
+    """Reindexar el texto solo si cambió alguno de los campos indexados"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not CAMPOS_INDEXADOS.intersection(update_fields):
+        return
+    indexar_propiedad(instance)
+
+
+@receiver(post_save, sender=Propiedad)
+def propiedad_guardada_ubicacion(sender, instance, created, **kwargs):
+    """Invalidar los conteos del autocompletado si cambió el estado o la ubicación"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'estado', 'ciudad', 'distrito'}.intersection(update_fields):
+        return
+    if created:
+        actualizar_ubicacion(None, instance.ubicacion_indexada())
+    elif hasattr(instance, '_ubicacion_guardada'):
+        actualizar_ubicacion(instance._ubicacion_guardada, instance.ubicacion_indexada())
+    else:
+        invalidar_ubicaciones()
+    instance._ubicacion_guardada = instance.ubicacion_indexada()
+
+
+@receiver(post_delete, sender=Propiedad)
+def propiedad_eliminada_ubicacion(sender, instance, **kwargs):
+    anterior = getattr(instance, '_ubicacion_guardada', instance.ubicacion_indexada())
+    actualizar_ubicacion(anterior, None)
+
+
+@receiver(pre_save, sender=Propiedad)
+def propiedad_por_guardar_mapa(sender, instance, **kwargs):
+    """Si la instancia no se leyó de la base (no tiene su punto anterior), leerlo"""
+    if instance.pk is not None and not hasattr(instance, '_punto_guardado'):
+        guardada = Propiedad.objects.filter(pk=instance.pk).only(
+            'estado', 'geohash', 'latitud', 'longitud', 'precio'
+        ).first()
+        instance._punto_guardado = guardada.punto_mapa() if guardada else None
+
+
+@receiver(post_save, sender=Propiedad)
+def propiedad_guardada_mapa(sender, instance, created, **kwargs):
+    """Ajustar los clusters del mapa si cambió el estado, las coordenadas o el precio"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'estado', 'latitud', 'longitud', 'precio'}.intersection(update_fields):
+        return
+    anterior = None if created else getattr(instance, '_punto_guardado', None)
+    actualizar_punto(anterior, instance.punto_mapa())
+    instance._punto_guardado = instance.punto_mapa()
+
+
+@receiver(post_delete, sender=Propiedad)
+def propiedad_eliminada_mapa(sender, instance, **kwargs):
+    actualizar_punto(getattr(instance, '_punto_guardado', instance.punto_mapa()), None)
+
+
+@receiver(post_save, sender=Propiedad)
+@receiver(post_delete, sender=Propiedad)
+def propiedad_modificada_similares(sender, instance, **kwargs):
+    """Recalcular sus vecinas (y las listas donde aparece) en la cola de tareas"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not CAMPOS_SIMILARES.intersection(update_fields):
+        return
+    # Varios cambios seguidos antes de que corra la tarea se resuelven en una ejecución
+    actualizar_similares_propiedad.encolar(instance.pk, clave=f'similares:{instance.pk}')
+
+
+@receiver(post_save, sender=Propiedad)
+def propiedad_publicada_alertas(sender, instance, **kwargs):
+    """Avisar a las búsquedas guardadas que la aceptan (en la cola de tareas)"""
+    if instance.estado != 'activa':
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not CAMPOS_ALERTAS.intersection(update_fields):
+        return
+    avisar_busquedas_guardadas.encolar(instance.pk)
+
+
+@receiver(pre_save, sender=Propiedad)
+def propiedad_por_guardar_favoritos(sender, instance, **kwargs):
+    """Si la instancia no se leyó de la base (no tiene su estado y precio anteriores), leerlos"""
+    if instance.pk is not None and not hasattr(instance, '_estado_precio_guardado'):
+        instance._estado_precio_guardado = Propiedad.objects.filter(pk=instance.pk).values_list('estado', 'precio').first()
+
+
+@receiver(post_save, sender=Propiedad)
+def propiedad_modificada_favoritos(sender, instance, created, **kwargs):
+    """Avisar a quienes la tienen en favoritos si cambió el precio, se alquiló o se suspendió (en la cola de tareas)"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and not {'estado', 'precio'}.intersection(update_fields):
+        return
+    anterior = None if created else getattr(instance, '_estado_precio_guardado', None)
+    instance._estado_precio_guardado = (instance.estado, instance.precio)
+    cambio = cambio_favoritos(anterior, instance._estado_precio_guardado)
+    if cambio is not None:
+        tipo, precio_anterior = cambio
+        notificar_cambio_favoritos.encolar(
+            [instance.pk], tipo, str(precio_anterior) if precio_anterior is not None else None
+        )
+
+
+@receiver(post_save, sender=BusquedaGuardada)
+def busqueda_guardada(sender, instance, **kwargs):
+    indexar_busqueda(instance)
+
+
+@receiver(post_save, sender=Favorito)
+@receiver(post_delete, sender=Favorito)
+@receiver(post_save, sender=SolicitudContacto)
+@receiver(post_delete, sender=SolicitudContacto)
+def interaccion_modificada(sender, instance, **kwargs):
+    """La fila personalizada del usuario se recalcula en la próxima visita"""
+    invalidar_recomendadas_usuario(instance.usuario_id)
+
+
+@receiver(post_save, sender=ImagenPropiedad)
+def imagen_subida(sender, instance, created, **kwargs):
+    """Generar las variantes redimensionadas en la cola de tareas"""
+    if created:
+        generar_variantes_imagen.encolar(instance.pk, clave=f'variantes-imagen:{instance.pk}')
+
+
+@receiver(post_delete, sender=ImagenPropiedad)
+def imagen_eliminada(sender, instance, **kwargs):
+    eliminar_variantes(instance)
+
+
+@receiver(post_save, sender=ImagenPropiedad)
+@receiver(post_delete, sender=ImagenPropiedad)
+def imagen_modificada(sender, instance, **kwargs):
+    """Alta, cambio de orden o baja de una imagen puede cambiar la portada"""
+    actualizar_portada(instance.propiedad_id)
+
+
+@receiver(post_save, sender=Propiedad)
+@receiver(post_delete, sender=Propiedad)
+@receiver(post_save, sender=Destacado)
+@receiver(post_delete, sender=Destacado)
+@receiver(post_save, sender=ImagenPropiedad)
+@receiver(post_delete, sender=ImagenPropiedad)
+def catalogo_modificado(sender, instance, **kwargs):
+    """Las páginas públicas cacheadas muestran propiedades, destacados e imágenes"""
+    invalidar_paginas()
+
+
+@receiver(post_save, sender=Suscripcion)
+@receiver(post_delete, sender=Suscripcion)
+def suscripcion_modificada(sender, instance, **kwargs):
+    """El plan del propietario define el peso de sus destacados y sus límites"""
+    recalcular_prioridades([instance.usuario_id])
+    invalidar_habilitaciones([instance.usuario_id])
+
+
+@receiver(post_save, sender=PlanSuscripcion)
+def plan_modificado(sender, instance, **kwargs):
+    """Recalcular los destacados y los límites de todos los suscriptores del plan"""
+    usuarios = Suscripcion.objects.filter(plan=instance, estado='activa').values('usuario_id')
+    recalcular_prioridades(usuarios)
+    invalidar_habilitaciones()
+    if not kwargs.get('created'):
+        reevaluar_suscriptores_plan.encolar(instance.pk)
+
+
+@receiver(pre_save, sender=Valoracion)
+def valoracion_por_guardar(sender, instance, **kwargs):
+    """Si la instancia no se leyó de la base (no tiene los puntajes previos), leerlos"""
+    if instance.pk is not None and not hasattr(instance, '_puntajes_guardados'):
+        guardada = Valoracion.objects.filter(pk=instance.pk).first()
+        instance._puntajes_guardados = guardada.puntajes() if guardada else None
+
+
+@receiver(post_save, sender=Valoracion)
+def valoracion_guardada(sender, instance, created, **kwargs):
+    """Aplicar a los agregados solo la diferencia con los puntajes anteriores"""
+    antes = None if created else getattr(instance, '_puntajes_guardados', None)
+    aplicar_valoracion(instance.propiedad_id, antes, instance.puntajes())
+    instance._puntajes_guardados = instance.puntajes()
+
+
+@receiver(post_delete, sender=Valoracion)
+def valoracion_eliminada(sender, instance, **kwargs):
+    antes = getattr(instance, '_puntajes_guardados', None) or instance.puntajes()
+    aplicar_valoracion(instance.propiedad_id, antes, None)
@@ -0,0 +1,226 @@
+"""
+Índice de propiedades similares para el detalle.
+
+Cada propiedad se representa con un vector de características normalizadas
+(precio y área en escala logarítmica, habitaciones, baños, coordenadas y
+amenidades; ver _matriz) y sus vecinas más cercanas entre las activas del
+mismo tipo y operación se guardan en Propiedad.similares como
+[[id, distancia], ...]. El detalle solo lee esa lista y trae esas
+propiedades por id.
+
+reconstruir_similares (manage.py reconstruir_similares, desde cron) calcula
+todo con NumPy por bloques, partición por partición, y guarda la escala de
+las características (media y desvío de las activas, centro de las
+coordenadas) en EstadoIndice. Al cambiar una propiedad, actualizar_similares
+(en la cola de tareas) usa esa misma escala y solo lee su partición y las
+listas que la contienen: recalcula sus vecinas, la agrega a las listas a las
+que ahora queda más cerca que su última vecina y recalcula las que la
+contenían. La escala se renueva en la siguiente reconstrucción completa.
+"""
+import math
+import numpy as np
+from django.db import transaction
+from django.db.models import TextField
+from django.db.models.functions import Cast
+
+from .models import EstadoIndice, Propiedad
+
+VECINAS = 4
+TAMANO_BLOQUE = 512  # filas por bloque de la matriz de distancias
+
+# Cambios que mueven a una propiedad en el índice
+CAMPOS_SIMILARES = {
+    'estado', 'precio', 'area', 'habitaciones', 'banos', 'tipo', 'operacion',
+    'latitud', 'longitud', 'amenidades',
+}
+
+ESTADO_SIMILARES = 'similares'  # EstadoIndice con la escala de la última reconstrucción
+
+# Peso de cada grupo de características en la distancia (tipo y operación no
+# pesan: solo se comparan propiedades de la misma partición)
+PESOS = {
+    'numericas': 1.0,
+    'ubicacion': 1.0,
+    'amenidades': 0.3,
+}
+KM_UBICACION = 5.0  # Distancia en km que pesa como un desvío estándar de precio
+
+
+def _filas(queryset):
+    return list(queryset.order_by('pk').values_list(
+        'pk', 'estado', 'precio', 'area', 'habitaciones', 'banos', 'tipo', 'operacion',
+        'latitud', 'longitud', 'amenidades',
+    ))
+
+
+def _numericas(filas):
+    return np.array([
+        [math.log1p(float(precio)), math.log1p(float(area)), float(habitaciones), float(banos)]
+        for _, _, precio, area, habitaciones, banos, *_ in filas
+    ]).reshape(-1, 4)
+
+
+def _coordenadas(filas):
+    return np.array([
+        [float(latitud), float(longitud)] if latitud is not None and longitud is not None else [np.nan, np.nan]
+        for *_, latitud, longitud, _ in filas
+    ]).reshape(-1, 2)
+
+
+def calcular_escala(filas):
+    """Media y desvío de las numéricas y centro de las coordenadas, tomados de las activas"""
+    referencia = [fila for fila in filas if fila[1] == 'activa'] or filas
+    numericas = _numericas(referencia)
+    desvio = numericas.std(axis=0)
+    desvio[desvio == 0] = 1
+    coordenadas = _coordenadas([fila for fila in filas if fila[1] == 'activa'])
+    coordenadas = coordenadas[~np.isnan(coordenadas[:, 0])]
+    return {
+        'media': numericas.mean(axis=0).tolist(),
+        'desvio': desvio.tolist(),
+        'centro': coordenadas.mean(axis=0).tolist() if len(coordenadas) else None,
+    }
+
+
+def _matriz(filas, escala):
+    """Vectores de características, una fila por propiedad"""
+    numericas = (_numericas(filas) - np.array(escala['media'])) / np.array(escala['desvio'])
+
+    if escala['centro'] is not None:
+        centro = np.array(escala['centro'])
+        ubicacion = (_coordenadas(filas) - centro) * 111.32 / KM_UBICACION
+        ubicacion[:, 1] *= math.cos(math.radians(centro[0]))
+        ubicacion = np.nan_to_num(ubicacion)  # Sin coordenadas: en el centro (neutral)
+    else:
+        ubicacion = np.zeros((len(filas), 2))
+
+    bits = np.array([fila[-1] for fila in filas], dtype=np.int64)[:, None] >> np.arange(len(Propiedad.AMENIDADES))
+    return np.hstack([
+        numericas * PESOS['numericas'],
+        ubicacion * PESOS['ubicacion'],
+        (bits & 1) * PESOS['amenidades'],
+    ])
+
+
+def _indice(filas, escala):
+    """(ids, máscara de activas, matriz) de las filas, ordenadas por id"""
+    if not filas:
+        return np.array([], dtype=np.int64), np.array([], dtype=bool), np.zeros((0, 0))
+    ids = np.array([fila[0] for fila in filas], dtype=np.int64)
+    activas = np.array([fila[1] == 'activa' for fila in filas])
+    return ids, activas, _matriz(filas, escala)
+
+
+def _particion(tipo, operacion, escala):
+    """Índice de todas las propiedades (de cualquier estado) de un tipo y operación"""
+    return _indice(_filas(Propiedad.objects.filter(tipo=tipo, operacion=operacion)), escala)
+
+
+def _vecinas(consultas, ids_consultas, candidatos, ids_candidatos, k):
+    """Listas [[id, distancia], ...] de las k candidatas más cercanas a cada consulta (sin sí misma)"""
+    if not len(candidatos):
+        return [[] for _ in range(len(consultas))]
+    normas = (candidatos ** 2).sum(axis=1)
+    k = min(k, len(candidatos))
+    listas = []
+    for inicio in range(0, len(consultas), TAMANO_BLOQUE):
+        bloque = consultas[inicio:inicio + TAMANO_BLOQUE]
+        distancias = (bloque ** 2).sum(axis=1)[:, None] + normas[None, :] - 2 * bloque @ candidatos.T
+        distancias[ids_consultas[inicio:inicio + TAMANO_BLOQUE, None] == ids_candidatos[None, :]] = np.inf
+        cercanas = np.argpartition(distancias, k - 1, axis=1)[:, :k]
+        for fila, columnas in enumerate(cercanas):
+            columnas = columnas[np.argsort(distancias[fila, columnas])]
+            listas.append([
+                [int(ids_candidatos[columna]), round(math.sqrt(max(distancias[fila, columna], 0)), 4)]
+                for columna in columnas if np.isfinite(distancias[fila, columna])
+            ])
+    return listas
+
+
+def _guardar(listas_por_id, tamano_lote=500):
+    propiedades = [Propiedad(pk=pk, similares=lista) for pk, lista in listas_por_id.items()]
+    Propiedad.objects.bulk_update(propiedades, ['similares'], batch_size=tamano_lote)
+
+
+def reconstruir_similares(k=VECINAS, tamano_lote=500):
+    """Recalcula la escala y las vecinas de todas las propiedades; retorna la cantidad"""
+    filas = _filas(Propiedad.objects.all())
+    if not filas:
+        return 0
+    escala = calcular_escala(filas)
+    particiones = {}
+    for fila in filas:
+        particiones.setdefault((fila[6], fila[7]), []).append(fila)
+
+    listas = {}
+    for grupo in particiones.values():
+        ids, activas, matriz = _indice(grupo, escala)
+        listas.update(zip(ids.tolist(), _vecinas(matriz, ids, matriz[activas], ids[activas], k)))
+    with transaction.atomic():
+        EstadoIndice.guardar(ESTADO_SIMILARES, escala)
+        _guardar(listas, tamano_lote)
+    return len(filas)
+
+
+def _contienen(propiedad_id):
+    """(pk, tipo, operación, lista) de las propiedades que tienen a la propiedad en sus similares"""
+    # Filtro grueso sobre el texto de la columna JSON ('[[12, 0.5], [7, ...') y verificación exacta
+    filas = Propiedad.objects.annotate(
+        texto_similares=Cast('similares', TextField())
+    ).filter(
+        texto_similares__contains=f'[{propiedad_id}, '
+    ).exclude(pk=propiedad_id).values_list('pk', 'tipo', 'operacion', 'similares')
+    return [
+        fila for fila in filas
+        if any(vecina == propiedad_id for vecina, _ in fila[3] or [])
+    ]
+
+
+def actualizar_similares(propiedad_id, k=VECINAS):
+    """
+    Ajusta el índice después de que la propiedad cambió, dejó de estar
+    activa o se eliminó.
+
+    Returns:
+        int: Cantidad de listas actualizadas
+    """
+    escala = EstadoIndice.leer(ESTADO_SIMILARES)
+    if escala is None:
+        # Sin escala guardada el índice nunca se construyó
+        return reconstruir_similares(k)
+
+    particiones = {}
+    cambiadas = {}
+
+    propia = Propiedad.objects.filter(pk=propiedad_id).values_list('tipo', 'operacion').first()
+    if propia is not None:
+        particiones[propia] = ids, activas, matriz = _particion(*propia, escala)
+        posicion = np.searchsorted(ids, propiedad_id)
+        vector = matriz[posicion:posicion + 1]
+        cambiadas[propiedad_id] = _vecinas(vector, ids[posicion:posicion + 1], matriz[activas], ids[activas], k)[0]
+        if activas[posicion]:
+            # Entra en las listas a las que ahora queda más cerca que su última vecina
+            guardadas = dict(Propiedad.objects.filter(tipo=propia[0], operacion=propia[1]).values_list('pk', 'similares'))
+            distancias = np.sqrt(((matriz - vector) ** 2).sum(axis=1))
+            for fila, pk in enumerate(ids.tolist()):
+                lista = guardadas.get(pk) or []
+                if pk == propiedad_id or any(vecina == propiedad_id for vecina, _ in lista):
+                    continue
+                if len(lista) < k or distancias[fila] < lista[-1][1]:
+                    lista = sorted(lista + [[propiedad_id, round(float(distancias[fila]), 4)]], key=lambda v: v[1])[:k]
+                    cambiadas[pk] = lista
+
+    # Las listas que la contenían se recalculan (se movió, se desactivó o ya no existe)
+    contenian = {}
+    for pk, tipo, operacion, _ in _contienen(propiedad_id):
+        contenian.setdefault((tipo, operacion), []).append(pk)
+    for clave, pks in contenian.items():
+        if clave not in particiones:
+            particiones[clave] = _particion(*clave, escala)
+        ids, activas, matriz = particiones[clave]
+        filas = np.searchsorted(ids, pks)
+        listas = _vecinas(matriz[filas], ids[filas], matriz[activas], ids[activas], k)
+        cambiadas.update(zip(pks, listas))
+
+    _guardar(cambiadas)
+    return len(cambiadas)
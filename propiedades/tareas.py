@@ -0,0 +1,106 @@
+"""
+Tareas en segundo plano de propiedades (ver tareas/cola.py)
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.urls import reverse
+from notificaciones.models import Notificacion
+from suscripciones.models import PlanSuscripcion
+from tareas.cola import tarea
+
+from .alertas import avisar_coincidencias
+from .avisos_favoritos import notificar_favoritos
+from .imagenes import generar_variantes
+from .models import BusquedaGuardada, Propiedad, ReporteValoracion
+from .similares import actualizar_similares
+from .utils import gestionar_propiedades_por_suscripcion, reevaluar_plan
+
+
+@tarea
+def gestionar_propiedades(usuario_id):
+    """Activa/suspende las propiedades del usuario según su suscripción actual"""
+    usuario = get_user_model().objects.filter(pk=usuario_id).first()
+    if usuario is not None:
+        gestionar_propiedades_por_suscripcion(usuario)
+
+
+@tarea
+def reevaluar_suscriptores_plan(plan_id):
+    """Re-evalúa los límites de todos los suscriptores de un plan modificado"""
+    plan = PlanSuscripcion.objects.filter(pk=plan_id).first()
+    if plan is not None:
+        reevaluar_plan(plan)
+
+
+@tarea
+def notificar_reporte_valoracion(reporte_id):
+    """Avisa al propietario que se reportó una valoración de su propiedad"""
+    reporte = ReporteValoracion.objects.select_related('valoracion__propiedad').filter(pk=reporte_id).first()
+    if reporte is None:
+        return
+    propiedad = reporte.valoracion.propiedad
+    Notificacion.objects.create(
+        usuario_id=propiedad.propietario_id,
+        tipo='sistema',
+        titulo='Valoración reportada',
+        mensaje=f'Se ha reportado una valoración en tu propiedad "{propiedad.titulo}"',
+        url=f'/propiedades/{propiedad.pk}/'
+    )
+
+
+@tarea(max_intentos=3)
+def generar_variantes_imagen(imagen_id):
+    """Versiones redimensionadas de una imagen subida (ver imagenes.py)"""
+    generar_variantes(imagen_id)
+
+
+@tarea(agrupar_pendientes=True)
+def actualizar_similares_propiedad(propiedad_id):
+    """Ajusta el índice de similares después de un cambio en la propiedad (ver similares.py)"""
+    actualizar_similares(propiedad_id)
+
+
+@tarea
+def notificar_cambio_favoritos(propiedad_ids, cambio, precio_anterior=None):
+    """Avisa a quienes tienen las propiedades en favoritos (ver avisos_favoritos.py)"""
+    notificar_favoritos(propiedad_ids, cambio, precio_anterior)
+
+
+@tarea
+def avisar_busquedas_guardadas(propiedad_id):
+    """Notifica a las búsquedas guardadas que aceptan la propiedad publicada o modificada (ver alertas.py)"""
+    for busqueda in avisar_coincidencias(propiedad_id):
+        if busqueda.avisar_email:
+            enviar_aviso_busqueda.encolar(busqueda.pk, propiedad_id, clave=f'aviso-busqueda:{busqueda.pk}:{propiedad_id}')
+
+
+@tarea
+def enviar_aviso_busqueda(busqueda_id, propiedad_id):
+    """Email al usuario por una nueva propiedad que coincide con su búsqueda guardada"""
+    busqueda = BusquedaGuardada.objects.select_related('usuario').filter(pk=busqueda_id).first()
+    propiedad = Propiedad.objects.filter(pk=propiedad_id).first()
+    if busqueda is None or propiedad is None or not busqueda.usuario.recibir_notificaciones:
+        return
+    
+    asunto = f'Nueva propiedad para tu búsqueda "{busqueda.nombre}"'
+    mensaje = f"""
+    Hola {busqueda.usuario.first_name},
+    
+    Se publicó una propiedad que coincide con tu búsqueda "{busqueda.nombre}":
+    
+    {propiedad.titulo}
+    {propiedad.ciudad} - {propiedad.precio}
+    {settings.SITE_URL}{reverse('propiedades:detalle', args=[propiedad.pk])}
+    
+    Saludos,
+    Equipo LaColmena
+    """
+    
+    # Sin fail_silently: si el servidor de correo falla, la cola reintenta
+    send_mail(
+        asunto,
+        mensaje,
+        getattr(settings, 'DEFAULT_FROM_EMAIL', 'noreply@lacolmena.com'),
+        [busqueda.usuario.email],
+    )
@@ -0,0 +1,51 @@
+from django import template
+from django.utils.html import format_html
+
+from propiedades.imagenes import TAMANOS
+
+register = template.Library()
+
+# Ancho con el que se muestra cada tamaño en pantalla, para que el navegador elija
+SIZES = {
+    'card': '(min-width: 1024px) 33vw, (min-width: 768px) 50vw, 100vw',
+    'detalle': '(min-width: 1024px) 66vw, 100vw',
+    'completa': '100vw',
+}
+
+
+def _srcset(imagen, extension):
+    return ', '.join(
+        f"{imagen.imagen.storage.url(variante[extension])} {variante['ancho']}w"
+        for variante in sorted(imagen.variantes.values(), key=lambda v: v['ancho'])
+        if variante.get(extension)
+    )
+
+
+@register.simple_tag
+def imagen_responsive(imagen, tamano='card', alt='', clase=''):
+    """
+    <picture> con srcset WebP y respaldo JPEG de una ImagenPropiedad.
+    Sin variantes generadas todavía, muestra el original; sin imagen (None), nada.
+
+    Uso: {% imagen_responsive propiedad.imagen_principal 'card' propiedad.titulo 'w-full h-48 object-cover' %}
+    """
+    if imagen is None:
+        return ''
+    carga = 'lazy' if tamano == 'card' else 'eager'
+    variante = (imagen.variantes or {}).get(tamano)
+    if not variante or tamano not in TAMANOS:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+            imagen.imagen.url, alt, clase, carga
+        )
+
+    sizes = SIZES.get(tamano, '100vw')
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" loading="{}" decoding="async">'
+        '</picture>',
+        _srcset(imagen, 'webp'), sizes,
+        imagen.imagen.storage.url(variante['jpeg']), _srcset(imagen, 'jpeg'), sizes,
+        variante['ancho'], variante['alto'], alt, clase, carga
+    )
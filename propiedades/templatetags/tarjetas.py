@@ -0,0 +1,78 @@
+"""
+Tarjetas de propiedad con el HTML cacheado por (propiedad, fecha de
+actualización, variante).
+
+    {% load tarjetas %}
+    {% precargar_tarjetas page_obj 'listado' %}
+    {% for propiedad in page_obj %}{% tarjeta_propiedad propiedad 'listado' %}{% endfor %}
+
+precargar_tarjetas trae con un único get_many las tarjetas de toda la página;
+las que faltan se renderizan al recorrerlas y quedan guardadas para las
+siguientes visitas. Todo cambio de la propiedad (o de su portada, ver
+actualizar_portada) mueve fecha_actualizacion, y con ella la clave: no hace
+falta borrar nada.
+"""
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+CACHE_TARJETAS_TIMEOUT = 6 * 3600  # segundos
+
+# Variante -> ¿depende de si hay sesión iniciada? (botón de favorito)
+VARIANTES = {
+    'listado': True,
+    'destacada': True,
+    'carrusel': False,
+    'estudiantes': False,
+    'inversiones': False,
+    'favorito': False,
+    'similar': False,
+}
+
+_PRECARGADAS = 'tarjetas_precargadas'
+
+
+def _clave(propiedad, variante, autenticado):
+    clave = f'tarjeta:{variante}:{propiedad.pk}:{propiedad.fecha_actualizacion.timestamp()}'
+    if VARIANTES[variante]:
+        clave += ':a' if autenticado else ':n'
+    return clave
+
+
+def _autenticado(context):
+    usuario = context.get('user')
+    return bool(usuario and usuario.is_authenticated)
+
+
+@register.simple_tag(takes_context=True)
+def precargar_tarjetas(context, propiedades, variante):
+    """Lee de una vez las tarjetas cacheadas de las propiedades a mostrar"""
+    autenticado = _autenticado(context)
+    claves = [_clave(propiedad, variante, autenticado) for propiedad in propiedades]
+    context.render_context.setdefault(_PRECARGADAS, {}).update(cache.get_many(claves))
+    return ''
+
+
+@register.simple_tag(takes_context=True)
+def tarjeta_propiedad(context, propiedad, variante):
+    """
+    HTML de la tarjeta (propiedades/tarjetas/<variante>.html). Sin
+    precargar_tarjetas antes, hace una lectura de cache por tarjeta.
+
+    Uso: {% tarjeta_propiedad propiedad 'listado' %}
+    """
+    autenticado = _autenticado(context)
+    clave = _clave(propiedad, variante, autenticado)
+
+    precargadas = context.render_context.get(_PRECARGADAS)
+    html = precargadas.get(clave) if precargadas is not None else cache.get(clave)
+    if html is None:
+        html = render_to_string(f'propiedades/tarjetas/{variante}.html', {
+            'propiedad': propiedad,
+            'autenticado': autenticado,
+        })
+        cache.set(clave, str(html), CACHE_TARJETAS_TIMEOUT)
+    return mark_safe(html)
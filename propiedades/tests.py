@@ -0,0 +1,162 @@
+import base64
+import json
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from .busqueda import tokenizar
+from usuarios.models import Perfil
+
+from .models import Propiedad, Valoracion
+from .paginacion import PaginadorCursor
+from .paginas import generacion_catalogo
+from .puntuaciones import CAMPOS_AGREGADOS, reconciliar_puntuaciones
+
+
+def crear_propiedad(propietario, **campos):
+    datos = {
+        'titulo': 'Departamento céntrico', 'descripcion': 'Luminoso, a metros de la plaza',
+        'tipo': 'departamento', 'precio': 100000, 'ciudad': 'Resistencia',
+        'distrito': 'Centro', 'direccion': 'Av. Alberdi 100', 'area': 50,
+    }
+    datos.update(campos)
+    return Propiedad.objects.create(propietario=propietario, **datos)
+
+
+class ReducirTerminoTests(SimpleTestCase):
+    """Singular y plural deben indexarse con el mismo término (ver busqueda.reducir_termino)"""
+
+    PARES = [
+        ('casa', 'casas'), ('departamento', 'departamentos'), ('ambiente', 'ambientes'),
+        ('calle', 'calles'), ('clase', 'clases'), ('balcón', 'balcones'), ('local', 'locales'),
+        ('pared', 'paredes'), ('ascensor', 'ascensores'), ('jardín', 'jardines'),
+        ('habitación', 'habitaciones'), ('dormitorio', 'dormitorios'), ('baño', 'baños'),
+        ('garaje', 'garajes'), ('parque', 'parques'), ('luz', 'luces'), ('ciudad', 'ciudades'),
+        ('mes', 'meses'), ('cochera', 'cocheras'), ('oficina', 'oficinas'), ('patio', 'patios'),
+    ]
+
+    def test_singular_y_plural(self):
+        for singular, plural in self.PARES:
+            with self.subTest(singular=singular):
+                self.assertEqual(tokenizar(singular), tokenizar(plural))
+
+
+class PaginadorCursorTests(TestCase):
+    """Recorrido por cursores y cursores inválidos (ver paginacion.py)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        propietario = get_user_model().objects.create_user('propietario', password='clave-segura')
+        cls.propiedades = [crear_propiedad(propietario, titulo=f'Propiedad {i}') for i in range(5)]
+        cls.orden = [p.pk for p in Propiedad.objects.order_by('-fecha_publicacion', '-pk')]
+
+    def _pagina(self, **params):
+        query = QueryDict(mutable=True)
+        query.update(params)
+        return PaginadorCursor(Propiedad.objects.all(), 2).get_page(query)
+
+    def test_ida_y_vuelta(self):
+        primera = self._pagina()
+        self.assertEqual([p.pk for p in primera], self.orden[:2])
+        self.assertFalse(primera.has_previous())
+
+        segunda = self._pagina(despues=primera.cursor_siguiente, page='2')
+        self.assertEqual([p.pk for p in segunda], self.orden[2:4])
+        self.assertEqual(segunda.number, 2)
+
+        tercera = self._pagina(despues=segunda.cursor_siguiente, page='3')
+        self.assertEqual([p.pk for p in tercera], self.orden[4:])
+        self.assertFalse(tercera.has_next())
+
+        anterior = self._pagina(antes=tercera.cursor_anterior, page='2')
+        self.assertEqual([p.pk for p in anterior], self.orden[2:4])
+        self.assertTrue(anterior.has_previous())
+
+    def test_cursor_invalido_es_la_primera_pagina(self):
+        fecha = '2020-01-01T00:00:00+00:00'
+        cursores = ['no-es-base64!', base64.urlsafe_b64encode(b'{}').decode()] + [
+            base64.urlsafe_b64encode(json.dumps(valores).encode()).decode()
+            for valores in ([fecha, 'abc'], [fecha, True], [fecha, None], ['no-es-fecha', 1], [1, 1], [fecha])
+        ]
+        for cursor in cursores:
+            with self.subTest(cursor=cursor):
+                pagina = self._pagina(despues=cursor, page='7')
+                self.assertEqual(pagina.number, 1)
+                self.assertEqual([p.pk for p in pagina], self.orden[:2])
+
+
+class PuntuacionesTests(TestCase):
+    """Los agregados incrementales deben coincidir con el recálculo completo (ver puntuaciones.py)"""
+
+    CAMPOS_PERFIL = ['total_valoraciones', 'puntuacion_promedio', 'suma_tiempo_respuesta', 'suma_trato', 'suma_confiabilidad']
+
+    def _agregados(self):
+        propiedades = list(Propiedad.objects.order_by('pk').values('pk', *CAMPOS_AGREGADOS))
+        perfiles = list(Perfil.objects.order_by('pk').values('pk', *self.CAMPOS_PERFIL))
+        return propiedades, perfiles
+
+    def test_coinciden_con_reconciliar(self):
+        Usuario = get_user_model()
+        propietario = Usuario.objects.create_user('propietario', password='clave-segura')
+        Perfil.objects.create(usuario=propietario)
+        casa, depto = crear_propiedad(propietario), crear_propiedad(propietario)
+        usuarios = [Usuario.objects.create_user(f'usuario{i}', password='clave-segura') for i in range(3)]
+
+        Valoracion.objects.create(usuario=usuarios[0], propiedad=casa, tiempo_respuesta=5, trato=4, confiabilidad=2, claridad_informacion=4)
+        Valoracion.objects.create(usuario=usuarios[1], propiedad=casa, tiempo_respuesta=1, trato=2, confiabilidad=3, coincidencia_fotos=5)
+        editada = Valoracion.objects.create(usuario=usuarios[2], propiedad=depto, tiempo_respuesta=3, trato=3, confiabilidad=3)
+        eliminada = Valoracion.objects.create(usuario=usuarios[2], propiedad=casa, tiempo_respuesta=2, trato=5, confiabilidad=4)
+
+        editada = Valoracion.objects.get(pk=editada.pk)
+        editada.trato = 1
+        editada.ubicacion_correcta = 2
+        editada.save()
+        Valoracion.objects.get(pk=eliminada.pk).delete()
+
+        incrementales = self._agregados()
+        self.assertEqual(reconciliar_puntuaciones(), (0, 0))
+        self.assertEqual(self._agregados(), incrementales)
+
+        casa.refresh_from_db()
+        self.assertEqual(casa.cantidad_valoraciones, 2)
+        self.assertEqual((casa.suma_trato, casa.conteo_claridad_informacion), (6, 1))
+        self.assertEqual(Perfil.objects.get(usuario=propietario).total_valoraciones, 3)
+
+
+class CachePaginasTests(TestCase):
+    """Páginas guardadas por generación del catálogo y revalidación con ETag (ver paginas.py)"""
+
+    def setUp(self):
+        cache.clear()
+        propietario = get_user_model().objects.create_user('propietario', password='clave-segura')
+        self.propiedad = crear_propiedad(propietario)
+        self.url = reverse('propiedades:listado')
+
+    def test_etag_y_304(self):
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        etag = respuesta['ETag']
+        self.assertEqual(etag, f'"{generacion_catalogo()}"')
+
+        no_modificada = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(no_modificada.status_code, 304)
+        self.assertEqual(no_modificada['ETag'], etag)
+        self.assertEqual(no_modificada.content, b'')
+
+    def test_pagina_guardada_hasta_nueva_generacion(self):
+        self.assertNotContains(self.client.get(self.url), 'Corrientes')
+        # Con la generación vigente se sirve la página guardada aunque cambie la base
+        Propiedad.objects.filter(pk=self.propiedad.pk).update(ciudad='Corrientes')
+        self.assertNotContains(self.client.get(self.url), 'Corrientes')
+        etag = self.client.get(self.url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.propiedad.ciudad = 'Corrientes'
+            self.propiedad.save()
+
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+        self.assertContains(respuesta, 'Corrientes')
@@ -0,0 +1,176 @@
+"""
+Índice de prefijos de ciudades y barrios para el autocompletado.
+
+Los conteos de propiedades activas por ubicación se guardan en cache
+(compartidos entre procesos) junto con un número de versión. Cada proceso
+arma a partir de ellos un arreglo ordenado de claves normalizadas (sin
+acentos, una por cada palabra inicial posible: "san isidro" e "isidro") y lo
+reutiliza mientras la versión no cambie, de modo que una sugerencia cuesta
+una lectura de cache y una búsqueda binaria, sin consultar la base.
+
+Los cambios de estado o de ubicación de una propiedad descartan los conteos
+una vez confirmada la transacción; la próxima sugerencia los recalcula con
+una única agregación. Los guardados que no tocan la ubicación indexada no
+invalidan nada.
+"""
+import bisect
+import threading
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count
+
+from .busqueda import normalizar_texto
+from .models import Propiedad
+
+CACHE_UBICACIONES = 'propiedades:ubicaciones'
+CACHE_UBICACIONES_VERSION = 'propiedades:ubicaciones:version'
+CACHE_UBICACIONES_TIMEOUT = 3600  # reconstrucción completa como máximo cada hora
+
+MAXIMO_SUGERENCIAS = 10
+
+_local = {'version': None, 'indice': None}
+_lock = threading.Lock()
+
+
+def _contar_desde_base():
+    """Conteos de propiedades activas: {'ciudades': {ciudad: n}, 'distritos': {(distrito, ciudad): n}}"""
+    activas = Propiedad.objects.filter(estado='activa').order_by()
+    return {
+        'ciudades': {
+            fila['ciudad']: fila['total']
+            for fila in activas.values('ciudad').annotate(total=Count('id'))
+        },
+        'distritos': {
+            (fila['distrito'], fila['ciudad']): fila['total']
+            for fila in activas.values('distrito', 'ciudad').annotate(total=Count('id'))
+        },
+    }
+
+
+def _publicar(conteos):
+    """Guarda los conteos recién calculados con una versión nueva; retorna la versión"""
+    version = time.time_ns()
+    cache.set(CACHE_UBICACIONES, conteos, CACHE_UBICACIONES_TIMEOUT)
+    cache.set(CACHE_UBICACIONES_VERSION, version, CACHE_UBICACIONES_TIMEOUT)
+    return version
+
+
+def _claves(texto):
+    """Claves de búsqueda de un nombre: el nombre completo desde cada palabra"""
+    palabras = normalizar_texto(texto).split()
+    return [' '.join(palabras[i:]) for i in range(len(palabras))]
+
+
+def _armar_indice(conteos):
+    """
+    Agrupa las ubicaciones por nombre normalizado y arma el arreglo ordenado.
+
+    Returns:
+        dict: 'claves' (ordenadas), 'entradas' (paralelo a claves, índice en
+        'sugerencias') y 'sugerencias' (dicts listos para la respuesta JSON)
+    """
+    agrupadas = {}
+    for ciudad, total in conteos['ciudades'].items():
+        if total > 0 and ciudad and ciudad.strip():
+            sugerencia = agrupadas.setdefault(('ciudad', normalizar_texto(ciudad.strip())), {
+                'texto': ciudad,
+                'texto_completo': ciudad,
+                'tipo': 'ciudad',
+                'count': 0,
+                'icono': 'fa-city',
+            })
+            sugerencia['count'] += total
+
+    for (distrito, ciudad), total in conteos['distritos'].items():
+        if total > 0 and distrito and distrito.strip():
+            texto_completo = distrito
+            if ciudad and ciudad.strip():
+                texto_completo += f', {ciudad}'
+            sugerencia = agrupadas.setdefault(('barrio', normalizar_texto(distrito.strip())), {
+                'texto': distrito,
+                'texto_completo': texto_completo,
+                'tipo': 'barrio',
+                'count': 0,
+                'icono': 'fa-map-marker-alt',
+            })
+            sugerencia['count'] += total
+
+    sugerencias = list(agrupadas.values())
+    pares = sorted(
+        (clave, posicion)
+        for posicion, sugerencia in enumerate(sugerencias)
+        for clave in _claves(sugerencia['texto'])
+    )
+    top_ciudades = sorted(
+        (s for s in sugerencias if s['tipo'] == 'ciudad'), key=lambda s: s['count'], reverse=True
+    )[:3]
+    return {
+        'claves': [clave for clave, _ in pares],
+        'entradas': [posicion for _, posicion in pares],
+        'sugerencias': sugerencias,
+        'top_ciudades': [s['texto'] for s in top_ciudades],
+    }
+
+
+def obtener_indice():
+    """Índice del proceso, rearmado solo si cambió la versión compartida"""
+    version = cache.get(CACHE_UBICACIONES_VERSION)
+    if version is None or version != _local['version']:
+        with _lock:
+            conteos = cache.get(CACHE_UBICACIONES) if version is not None else None
+            if conteos is None:
+                conteos = _contar_desde_base()
+                version = _publicar(conteos)
+            _local['indice'] = _armar_indice(conteos)
+            _local['version'] = version
+    return _local['indice']
+
+
+def buscar_ubicaciones(texto, limite=MAXIMO_SUGERENCIAS):
+    """
+    Ciudades y barrios con propiedades activas cuyo nombre (o alguna de sus
+    palabras) empieza con el texto, ordenados por cantidad de propiedades.
+
+    Returns:
+        tuple: (sugerencias, top_ciudades) — top_ciudades sirve para el
+        mensaje cuando no hay coincidencias
+    """
+    indice = obtener_indice()
+    prefijo = ' '.join(normalizar_texto(texto).split())
+    if not prefijo:
+        return [], indice['top_ciudades']
+
+    claves = indice['claves']
+    posiciones = set()
+    i = bisect.bisect_left(claves, prefijo)
+    while i < len(claves) and claves[i].startswith(prefijo):
+        posiciones.add(indice['entradas'][i])
+        i += 1
+
+    encontradas = sorted(
+        (indice['sugerencias'][posicion] for posicion in posiciones),
+        key=lambda s: s['count'], reverse=True
+    )
+    return encontradas[:limite], indice['top_ciudades']
+
+
+def _descartar_conteos():
+    cache.delete_many([CACHE_UBICACIONES_VERSION, CACHE_UBICACIONES])
+
+
+def invalidar_ubicaciones():
+    """
+    Descarta los conteos al confirmarse la transacción: se recalculan desde la
+    base en la próxima sugerencia (antes del commit se recalcularían sin el cambio)
+    """
+    transaction.on_commit(_descartar_conteos)
+
+
+def actualizar_ubicacion(anterior, actual):
+    """
+    Invalida los conteos cuando una propiedad cambia de estado o de ubicación.
+    anterior/actual son Propiedad.ubicacion_indexada() (o None).
+    """
+    if anterior != actual:
+        invalidar_ubicaciones()
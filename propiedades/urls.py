@@ -16,10 +16,16 @@ urlpatterns = [
     path('toggle-especial-estudiantes/<int:pk>/', views.toggle_especial_estudiantes, name='toggle_especial_estudiantes'),
     path('favorito/<int:pk>/', views.toggle_favorito, name='toggle_favorito'),
     path('mis-favoritos/', views.mis_favoritos, name='favoritos'),
+    path('busquedas/guardar/', views.guardar_busqueda, name='guardar_busqueda'),
+    path('mis-busquedas/', views.mis_busquedas, name='mis_busquedas'),
+    path('busquedas/eliminar/<int:pk>/', views.eliminar_busqueda, name='eliminar_busqueda'),
+    path('busquedas/aviso-email/<int:pk>/', views.aviso_email_busqueda, name='aviso_email_busqueda'),
     path('valorar/<int:pk>/', views.valorar_propiedad, name='valorar'),
     path('reportar-valoracion/<int:pk>/', views.reportar_valoracion, name='reportar_valoracion'),
     # API endpoints
     path('api/sugerencias-ubicacion/', views.sugerencias_ubicacion, name='sugerencias_ubicacion'),
+    path('api/buscar-mapa/', views.buscar_mapa, name='buscar_mapa'),
+    path('api/clusters-mapa/', views.clusters_mapa, name='clusters_mapa'),
     # Destacados
     path('destacar/<int:pk>/', views.destacar_propiedad, name='destacar'),
     path('mis-destacados/', views.mis_destacados, name='mis_destacados'),
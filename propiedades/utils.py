@@ -1,12 +1,149 @@
 """
 Utilidades para manejo de propiedades y suscripciones
 """
-from .models import Propiedad
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, CharField, F, Value, When, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+from .models import Propiedad, Destacado, ImagenPropiedad
+from .busqueda import filtrar_por_texto
+from .geo import filtrar_geo
+from .habilitaciones import invalidar_habilitaciones
+from .mapa import recalcular_celdas_propiedades
+from .paginas import invalidar_paginas
+from .ubicaciones import invalidar_ubicaciones
 
 
-def gestionar_propiedades_por_suscripcion(usuario):
+# Slots fijos de la página principal: 3 premium + 3 normales
+SLOTS_PREMIUM = 3
+SLOTS_NORMAL = 3
+CACHE_SLOTS_DESTACADOS = 'propiedades:slots_destacados'
+CACHE_SLOTS_TIMEOUT = 300  # segundos
+
+
+def filtrar_propiedades(propiedades, form, params):
+    """
+    Aplica los filtros del listado de propiedades.
+    
+    Compartido por listado_propiedades y por el comando auditar_indices,
+    para que la auditoría de planes de consulta use exactamente los mismos filtros.
+    
+    Args:
+        propiedades: QuerySet base de Propiedad
+        form: BusquedaForm ligado a los parámetros
+        params: QueryDict/dict con los parámetros GET
+    
+    Returns:
+        QuerySet: Propiedades filtradas
+    """
+    if form.is_valid():
+        busqueda = form.cleaned_data.get('busqueda')
+        if busqueda:
+            # Índice invertido: ordena por relevancia y luego por fecha
+            propiedades = filtrar_por_texto(propiedades, busqueda)
+            if 'relevancia' in propiedades.query.annotations:
+                propiedades = propiedades.order_by('-relevancia', '-fecha_publicacion')
+        
+        tipo = form.cleaned_data.get('tipo')
+        if tipo:
+            propiedades = propiedades.filter(tipo=tipo)
+        
+        ciudad = form.cleaned_data.get('ciudad')
+        if ciudad:
+            propiedades = propiedades.filter(ciudad__icontains=ciudad)
+        
+        precio_min = form.cleaned_data.get('precio_min')
+        if precio_min:
+            propiedades = propiedades.filter(precio__gte=precio_min)
+        
+        precio_max = form.cleaned_data.get('precio_max')
+        if precio_max:
+            propiedades = propiedades.filter(precio__lte=precio_max)
+    
+    # Filtro por tipo desde la URL (para botones de filtro rápido)
+    tipo_url = params.get('tipo')
+    if tipo_url and tipo_url in ['departamento', 'casa', 'cuarto', 'local', 'terreno', 'oficina']:
+        propiedades = propiedades.filter(tipo=tipo_url)
+    
+    # Filtro por operación (alquiler o venta) desde la URL
+    operacion = params.get('operacion')
+    if operacion and operacion in ['alquiler', 'venta']:
+        propiedades = propiedades.filter(operacion=operacion)
+    
+    # Filtro por categoría
+    categoria_id = params.get('categoria')
+    if categoria_id:
+        propiedades = propiedades.filter(categoria_id=categoria_id)
+    
+    habitaciones = params.get('habitaciones')
+    if habitaciones and habitaciones.isdigit():
+        propiedades = propiedades.filter(habitaciones__gte=int(habitaciones))
+    
+    banos = params.get('banos')
+    if banos and banos.isdigit():
+        propiedades = propiedades.filter(banos__gte=int(banos))
+    
+    area_min = params.get('area_min')
+    if area_min and area_min.replace('.', '', 1).isdigit():
+        propiedades = propiedades.filter(area__gte=float(area_min))
+    
+    area_max = params.get('area_max')
+    if area_max and area_max.replace('.', '', 1).isdigit():
+        propiedades = propiedades.filter(area__lte=float(area_max))
+    
+    tipo_contacto = params.get('tipo_contacto')
+    if tipo_contacto in ['dueno', 'inmobiliaria']:
+        propiedades = propiedades.filter(tipo_contacto=tipo_contacto)
+    
+    # Características, comodidades, edificio y especial estudiantes:
+    # todas las casillas marcadas se resuelven con una sola condición bit a bit
+    marcadas = [campo for campo in Propiedad.AMENIDADES if params.get(campo)]
+    if marcadas:
+        propiedades = filtrar_por_amenidades(propiedades, marcadas)
+    
+    # Búsqueda por mapa: radio en km (lat, lng, radio) o área visible (sur, oeste, norte, este)
+    propiedades = filtrar_geo(propiedades, params)
+    
+    return propiedades
+
+
+def filtrar_por_amenidades(propiedades, campos):
+    """Propiedades que tienen todas las amenidades indicadas (amenidades & m = m)"""
+    mascara = Propiedad.mascara_amenidades(campos)
+    return propiedades.alias(
+        amenidades_marcadas=F('amenidades').bitand(mascara)
+    ).filter(amenidades_marcadas=mascara)
+
+
+MOTIVO_SIN_SUSCRIPCION = 'Se requiere una suscripción activa para publicaciones adicionales. Tu primera publicación es gratis y permanente.'
+
+
+def _motivo_limite(posicion, limite_total):
+    if posicion == 2 and limite_total == 1:
+        return MOTIVO_SIN_SUSCRIPCION
+    return f'Has alcanzado el límite de tu plan. Esta es tu publicación #{posicion}. Mejora tu plan para activarla.'
+
+
+def _propiedades_con_posicion(propietarios_ids):
+    """
+    Propiedades de los propietarios con su posición de publicación (1 = la
+    más antigua), calculada con una función de ventana por propietario.
+    """
+    return Propiedad.objects.filter(
+        propietario_id__in=propietarios_ids
+    ).annotate(
+        posicion=Window(
+            expression=RowNumber(),
+            partition_by=[F('propietario_id')],
+            order_by=[F('fecha_publicacion').asc(), F('pk').asc()],
+        )
+    ).order_by().values_list('pk', 'propietario_id', 'titulo', 'estado', 'motivo_suspension', 'posicion')
+
+
+def _particionar(filas, limites):
     """
-    Gestiona las propiedades activas/suspendidas de un usuario según su suscripción.
+    Decide qué propiedades reactivar y cuáles suspender.
     
     Reglas:
     - La primera propiedad publicada es siempre gratis y permanente
@@ -15,6 +152,72 @@ def gestionar_propiedades_por_suscripcion(usuario):
     - Se suspenden las propiedades más recientes cuando se excede el límite
     - Las suspendidas por suscripción se reactivan automáticamente al contratar plan
     
+    Args:
+        filas: resultado de _propiedades_con_posicion()
+        limites: {propietario_id: limite_total}
+    
+    Returns:
+        tuple: (ids a reactivar, {id: motivo} a suspender, {propietario_id: resumen})
+    """
+    reactivar = []
+    suspender = {}
+    resumen = {}
+    for pk, propietario_id, titulo, estado, motivo, posicion in filas:
+        limite_total = limites[propietario_id]
+        datos = resumen.setdefault(propietario_id, {
+            'activas': 0, 'suspendidas': 0, 'limite_total': limite_total, 'cambios': []
+        })
+        if posicion <= limite_total:
+            if estado == 'suspendida' and 'suscripción' in (motivo or ''):
+                reactivar.append(pk)
+                estado = 'activa'
+                datos['cambios'].append(f'Reactivada: {titulo}')
+        elif estado == 'activa':
+            suspender[pk] = _motivo_limite(posicion, limite_total)
+            estado = 'suspendida'
+            datos['cambios'].append(f'Suspendida: {titulo}')
+        
+        if estado == 'activa':
+            datos['activas'] += 1
+        elif estado == 'suspendida':
+            datos['suspendidas'] += 1
+    return reactivar, suspender, resumen
+
+
+def _aplicar_particion(reactivar, suspender):
+    """Como máximo dos UPDATE en bloque (las señales de Propiedad no se disparan)"""
+    ahora = timezone.now()
+    if reactivar:
+        Propiedad.objects.filter(pk__in=reactivar).update(
+            estado='activa', motivo_suspension='', fecha_actualizacion=ahora
+        )
+    if suspender:
+        Propiedad.objects.filter(pk__in=list(suspender)).update(
+            estado='suspendida',
+            motivo_suspension=Case(
+                *[When(pk=pk, then=Value(motivo)) for pk, motivo in suspender.items()],
+                output_field=CharField(),
+            ),
+            fecha_actualizacion=ahora,
+        )
+    if reactivar or suspender:
+        invalidar_slots_destacados()
+        invalidar_ubicaciones()
+        invalidar_paginas()
+        recalcular_celdas_propiedades(reactivar + list(suspender))
+    from .tareas import avisar_busquedas_guardadas, notificar_cambio_favoritos  # tareas importa este módulo
+    for pk in reactivar:
+        # Una reactivada puede entrar en búsquedas guardadas después de la suspensión
+        avisar_busquedas_guardadas.encolar(pk)
+    if suspender:
+        notificar_cambio_favoritos.encolar(list(suspender), 'suspendida')
+
+
+def gestionar_propiedades_por_suscripcion(usuario):
+    """
+    Gestiona las propiedades activas/suspendidas de un usuario según su suscripción
+    (reglas en _particionar).
+    
     Args:
         usuario: Instancia de Usuario propietario
     
@@ -23,19 +226,11 @@ def gestionar_propiedades_por_suscripcion(usuario):
     """
     from suscripciones.models import Suscripcion
     
-    # Obtener todas las propiedades ordenadas por fecha de publicación (más antigua primero)
-    todas_propiedades = Propiedad.objects.filter(
-        propietario=usuario
-    ).order_by('fecha_publicacion')
-    
-    if not todas_propiedades.exists():
-        return {'activas': 0, 'suspendidas': 0, 'cambios': []}
-    
     # Verificar suscripción activa
     suscripcion_activa = Suscripcion.objects.filter(
         usuario=usuario,
         estado='activa'
-    ).first()
+    ).select_related('plan').first()
     
     # Determinar límite
     if suscripcion_activa and suscripcion_activa.esta_activa():
@@ -43,40 +238,53 @@ def gestionar_propiedades_por_suscripcion(usuario):
     else:
         limite_total = 1  # Solo la primera gratis
     
-    cambios = []
+    filas = _propiedades_con_posicion([usuario.pk])
+    reactivar, suspender, resumen = _particionar(filas, {usuario.pk: limite_total})
+    if usuario.pk not in resumen:
+        return {'activas': 0, 'suspendidas': 0, 'cambios': []}
+    
+    with transaction.atomic():
+        _aplicar_particion(reactivar, suspender)
+    if resumen[usuario.pk]['cambios']:
+        invalidar_habilitaciones([usuario.pk])
+    return resumen[usuario.pk]
+
+
+def reevaluar_plan(plan, tamano_lote=200, simular=False):
+    """
+    Re-evalúa los límites de todos los propietarios suscriptos a un plan (por
+    ejemplo después de cambiar max_publicaciones), por lotes de propietarios:
+    una consulta con ventana y como máximo dos UPDATE por lote.
     
-    # Procesar propiedades en orden de publicación
-    for i, propiedad in enumerate(todas_propiedades):
-        posicion = i + 1
-        
-        if posicion <= limite_total:
-            # Esta propiedad debe estar activa
-            if propiedad.estado == 'suspendida' and 'suscripción' in (propiedad.motivo_suspension or ''):
-                propiedad.estado = 'activa'
-                propiedad.motivo_suspension = ''
-                propiedad.save()
-                cambios.append(f'Reactivada: {propiedad.titulo}')
-        else:
-            # Esta propiedad excede el límite y debe estar suspendida
-            if propiedad.estado == 'activa':
-                propiedad.estado = 'suspendida'
-                if posicion == 2 and limite_total == 1:
-                    propiedad.motivo_suspension = 'Se requiere una suscripción activa para publicaciones adicionales. Tu primera publicación es gratis y permanente.'
-                else:
-                    propiedad.motivo_suspension = f'Has alcanzado el límite de tu plan. Esta es tu publicación #{posicion}. Mejora tu plan para activarla.'
-                propiedad.save()
-                cambios.append(f'Suspendida: {propiedad.titulo}')
-    
-    # Contar estados finales
-    activas = todas_propiedades.filter(estado='activa').count()
-    suspendidas = todas_propiedades.filter(estado='suspendida').count()
-    
-    return {
-        'activas': activas,
-        'suspendidas': suspendidas,
-        'limite_total': limite_total,
-        'cambios': cambios
-    }
+    Args:
+        plan: PlanSuscripcion
+        tamano_lote: Propietarios por lote
+        simular: Si es True no modifica nada (solo informa)
+    
+    Returns:
+        dict: {propietario_id: resumen} de los propietarios con cambios
+    """
+    from suscripciones.models import Suscripcion
+    
+    limite_total = 1 + plan.max_publicaciones
+    propietarios = list(
+        Suscripcion.objects.filter(
+            plan=plan, estado='activa', fecha_vencimiento__gt=timezone.now()
+        ).order_by('usuario_id').values_list('usuario_id', flat=True).distinct()
+    )
+    
+    con_cambios = {}
+    for inicio in range(0, len(propietarios), tamano_lote):
+        lote = propietarios[inicio:inicio + tamano_lote]
+        filas = _propiedades_con_posicion(lote)
+        reactivar, suspender, resumen = _particionar(filas, dict.fromkeys(lote, limite_total))
+        lote_con_cambios = {pk: datos for pk, datos in resumen.items() if datos['cambios']}
+        if not simular:
+            with transaction.atomic():
+                _aplicar_particion(reactivar, suspender)
+            invalidar_habilitaciones(lote_con_cambios)
+        con_cambios.update(lote_con_cambios)
+    return con_cambios
 
 
 def puede_activar_propiedad(usuario, propiedad_id=None):
@@ -90,43 +298,106 @@ def puede_activar_propiedad(usuario, propiedad_id=None):
     Returns:
         tuple: (puede_activar: bool, mensaje: str, es_primera: bool)
     """
+    return usuario.habilitaciones.puede_activar(propiedad_id)
+
+
+def recalcular_prioridades(usuarios=None):
+    """
+    Recalcula la prioridad materializada de los destacados activos.
+    
+    Se usa cuando cambia algo externo al destacado que afecta su prioridad
+    (suscripción o plan del propietario). Resuelve el plan de todos los
+    propietarios con una sola consulta y guarda con bulk_update.
+    
+    Args:
+        usuarios: ids/queryset de usuarios a recalcular (None = todos)
+    
+    Returns:
+        int: Cantidad de destacados cuya prioridad cambió
+    """
     from suscripciones.models import Suscripcion
     
-    # Obtener primera propiedad del usuario
-    primera_propiedad = Propiedad.objects.filter(
-        propietario=usuario
-    ).order_by('fecha_publicacion').first()
+    destacados = Destacado.objects.filter(activo=True).select_related('propiedad')
+    suscripciones = Suscripcion.objects.filter(estado='activa').select_related('plan').order_by('-fecha_inicio')
+    if usuarios is not None:
+        destacados = destacados.filter(propiedad__propietario__in=usuarios)
+        suscripciones = suscripciones.filter(usuario__in=usuarios)
     
-    # Si es la primera propiedad del usuario
-    if not primera_propiedad:
-        return (True, 'Tu primera publicación es gratis y permanente', True)
+    # Misma regla que calcular_prioridad: la suscripción activa más reciente y vigente
+    planes = {}
+    for suscripcion in suscripciones:
+        if suscripcion.usuario_id not in planes:
+            planes[suscripcion.usuario_id] = suscripcion.plan.nombre if suscripcion.esta_activa() else ''
     
-    # Si la propiedad a activar es la primera propiedad
-    if propiedad_id and primera_propiedad.pk == propiedad_id:
-        return (True, 'Esta es tu primera publicación (gratis y permanente)', True)
+    modificados = []
+    for destacado in destacados:
+        prioridad = destacado.calcular_prioridad(planes.get(destacado.propiedad.propietario_id, ''))
+        if prioridad != destacado.prioridad:
+            destacado.prioridad = prioridad
+            modificados.append(destacado)
     
-    # Para propiedades adicionales, verificar suscripción
-    suscripcion_activa = Suscripcion.objects.filter(
-        usuario=usuario,
-        estado='activa'
-    ).first()
+    if modificados:
+        Destacado.objects.bulk_update(modificados, ['prioridad'])
+        invalidar_paginas()
+    invalidar_slots_destacados()
     
-    if not suscripcion_activa or not suscripcion_activa.esta_activa():
-        return (False, 'Tu primera publicación es gratis. Para publicaciones adicionales necesitas una suscripción activa.', False)
+    return len(modificados)
+
+
+def obtener_slots_destacados():
+    """
+    Retorna los ids de las propiedades destacadas de la portada.
     
-    # Verificar límite del plan
-    propiedades_activas = Propiedad.objects.filter(
-        propietario=usuario,
-        estado='activa'
-    )
+    El ranking se arma con una única consulta sobre la prioridad materializada
+    y se guarda en cache hasta que cambie un destacado, una suscripción o un
+    plan (ver signals.py), o hasta que venza el próximo destacado.
+    
+    Returns:
+        tuple: (ids_premium, ids_normal) ordenados por prioridad descendente
+    """
+    slots = cache.get(CACHE_SLOTS_DESTACADOS)
+    if slots is not None:
+        return slots
+    
+    ahora = timezone.now()
+    # Los vencidos siguen activo=True hasta que pasa barrer_vencimientos: no ocupan slot
+    destacados = Destacado.objects.filter(
+        activo=True,
+        fecha_fin__gt=ahora,
+        propiedad__estado='activa'
+    ).order_by('propiedad_id', '-fecha_inicio').values_list('propiedad_id', 'tipo', 'prioridad', 'fecha_fin')
     
-    if propiedad_id:
-        propiedades_activas = propiedades_activas.exclude(pk=propiedad_id)
+    # Un destacado por propiedad: el más reciente (mismo criterio que obtener_destacado_activo)
+    por_propiedad = {}
+    proximo_vencimiento = None
+    for propiedad_id, tipo, prioridad, fecha_fin in destacados:
+        por_propiedad.setdefault(propiedad_id, (tipo, prioridad))
+        if proximo_vencimiento is None or fecha_fin < proximo_vencimiento:
+            proximo_vencimiento = fecha_fin
     
-    activas_count = propiedades_activas.count()
-    limite_total = 1 + suscripcion_activa.plan.max_publicaciones
+    ranking = sorted(por_propiedad.items(), key=lambda item: item[1][1], reverse=True)
+    ids_premium = [pk for pk, (tipo, _) in ranking if tipo == 'premium'][:SLOTS_PREMIUM]
+    ids_normal = [pk for pk, (tipo, _) in ranking if tipo == 'normal'][:SLOTS_NORMAL]
+    slots = (ids_premium, ids_normal)
     
-    if activas_count >= limite_total:
-        return (False, f'Has alcanzado el límite de {limite_total} publicaciones activas (1 gratis + {suscripcion_activa.plan.max_publicaciones} de tu plan {suscripcion_activa.plan.nombre})', False)
+    # No mantener en cache un destacado que ya venció
+    timeout = CACHE_SLOTS_TIMEOUT
+    if proximo_vencimiento is not None:
+        timeout = max(1, min(timeout, int((proximo_vencimiento - ahora).total_seconds())))
+    cache.set(CACHE_SLOTS_DESTACADOS, slots, timeout)
     
-    return (True, f'Puedes activar esta propiedad. Tienes {limite_total - activas_count} espacio(s) disponible(s)', False)
+    return slots
+
+
+def invalidar_slots_destacados():
+    """Descarta el ranking de destacados guardado en cache"""
+    cache.delete(CACHE_SLOTS_DESTACADOS)
+
+
+def actualizar_portada(propiedad_id):
+    """
+    Apunta imagen_portada a la primera imagen de la propiedad (o None). Mueve
+    fecha_actualizacion para que se regeneren las tarjetas cacheadas.
+    """
+    portada_id = ImagenPropiedad.objects.filter(propiedad_id=propiedad_id).values_list('pk', flat=True).first()
+    Propiedad.objects.filter(pk=propiedad_id).update(imagen_portada_id=portada_id, fecha_actualizacion=timezone.now())
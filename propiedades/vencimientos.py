@@ -0,0 +1,81 @@
+"""
+Barrido de vencimientos.
+
+Los destacados, las suscripciones y las publicaciones con fecha de
+expiración vencen por fecha, pero las consultas de las vistas solo miran la
+columna de estado (activo / estado). Este barrido, pensado para correr
+periódicamente (manage.py barrer_vencimientos desde cron), pasa a su estado
+final todo lo vencido con UPDATEs en bloque y después dispara la
+re-evaluación de límites de plan de los propietarios afectados.
+"""
+from django.db import transaction
+from django.utils import timezone
+from suscripciones.models import Suscripcion
+
+from .models import Destacado, Propiedad
+from .habilitaciones import invalidar_habilitaciones
+from .mapa import recalcular_celdas_propiedades
+from .paginas import invalidar_paginas
+from .tareas import gestionar_propiedades
+from .ubicaciones import invalidar_ubicaciones
+from .utils import invalidar_slots_destacados, recalcular_prioridades
+
+MOTIVO_EXPIRACION = 'La publicación alcanzó su fecha de expiración.'
+
+
+def barrer_vencimientos(ahora=None):
+    """
+    Desactiva destacados vencidos, marca suscripciones vencidas e inactiva
+    publicaciones expiradas.
+
+    Returns:
+        dict: Cantidad de destacados, suscripciones y propiedades actualizadas
+    """
+    ahora = ahora or timezone.now()
+
+    with transaction.atomic():
+        destacados = Destacado.objects.filter(activo=True, fecha_fin__lte=ahora)
+        propiedades_destacadas = list(destacados.values_list('propiedad_id', flat=True).distinct())
+        total_destacados = destacados.update(activo=False)
+        if propiedades_destacadas:
+            # La marca 'destacada' solo queda donde sigue habiendo un destacado activo
+            Propiedad.objects.filter(
+                pk__in=propiedades_destacadas, destacada=True
+            ).exclude(destacados__activo=True).update(destacada=False)
+
+        vencidas = list(
+            Suscripcion.objects.filter(estado='activa', fecha_vencimiento__lte=ahora)
+            .values_list('pk', 'usuario_id')
+        )
+        total_suscripciones = Suscripcion.objects.filter(
+            pk__in=[pk for pk, _ in vencidas], estado='activa'
+        ).update(estado='vencida')
+
+        expiradas = list(
+            Propiedad.objects.filter(estado='activa', fecha_expiracion__lte=ahora).values_list('pk', flat=True)
+        )
+        total_propiedades = Propiedad.objects.filter(
+            pk__in=expiradas, estado='activa'
+        ).update(estado='inactiva', motivo_suspension=MOTIVO_EXPIRACION, fecha_actualizacion=ahora)
+
+        # Sin suscripción vigente el propietario vuelve al límite gratuito
+        for suscripcion_id, usuario_id in vencidas:
+            gestionar_propiedades.encolar(usuario_id, clave=f'gestionar-propiedades:{suscripcion_id}:vencida')
+
+    # Los UPDATE en bloque no disparan señales: invalidar a mano lo precalculado
+    if vencidas:
+        recalcular_prioridades({usuario_id for _, usuario_id in vencidas})
+    if total_destacados or total_propiedades:
+        invalidar_slots_destacados()
+        invalidar_paginas()
+    if total_propiedades:
+        invalidar_ubicaciones()
+        recalcular_celdas_propiedades(expiradas)
+    if total_destacados or total_suscripciones or total_propiedades:
+        invalidar_habilitaciones()
+
+    return {
+        'destacados': total_destacados,
+        'suscripciones': total_suscripciones,
+        'propiedades': total_propiedades,
+    }
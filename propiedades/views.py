@@ -1,59 +1,42 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Q, Count, Avg
-from django.core.paginator import Paginator
-from django.http import JsonResponse
-from .models import Propiedad, Categoria, Favorito, Valoracion, ImagenPropiedad, ReporteValoracion, Destacado
+from django.db.models import Q, Count, Avg, OuterRef, Subquery, Sum
+from django.http import JsonResponse, QueryDict
+from django.urls import reverse
+from Proyecto_BuscoTecho.replicas import lectura_en_replica
+from .models import Propiedad, Categoria, BusquedaGuardada, Favorito, Valoracion, ImagenPropiedad, ReporteValoracion, Destacado, VistaDiaria
 from .forms import PropiedadForm, BusquedaForm, ValoracionForm
+from .utils import filtrar_propiedades
+from .alertas import MAXIMO_BUSQUEDAS_USUARIO, nombre_sugerido, parametros_busqueda
+from .paginacion import PaginadorCursor
+from .facetas import PARAMETROS_PAGINACION, obtener_facetas
+from .geo import parametros_caja, parametros_geo
+from .mapa import clusters
+from .paginas import cachear_para_anonimos
+from .recomendaciones import recomendadas_para
+from .ubicaciones import buscar_ubicaciones
+from .tareas import notificar_reporte_valoracion
 
+MAXIMO_RESULTADOS_MAPA = 200
+
+@cachear_para_anonimos
 def inicio(request):
     """Página principal con búsqueda y propiedades destacadas"""
-    from django.utils import timezone
-    from django.db.models import Q, Prefetch
+    from .utils import obtener_slots_destacados
     
     # Sistema de Slots Fijos para la página principal
     # 6 destacados totales: 3 premium + 3 normales
+    # El ranking (prioridad materializada) viene precalculado desde cache
+    ids_premium, ids_normal = obtener_slots_destacados()
+    ids_destacadas = ids_premium + ids_normal
     
-    # Obtener destacados activos y vigentes
-    destacados_activos = Propiedad.objects.filter(
-        estado='activa',
-        destacados__activo=True,
-        destacados__fecha_fin__gt=timezone.now()
-    ).select_related('propietario', 'categoria').prefetch_related('imagenes', 'destacados').distinct()
-    
-    # Aplicar algoritmo de prioridad
-    propiedades_con_prioridad = []
-    for prop in destacados_activos:
-        destacado = prop.destacados.filter(
-            activo=True,
-            fecha_fin__gt=timezone.now()
-        ).first()
-        
-        if destacado:
-            prioridad = destacado.calcular_prioridad()
-            propiedades_con_prioridad.append({
-                'propiedad': prop,
-                'destacado': destacado,
-                'prioridad': prioridad
-            })
-    
-    # Ordenar por prioridad descendente
-    propiedades_con_prioridad.sort(key=lambda x: x['prioridad'], reverse=True)
-    
-    # Separar por tipo y aplicar slots
-    premium_destacadas = [
-        item['propiedad'] for item in propiedades_con_prioridad 
-        if item['destacado'].tipo == 'premium'
-    ][:3]  # Máximo 3 premium
-    
-    normal_destacadas = [
-        item['propiedad'] for item in propiedades_con_prioridad 
-        if item['destacado'].tipo == 'normal'
-    ][:3]  # Máximo 3 normales
-    
-    # Combinar destacadas (6 totales)
-    propiedades_destacadas = premium_destacadas + normal_destacadas
+    propiedades_por_id = Propiedad.objects.filter(
+        estado='activa'
+    ).select_related('propietario', 'categoria', 'imagen_portada').in_bulk(ids_destacadas)
+    
+    # Combinar destacadas (6 totales) respetando el orden del ranking
+    propiedades_destacadas = [propiedades_por_id[pk] for pk in ids_destacadas if pk in propiedades_por_id]
     
     # NO rellenar con propiedades recientes - solo mostrar las que tienen prioridad activa
     
@@ -61,7 +44,17 @@ def inicio(request):
     propiedades_estudiantes = list(Propiedad.objects.filter(
         estado='activa',
         especial_estudiantes=True
-    ).select_related('propietario').prefetch_related('imagenes')[:4])
+    ).select_related('propietario', 'imagen_portada')[:4])
+    
+    # Recomendadas para el usuario según sus favoritos, contactos y vistas
+    recomendadas = []
+    if request.user.is_authenticated:
+        ids_recomendadas = recomendadas_para(request.user.pk)
+        if ids_recomendadas:
+            por_id = Propiedad.objects.filter(estado='activa').exclude(
+                propietario=request.user
+            ).select_related('propietario', 'categoria', 'imagen_portada').in_bulk(ids_recomendadas)
+            recomendadas = [por_id[pk] for pk in ids_recomendadas if pk in por_id][:4]
     
     # Categorías
     categorias = Categoria.objects.all()
@@ -72,6 +65,7 @@ def inicio(request):
     context = {
         'propiedades_destacadas': propiedades_destacadas,
         'propiedades_estudiantes': propiedades_estudiantes,
+        'recomendadas': recomendadas,
         'categorias': categorias,
         'form': form,
     }
@@ -79,139 +73,44 @@ def inicio(request):
 
 
 
+@cachear_para_anonimos
+@lectura_en_replica
 def listado_propiedades(request):
     """Listado de propiedades con filtros y búsqueda"""
     propiedades = Propiedad.objects.filter(estado='activa').select_related(
-        'propietario', 'categoria'
-    ).prefetch_related('imagenes')
+        'propietario', 'categoria', 'imagen_portada'
+    )
     
     # Aplicar filtros
     form = BusquedaForm(request.GET)
-    if form.is_valid():
-        busqueda = form.cleaned_data.get('busqueda')
-        if busqueda:
-            propiedades = propiedades.filter(
-                Q(titulo__icontains=busqueda) |
-                Q(descripcion__icontains=busqueda) |
-                Q(ciudad__icontains=busqueda) |
-                Q(distrito__icontains=busqueda)
-            )
-        
-        tipo = form.cleaned_data.get('tipo')
-        if tipo:
-            propiedades = propiedades.filter(tipo=tipo)
-        
-        ciudad = form.cleaned_data.get('ciudad')
-        if ciudad:
-            propiedades = propiedades.filter(ciudad__icontains=ciudad)
-        
-        precio_min = form.cleaned_data.get('precio_min')
-        if precio_min:
-            propiedades = propiedades.filter(precio__gte=precio_min)
-        
-        precio_max = form.cleaned_data.get('precio_max')
-        if precio_max:
-            propiedades = propiedades.filter(precio__lte=precio_max)
-    
-    # Filtro por tipo desde la URL (para botones de filtro rápido)
-    tipo_url = request.GET.get('tipo')
-    if tipo_url and tipo_url in ['departamento', 'casa', 'cuarto', 'local', 'terreno', 'oficina']:
-        propiedades = propiedades.filter(tipo=tipo_url)
-    
-    # Filtro por operación (alquiler o venta) desde la URL
-    operacion = request.GET.get('operacion')
-    if operacion and operacion in ['alquiler', 'venta']:
-        propiedades = propiedades.filter(operacion=operacion)
-    
-    # Filtro por categoría
-    categoria_id = request.GET.get('categoria')
-    if categoria_id:
-        propiedades = propiedades.filter(categoria_id=categoria_id)
-    
-    # Filtro por especial estudiantes
-    especial_estudiantes = request.GET.get('especial_estudiantes')
-    if especial_estudiantes:
-        propiedades = propiedades.filter(especial_estudiantes=True)
-    
-    # Filtros adicionales (características)
-    if request.GET.get('amoblado'):
-        propiedades = propiedades.filter(amoblado=True)
-    
-    if request.GET.get('mascotas'):
-        propiedades = propiedades.filter(mascotas=True)
-    
-    if request.GET.get('estacionamiento'):
-        propiedades = propiedades.filter(estacionamiento=True)
-    
-    if request.GET.get('incluye_expensas'):
-        propiedades = propiedades.filter(incluye_expensas=True)
-    
-    habitaciones = request.GET.get('habitaciones')
-    if habitaciones and habitaciones.isdigit():
-        propiedades = propiedades.filter(habitaciones__gte=int(habitaciones))
-    
-    banos = request.GET.get('banos')
-    if banos and banos.isdigit():
-        propiedades = propiedades.filter(banos__gte=int(banos))
+    propiedades = filtrar_propiedades(propiedades, form, request.GET)
     
-    area_min = request.GET.get('area_min')
-    if area_min and area_min.replace('.', '', 1).isdigit():
-        propiedades = propiedades.filter(area__gte=float(area_min))
+    # Paginación por cursor: (relevancia,) fecha_publicacion, id
+    campos_orden = ['fecha_publicacion']
+    if 'relevancia' in propiedades.query.annotations:
+        campos_orden = ['relevancia', 'fecha_publicacion']
+    page_obj = PaginadorCursor(propiedades, 12, campos_orden).get_page(request.GET)
     
-    area_max = request.GET.get('area_max')
-    if area_max and area_max.replace('.', '', 1).isdigit():
-        propiedades = propiedades.filter(area__lte=float(area_max))
-    
-    tipo_contacto = request.GET.get('tipo_contacto')
-    if tipo_contacto in ['dueno', 'inmobiliaria']:
-        propiedades = propiedades.filter(tipo_contacto=tipo_contacto)
-    
-    # Filtros de comodidades
-    if request.GET.get('balcon'):
-        propiedades = propiedades.filter(balcon=True)
-    
-    if request.GET.get('patio'):
-        propiedades = propiedades.filter(patio=True)
-    
-    if request.GET.get('parrilla'):
-        propiedades = propiedades.filter(parrilla=True)
-    
-    if request.GET.get('aire_acondicionado'):
-        propiedades = propiedades.filter(aire_acondicionado=True)
-    
-    if request.GET.get('calefaccion'):
-        propiedades = propiedades.filter(calefaccion=True)
-    
-    if request.GET.get('ascensor'):
-        propiedades = propiedades.filter(ascensor=True)
-    
-    # Filtros de edificio
-    if request.GET.get('seguridad'):
-        propiedades = propiedades.filter(seguridad=True)
-    
-    if request.GET.get('amenities'):
-        propiedades = propiedades.filter(amenities=True)
-    
-    if request.GET.get('accesibilidad'):
-        propiedades = propiedades.filter(accesibilidad=True)
-    
-    # Paginación
-    paginator = Paginator(propiedades, 12)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Filtros rápidos por tipo: conservan el resto de los filtros
+    sin_tipo = request.GET.copy()
+    for clave in PARAMETROS_PAGINACION | {'tipo'}:
+        sin_tipo.pop(clave, None)
     
     context = {
         'page_obj': page_obj,
         'form': form,
         'categorias': Categoria.objects.all(),
+        'facetas': obtener_facetas(request.GET),
+        'consulta_sin_tipo': sin_tipo.urlencode(),
     }
     return render(request, 'propiedades/listado.html', context)
 
 
+@lectura_en_replica
 def detalle_propiedad(request, pk):
     """Detalle de una propiedad"""
     propiedad = get_object_or_404(
-        Propiedad.objects.select_related('propietario', 'categoria').prefetch_related('imagenes', 'valoraciones'),
+        Propiedad.objects.select_related('propietario', 'categoria', 'imagen_portada').prefetch_related('imagenes', 'valoraciones'),
         pk=pk
     )
     
@@ -219,7 +118,7 @@ def detalle_propiedad(request, pk):
     preview_mode = request.GET.get('preview') == '1'
     
     # Incrementar vistas
-    propiedad.incrementar_vistas()
+    propiedad.incrementar_vistas(request.user.pk)
     
     # Verificar si es favorito
     es_favorito = False
@@ -229,17 +128,27 @@ def detalle_propiedad(request, pk):
     # Valoraciones
     valoraciones = propiedad.valoraciones.select_related('usuario').all()
     
-    # Propiedades similares
-    propiedades_similares = Propiedad.objects.filter(
-        estado='activa',
-        categoria=propiedad.categoria
-    ).exclude(pk=propiedad.pk).select_related('propietario', 'categoria').prefetch_related('imagenes')[:4]
+    # Propiedades similares (similares.py) y "quienes guardaron esta también
+    # guardaron" (recomendaciones.py): listas precalculadas, una sola consulta
+    activas = Propiedad.objects.filter(estado='activa').select_related('propietario', 'categoria', 'imagen_portada')
+    ids_similares = [pk for pk, _ in propiedad.similares]
+    ids_recomendadas = [pk for pk, _ in propiedad.recomendadas if pk not in ids_similares][:4]
+    por_id = activas.in_bulk(ids_similares + ids_recomendadas) if ids_similares or ids_recomendadas else {}
+    if propiedad.similares:
+        propiedades_similares = [por_id[pk] for pk in ids_similares if pk in por_id]
+    else:
+        # Todavía sin índice: misma categoría
+        propiedades_similares = activas.filter(
+            categoria=propiedad.categoria
+        ).exclude(pk=propiedad.pk)[:4]
+    tambien_guardaron = [por_id[pk] for pk in ids_recomendadas if pk in por_id]
     
     context = {
         'propiedad': propiedad,
         'es_favorito': es_favorito,
         'valoraciones': valoraciones,
         'propiedades_similares': propiedades_similares,
+        'tambien_guardaron': tambien_guardaron,
         'preview_mode': preview_mode,
     }
     return render(request, 'propiedades/detalle.html', context)
@@ -258,33 +167,19 @@ def crear_propiedad(request):
         messages.warning(request, 'Debes validar tu teléfono y email antes de publicar propiedades')
         return redirect('usuarios:perfil', username=request.user.username)
     
-    # Contar cuántas propiedades tiene el usuario (activas o suspendidas)
-    total_propiedades = Propiedad.objects.filter(propietario=request.user).count()
+    habilitaciones = request.user.habilitaciones
     
     # La primera propiedad es gratis, las demás requieren suscripción
-    if total_propiedades >= 1:
+    if habilitaciones.total_propiedades >= 1:
         # Verificar que tenga una suscripción activa para publicaciones adicionales
-        from suscripciones.models import Suscripcion
-        suscripcion_activa = Suscripcion.objects.filter(
-            usuario=request.user,
-            estado='activa'
-        ).first()
-        
-        if not suscripcion_activa or not suscripcion_activa.esta_activa():
+        if not habilitaciones.tiene_suscripcion:
             messages.warning(request, 'Tu primera publicación es gratis. Para publicar más propiedades necesitas una suscripción activa.')
             return redirect('suscripciones:planes')
         
-        # Verificar límite de publicaciones según el plan (no contar la primera que es gratis)
-        propiedades_activas = Propiedad.objects.filter(
-            propietario=request.user,
-            estado='activa'
-        ).count()
-        
         # El límite del plan es adicional a la primera publicación gratis
-        limite_total = suscripcion_activa.plan.max_publicaciones + 1
-        
-        if propiedades_activas >= limite_total:
-            messages.warning(request, f'Has alcanzado el límite de publicaciones activas (1 gratis + {suscripcion_activa.plan.max_publicaciones} del plan {suscripcion_activa.plan.nombre}). Mejora tu plan para publicar más.')
+        if habilitaciones.activas >= habilitaciones.limite_publicaciones:
+            plan = habilitaciones.plan
+            messages.warning(request, f'Has alcanzado el límite de publicaciones activas (1 gratis + {plan.max_publicaciones} del plan {plan.nombre}). Mejora tu plan para publicar más.')
             return redirect('suscripciones:planes')
     
     if request.method == 'POST':
@@ -324,30 +219,19 @@ def editar_propiedad(request, pk):
     
     propiedad = get_object_or_404(Propiedad, pk=pk, propietario=request.user)
     
-    # Obtener información de suscripción y destacados disponibles
-    from suscripciones.models import Suscripcion
-    suscripcion = Suscripcion.objects.filter(
-        usuario=request.user,
-        estado='activa'
-    ).select_related('plan').first()
+    # Información de suscripción y destacados disponibles (destacados usados en el mes)
+    habilitaciones = request.user.habilitaciones
+    suscripcion = habilitaciones.suscripcion
     
     destacados_disponibles = 0
     puede_destacar = False
     
-    if suscripcion and suscripcion.esta_activa():
-        plan = suscripcion.plan
-        if plan.destacados_incluidos_mes > 0:
-            # Contar destacados usados en el mes actual
-            inicio_mes = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            destacados_usados_mes = Destacado.objects.filter(
-                propiedad__propietario=request.user,
-                fecha_compra__gte=inicio_mes,
-                activo=True
-            ).count()
-            destacados_disponibles = plan.destacados_incluidos_mes - destacados_usados_mes
-            puede_destacar = destacados_disponibles > 0 or plan.puede_comprar_destacados
+    if habilitaciones.tiene_suscripcion:
+        if habilitaciones.destacados_incluidos > 0:
+            destacados_disponibles = habilitaciones.destacados_disponibles_mes
+            puede_destacar = destacados_disponibles > 0 or habilitaciones.puede_comprar_destacados
         else:
-            puede_destacar = plan.puede_comprar_destacados
+            puede_destacar = habilitaciones.puede_comprar_destacados
     
     # Obtener destacado activo actual
     destacado_activo = propiedad.obtener_destacado_activo()
@@ -358,7 +242,7 @@ def editar_propiedad(request, pk):
         
         if accion_destacado == 'activar':
             # Verificar que tenga suscripción y destacados disponibles
-            if not suscripcion or not suscripcion.esta_activa():
+            if not habilitaciones.tiene_suscripcion:
                 messages.error(request, 'Necesitas una suscripción activa para destacar propiedades.')
                 return redirect('suscripciones:planes')
             
@@ -406,41 +290,29 @@ def editar_propiedad(request, pk):
             # Verificar suscripción si se está reactivando la propiedad
             estado_nuevo = form.cleaned_data.get('estado')
             estado_anterior = propiedad.estado
+            # Solo las columnas del formulario: los agregados de valoraciones, vistas,
+            # portada y similares se escriben en paralelo y un save() completo los pisaría
+            campos = form.changed_data + ['fecha_actualizacion']
             
             if estado_anterior != 'activa' and estado_nuevo == 'activa':
-                # Verificar si es la primera propiedad del usuario
-                primera_propiedad = Propiedad.objects.filter(
-                    propietario=request.user
-                ).order_by('fecha_publicacion').first()
-                
                 # Si NO es la primera propiedad, requiere suscripción
-                if primera_propiedad.pk != propiedad.pk:
-                    suscripcion_activa = Suscripcion.objects.filter(
-                        usuario=request.user,
-                        estado='activa'
-                    ).first()
-                    
-                    if not suscripcion_activa or not suscripcion_activa.esta_activa():
+                if habilitaciones.primera_propiedad_id != propiedad.pk:
+                    if not habilitaciones.tiene_suscripcion:
                         messages.warning(request, 'Tu primera publicación es gratis y permanente. Para reactivar propiedades adicionales necesitas una suscripción activa.')
                         return redirect('suscripciones:planes')
                     
-                    # Verificar límite de publicaciones según el plan
-                    propiedades_activas = Propiedad.objects.filter(
-                        propietario=request.user,
-                        estado='activa'
-                    ).exclude(pk=propiedad.pk).count()
-                    
                     # El límite del plan es adicional a la primera publicación gratis
-                    limite_total = suscripcion_activa.plan.max_publicaciones + 1
-                    
-                    if propiedades_activas >= limite_total:
-                        messages.warning(request, f'Has alcanzado el límite de publicaciones activas (1 gratis + {suscripcion_activa.plan.max_publicaciones} del plan {suscripcion_activa.plan.nombre}).')
+                    if habilitaciones.activas_sin(propiedad.pk) >= habilitaciones.limite_publicaciones:
+                        plan = habilitaciones.plan
+                        messages.warning(request, f'Has alcanzado el límite de publicaciones activas (1 gratis + {plan.max_publicaciones} del plan {plan.nombre}).')
                         return redirect('suscripciones:planes')
                 
                 # Limpiar motivo de suspensión al reactivar
                 propiedad.motivo_suspension = ''
+                campos.append('motivo_suspension')
             
-            form.save()
+            propiedad = form.save(commit=False)
+            propiedad.save(update_fields=campos)
             
             # Procesar nuevas imágenes si se adjuntaron
             imagenes_nuevas = request.FILES.getlist('imagenes')
@@ -502,7 +374,7 @@ def suspender_propiedad(request, pk):
         # Suspender propiedad (sin motivo = suspensión manual)
         propiedad.estado = 'suspendida'
         propiedad.motivo_suspension = ''  # Suspensión manual no tiene motivo
-        propiedad.save()
+        propiedad.save(update_fields=['estado', 'motivo_suspension', 'fecha_actualizacion'])
         messages.info(request, 'Propiedad suspendida correctamente')
     else:
         # Intentar reactivar propiedad
@@ -513,7 +385,7 @@ def suspender_propiedad(request, pk):
         if puede:
             propiedad.estado = 'activa'
             propiedad.motivo_suspension = ''
-            propiedad.save()
+            propiedad.save(update_fields=['estado', 'motivo_suspension', 'fecha_actualizacion'])
             messages.success(request, 'Propiedad reactivada correctamente')
         else:
             messages.warning(request, mensaje)
@@ -532,11 +404,17 @@ def mis_propiedades(request):
         messages.warning(request, 'Debes ser propietario para acceder a esta sección')
         return redirect('usuarios:convertir_propietario')
     
+    # Tendencia: vistas de los últimos 7 días (buckets de VistaDiaria)
+    vistas_semana = VistaDiaria.objects.filter(
+        propiedad=OuterRef('pk'),
+        fecha__gte=timezone.localdate() - timedelta(days=6)
+    ).values('propiedad').annotate(total=Sum('vistas')).values('total')
+    
     propiedades_list = Propiedad.objects.filter(
         propietario=request.user
-    ).prefetch_related('imagenes').annotate(
-        total_valoraciones=Count('valoraciones'),
-        total_favoritos=Count('favoritos')
+    ).select_related('imagen_portada').annotate(
+        total_favoritos=Count('favoritos'),
+        vistas_semana=Subquery(vistas_semana)
     ).order_by('-estado', '-fecha_publicacion')  # Activas primero, luego por fecha
     
     # Paginación
@@ -550,28 +428,20 @@ def mis_propiedades(request):
     total_vistas = sum(p.vistas for p in propiedades_list)
     total_favoritos = sum(p.total_favoritos for p in propiedades_list)
     
-    # Obtener información de destacados disponibles
-    from suscripciones.models import Suscripcion
-    suscripcion = Suscripcion.objects.filter(
-        usuario=request.user,
-        estado='activa'
-    ).select_related('plan').first()
+    # Información de destacados disponibles
+    habilitaciones = request.user.habilitaciones
+    suscripcion = habilitaciones.suscripcion
     
     destacados_disponibles = 0
     puede_destacar = False
     
-    if suscripcion and suscripcion.esta_activa():
-        plan = suscripcion.plan
-        if plan.destacados_incluidos_mes > 0:
-            # Contar destacados activos actualmente (no por mes, sino los que están ON ahora)
-            destacados_activos_actuales = Destacado.objects.filter(
-                propiedad__propietario=request.user,
-                activo=True
-            ).count()
-            destacados_disponibles = plan.destacados_incluidos_mes - destacados_activos_actuales
+    if habilitaciones.tiene_suscripcion:
+        if habilitaciones.destacados_incluidos > 0:
+            # Destacados activos actualmente (no por mes, sino los que están ON ahora)
+            destacados_disponibles = habilitaciones.destacados_disponibles
             puede_destacar = True
         else:
-            puede_destacar = plan.puede_comprar_destacados
+            puede_destacar = habilitaciones.puede_comprar_destacados
     
     context = {
         'propiedades': propiedades,
@@ -590,8 +460,6 @@ def mis_propiedades(request):
 def toggle_destacado(request, pk):
     """Activar/desactivar destacado rápido desde mis propiedades"""
     from django.utils import timezone
-    from datetime import timedelta
-    from suscripciones.models import Suscripcion
     
     if not request.user.es_propietario():
         messages.error(request, 'Solo los propietarios pueden destacar propiedades')
@@ -614,23 +482,16 @@ def toggle_destacado(request, pk):
         messages.success(request, f'Prioridad desactivada para "{propiedad.titulo}". Podés reactivarla cuando quieras sin que cuente como uso adicional.')
     else:
         # Activar destacado - verificar disponibilidad
-        suscripcion = Suscripcion.objects.filter(
-            usuario=request.user,
-            estado='activa'
-        ).select_related('plan').first()
+        habilitaciones = request.user.habilitaciones
         
-        if not suscripcion or not suscripcion.esta_activa():
+        if not habilitaciones.tiene_suscripcion:
             messages.error(request, 'Necesitás una suscripción activa para destacar propiedades.')
             return redirect('suscripciones:planes')
         
-        plan = suscripcion.plan
+        suscripcion = habilitaciones.suscripcion
         
-        # Contar destacados activos actualmente (no por mes, sino los que están ON ahora)
-        destacados_activos_actuales = Destacado.objects.filter(
-            propiedad__propietario=request.user,
-            activo=True
-        ).count()
-        destacados_disponibles = plan.destacados_incluidos_mes - destacados_activos_actuales
+        # Destacados activos actualmente (no por mes, sino los que están ON ahora)
+        destacados_disponibles = habilitaciones.destacados_disponibles
         
         if destacados_disponibles <= 0:
             messages.error(request, 'No tenés destacados disponibles. Ya estás usando todos los destacados incluidos en tu plan. Desactivá alguno para poder activar otro.')
@@ -711,9 +572,63 @@ def mis_favoritos(request):
     """Listado de propiedades favoritas"""
     favoritos = Favorito.objects.filter(
         usuario=request.user
-    ).select_related('propiedad__propietario', 'propiedad__categoria').prefetch_related('propiedad__imagenes')
+    ).select_related('propiedad__propietario', 'propiedad__categoria', 'propiedad__imagen_portada')
+    favoritos = PaginadorCursor(favoritos, 12, ['fecha_agregado']).get_page(request.GET)
     
-    return render(request, 'propiedades/favoritos.html', {'favoritos': favoritos})
+    return render(request, 'propiedades/favoritos.html', {
+        'favoritos': favoritos,
+        'propiedades_favoritas': [favorito.propiedad for favorito in favoritos],
+    })
+
+
+@login_required
+def guardar_busqueda(request):
+    """Guardar los filtros actuales del listado para recibir avisos de nuevas coincidencias"""
+    consulta = request.POST.get('consulta', '')
+    if request.method != 'POST':
+        return redirect('propiedades:listado')
+    
+    parametros = parametros_busqueda(QueryDict(consulta))
+    if not parametros:
+        messages.error(request, 'Aplica al menos un filtro para guardar la búsqueda')
+    elif request.user.busquedas_guardadas.count() >= MAXIMO_BUSQUEDAS_USUARIO:
+        messages.error(request, f'Puedes guardar hasta {MAXIMO_BUSQUEDAS_USUARIO} búsquedas. Elimina alguna para guardar otra.')
+    else:
+        BusquedaGuardada.objects.create(
+            usuario=request.user,
+            nombre=request.POST.get('nombre', '').strip()[:100] or nombre_sugerido(parametros),
+            parametros=parametros,
+            avisar_email=bool(request.POST.get('avisar_email')),
+        )
+        messages.success(request, 'Búsqueda guardada. Te avisaremos cuando se publiquen propiedades que coincidan.')
+    return redirect(f"{reverse('propiedades:listado')}?{consulta}")
+
+
+@login_required
+def mis_busquedas(request):
+    """Listado de búsquedas guardadas"""
+    busquedas = request.user.busquedas_guardadas.annotate(total_coincidencias=Count('coincidencias'))
+    return render(request, 'propiedades/mis_busquedas.html', {'busquedas': busquedas})
+
+
+@login_required
+def eliminar_busqueda(request, pk):
+    """Eliminar una búsqueda guardada"""
+    busqueda = get_object_or_404(BusquedaGuardada, pk=pk, usuario=request.user)
+    if request.method == 'POST':
+        busqueda.delete()
+        messages.success(request, 'Búsqueda eliminada')
+    return redirect('propiedades:mis_busquedas')
+
+
+@login_required
+def aviso_email_busqueda(request, pk):
+    """Activar/desactivar el aviso por email de una búsqueda guardada"""
+    busqueda = get_object_or_404(BusquedaGuardada, pk=pk, usuario=request.user)
+    if request.method == 'POST':
+        busqueda.avisar_email = not busqueda.avisar_email
+        busqueda.save(update_fields=['avisar_email'])
+    return redirect('propiedades:mis_busquedas')
 
 
 @login_required
@@ -778,9 +693,7 @@ def valorar_propiedad(request, pk):
                     valoracion.claridad_informacion = None
                     valoracion.coincidencia_fotos = None
                     valoracion.ubicacion_correcta = None
-                valoracion.save()
-                # Actualizar puntuación del propietario
-                propiedad.propietario.perfil.actualizar_puntuacion()
+                valoracion.save()  # Los agregados de propiedad y propietario se actualizan por señal
                 messages.success(request, 'Valoración actualizada correctamente')
                 return redirect('propiedades:detalle', pk=pk)
         else:
@@ -800,9 +713,7 @@ def valorar_propiedad(request, pk):
                     valoracion.claridad_informacion = None
                     valoracion.coincidencia_fotos = None
                     valoracion.ubicacion_correcta = None
-                valoracion.save()
-                # Actualizar puntuación del propietario
-                propiedad.propietario.perfil.actualizar_puntuacion()
+                valoracion.save()  # Los agregados de propiedad y propietario se actualizan por señal
                 messages.success(request, '¡Valoración publicada! Gracias por tu opinión')
                 return redirect('propiedades:detalle', pk=pk)
         else:
@@ -867,14 +778,8 @@ def reportar_valoracion(request, pk):
         
         valoracion.save()
         
-        # Crear notificación para el sistema/admin (opcional)
-        from notificaciones.models import Notificacion
-        Notificacion.objects.create(
-            usuario=valoracion.propiedad.propietario,  # Notificar al propietario
-            tipo='sistema',
-            mensaje=f'Se ha reportado una valoración en tu propiedad "{valoracion.propiedad.titulo}"',
-            url=f'/propiedades/{valoracion.propiedad.pk}/'
-        )
+        # Notificar al propietario (en segundo plano)
+        notificar_reporte_valoracion.encolar(reporte.pk, clave=f'reporte-valoracion:{reporte.pk}')
         
         messages.success(request, 'Reporte enviado correctamente. Será revisado por nuestro equipo')
         return redirect('propiedades:detalle', pk=valoracion.propiedad.pk)
@@ -886,17 +791,14 @@ def reportar_valoracion(request, pk):
     return render(request, 'propiedades/reportar_valoracion.html', context)
 
 
+@cachear_para_anonimos
 def estudiantes(request):
     """Página dedicada para estudiantes"""
     propiedades_estudiantes = Propiedad.objects.filter(
         estado='activa',
         especial_estudiantes=True
-    ).select_related('propietario').prefetch_related('imagenes')[:12]
-    
-    # Debug: imprimir en consola
-    print(f"DEBUG: Propiedades encontradas: {propiedades_estudiantes.count()}")
-    for prop in propiedades_estudiantes:
-        print(f"  - {prop.id}: {prop.titulo}")
+    ).select_related('propietario', 'imagen_portada')
+    propiedades_estudiantes = PaginadorCursor(propiedades_estudiantes, 12).get_page(request.GET)
     
     context = {
         'propiedades_estudiantes': propiedades_estudiantes,
@@ -904,13 +806,15 @@ def estudiantes(request):
     return render(request, 'propiedades/estudiantes.html', context)
 
 
+@cachear_para_anonimos
 def inversiones(request):
     """Página dedicada para inversiones"""
     # Propiedades para venta
     propiedades_venta = Propiedad.objects.filter(
         estado='activa',
         operacion='venta'
-    ).select_related('propietario', 'categoria').prefetch_related('imagenes')[:12]
+    ).select_related('propietario', 'categoria', 'imagen_portada')
+    propiedades_venta = PaginadorCursor(propiedades_venta, 12).get_page(request.GET)
     
     context = {
         'propiedades_venta': propiedades_venta,
@@ -933,36 +837,26 @@ def destacar_propiedad(request, pk):
     """Vista para destacar una propiedad"""
     from django.utils import timezone
     from datetime import timedelta
-    from suscripciones.models import Suscripcion
     
     propiedad = get_object_or_404(Propiedad, pk=pk, propietario=request.user)
     
     # Verificar que el usuario tenga una suscripción activa
-    suscripcion = Suscripcion.objects.filter(
-        usuario=request.user,
-        estado='activa'
-    ).select_related('plan').first()
-    
-    if not suscripcion or not suscripcion.esta_activa():
+    habilitaciones = request.user.habilitaciones
+    if not habilitaciones.tiene_suscripcion:
         messages.error(request, 'Necesitas una suscripción activa para destacar propiedades')
         return redirect('suscripciones:planes')
     
-    plan = suscripcion.plan
+    suscripcion = habilitaciones.suscripcion
+    plan = habilitaciones.plan
     
     # Verificar si el plan permite destacar
     if plan.destacados_incluidos_mes == 0 and not plan.puede_comprar_destacados:
         messages.error(request, 'Tu plan actual no incluye destacados. Actualiza tu plan para acceder a esta funcionalidad')
         return redirect('suscripciones:planes')
     
-    # Contar destacados activos del mes actual
-    inicio_mes = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-    destacados_mes = Destacado.objects.filter(
-        propiedad__propietario=request.user,
-        fecha_compra__gte=inicio_mes,
-        activo=True
-    ).count()
-    
-    destacados_disponibles = plan.destacados_incluidos_mes - destacados_mes
+    # Destacados usados en el mes actual (los vencidos siguen contando)
+    destacados_mes = habilitaciones.destacados_mes
+    destacados_disponibles = habilitaciones.destacados_disponibles_mes
     puede_usar_incluido = destacados_disponibles > 0
     
     if request.method == 'POST':
@@ -1028,34 +922,21 @@ def destacar_propiedad(request, pk):
 @login_required
 def mis_destacados(request):
     """Vista para ver todos los destacados del usuario"""
-    from django.utils import timezone
-    
     destacados_activos = Destacado.objects.filter(
         propiedad__propietario=request.user,
-        activo=True,
-        fecha_fin__gt=timezone.now()
+        activo=True
     ).select_related('propiedad').order_by('-fecha_inicio')
     
     destacados_expirados = Destacado.objects.filter(
         propiedad__propietario=request.user
-    ).filter(
-        Q(activo=False) | Q(fecha_fin__lte=timezone.now())
-    ).select_related('propiedad').order_by('-fecha_inicio')[:10]
+    ).filter(activo=False).select_related('propiedad').order_by('-fecha_inicio')[:10]
     
     # Información de suscripción
-    from suscripciones.models import Suscripcion
-    suscripcion = Suscripcion.objects.filter(
-        usuario=request.user,
-        estado='activa'
-    ).select_related('plan').first()
+    habilitaciones = request.user.habilitaciones
+    suscripcion = habilitaciones.suscripcion
     
     if suscripcion:
-        inicio_mes = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        destacados_usados_mes = Destacado.objects.filter(
-            propiedad__propietario=request.user,
-            fecha_compra__gte=inicio_mes,
-            activo=True
-        ).count()
+        destacados_usados_mes = habilitaciones.destacados_mes
         destacados_disponibles = suscripcion.plan.destacados_incluidos_mes - destacados_usados_mes
     else:
         destacados_usados_mes = 0
@@ -1073,6 +954,7 @@ def mis_destacados(request):
 
 
 
+@lectura_en_replica
 def sugerencias_ubicacion(request):
     """Endpoint para autocompletado de ubicaciones basado en inmuebles activos"""
     query = request.GET.get('q', '').strip()
@@ -1080,75 +962,64 @@ def sugerencias_ubicacion(request):
     if len(query) < 1:
         return JsonResponse({'sugerencias': [], 'mensaje': None})
     
-    # Filtrar solo propiedades activas
-    propiedades_activas = Propiedad.objects.filter(estado='activa')
-    
-    sugerencias = []
-    ciudades_agregadas = set()
-    distritos_agregados = set()
-    
-    # Buscar ciudades con propiedades activas
-    ciudades = propiedades_activas.filter(
-        ciudad__icontains=query
-    ).values('ciudad').annotate(
-        count=Count('id')
-    ).order_by('-count')[:10]
-    
-    for ciudad in ciudades:
-        if ciudad['ciudad'] and ciudad['ciudad'].strip():
-            ciudad_lower = ciudad['ciudad'].lower()
-            if ciudad_lower not in ciudades_agregadas:
-                ciudades_agregadas.add(ciudad_lower)
-                sugerencias.append({
-                    'texto': ciudad['ciudad'],
-                    'texto_completo': ciudad['ciudad'],
-                    'tipo': 'ciudad',
-                    'count': ciudad['count'],
-                    'icono': 'fa-city'
-                })
-    
-    # Buscar distritos/barrios con propiedades activas
-    distritos = propiedades_activas.filter(
-        distrito__icontains=query
-    ).values('distrito', 'ciudad').annotate(
-        count=Count('id')
-    ).order_by('-count')[:10]
-    
-    for distrito in distritos:
-        if distrito['distrito'] and distrito['distrito'].strip():
-            distrito_lower = distrito['distrito'].lower()
-            if distrito_lower not in distritos_agregados:
-                distritos_agregados.add(distrito_lower)
-                texto = distrito['distrito']
-                texto_completo = texto
-                if distrito['ciudad'] and distrito['ciudad'].strip():
-                    texto_completo += f", {distrito['ciudad']}"
-                
-                sugerencias.append({
-                    'texto': texto,
-                    'texto_completo': texto_completo,
-                    'tipo': 'barrio',
-                    'count': distrito['count'],
-                    'icono': 'fa-map-marker-alt'
-                })
-    
-    # Ordenar por relevancia (count) y limitar a 10 resultados
-    sugerencias.sort(key=lambda x: x['count'], reverse=True)
-    sugerencias = sugerencias[:10]
+    # Índice de prefijos en memoria (ver ubicaciones.py): no consulta la base
+    sugerencias, top_ciudades = buscar_ubicaciones(query)
     
     # Mensaje si no hay resultados
     mensaje = None
     if not sugerencias:
         # Sugerir ubicaciones con más propiedades
-        top_ubicaciones = propiedades_activas.values('ciudad').annotate(
-            count=Count('id')
-        ).order_by('-count')[:3]
-        
-        ubicaciones_sugeridas = [loc['ciudad'] for loc in top_ubicaciones if loc['ciudad']]
-        
-        if ubicaciones_sugeridas:
-            mensaje = f"No encontramos resultados para '{query}'. Te sugerimos buscar en: {', '.join(ubicaciones_sugeridas)}"
+        if top_ciudades:
+            mensaje = f"No encontramos resultados para '{query}'. Te sugerimos buscar en: {', '.join(top_ciudades)}"
         else:
             mensaje = f"No encontramos resultados para '{query}'. Intenta con otra ubicación."
     
     return JsonResponse({'sugerencias': sugerencias, 'mensaje': mensaje})
+
+
+@lectura_en_replica
+def buscar_mapa(request):
+    """
+    Endpoint del mapa: propiedades activas a menos de `radio` km de (lat, lng),
+    las más cercanas primero, o dentro del área visible (sur, oeste, norte,
+    este). Acepta además los filtros del listado.
+    """
+    busqueda = parametros_geo(request.GET)
+    if busqueda is None:
+        return JsonResponse({'propiedades': [], 'error': 'Indica lat, lng y radio (km) o el área: sur, oeste, norte y este'}, status=400)
+    
+    propiedades = filtrar_propiedades(
+        Propiedad.objects.filter(estado='activa'), BusquedaForm(request.GET), request.GET
+    )
+    campos = ['pk', 'titulo', 'precio', 'latitud', 'longitud']
+    if busqueda[0] == 'radio':
+        propiedades = propiedades.order_by('distancia', 'pk')
+        campos.append('distancia')
+    
+    resultados = [
+        {
+            'id': propiedad['pk'],
+            'titulo': propiedad['titulo'],
+            'precio': float(propiedad['precio']),
+            'lat': float(propiedad['latitud']),
+            'lng': float(propiedad['longitud']),
+            'distancia_km': round(propiedad['distancia'], 2) if 'distancia' in propiedad else None,
+            'url': reverse('propiedades:detalle', args=[propiedad['pk']]),
+        }
+        for propiedad in propiedades.values(*campos)[:MAXIMO_RESULTADOS_MAPA]
+    ]
+    return JsonResponse({'propiedades': resultados})
+
+
+@lectura_en_replica
+def clusters_mapa(request):
+    """
+    Endpoint del mapa para zoom bajo: clusters precalculados (cantidad,
+    centroide y rango de precios) de las celdas que cubren el área visible
+    (sur, oeste, norte, este), según el zoom (0-20).
+    """
+    caja = parametros_caja(request.GET)
+    zoom = request.GET.get('zoom', '')
+    if caja is None or not zoom.isdigit():
+        return JsonResponse({'clusters': [], 'error': 'Indica el área (sur, oeste, norte, este) y el zoom'}, status=400)
+    return JsonResponse({'clusters': clusters(*caja, int(zoom))})
@@ -0,0 +1,138 @@
+"""
+Contador de vistas con escritura diferida (write-behind).
+
+detalle_propiedad no escribe en la base de datos en cada visita: las vistas
+se acumulan en un buffer del proceso y se vuelcan en lote, como máximo cada
+INTERVALO_VOLCADO segundos (o al llegar a MAXIMO_PENDIENTES), con UPDATEs
+atómicos vistas = vistas + n agrupados por incremento. Cada volcado también
+suma las vistas en VistaDiaria para que los propietarios vean la tendencia,
+y guarda en VistaUsuario la última vista de cada usuario con sesión (una de
+las señales de las recomendaciones).
+
+El buffer vive en la memoria de cada proceso web, así que un comando externo
+no puede vaciarlo: cada proceso arranca, con su primera vista, un hilo que
+vuelca cada INTERVALO_VOLCADO segundos aunque no lleguen más visitas, y al
+salir se vuelca lo pendiente (atexit). Si el proceso muere sin salir
+ordenadamente (SIGKILL, OOM) se pierden como máximo las vistas de los
+últimos INTERVALO_VOLCADO segundos, y nunca más de MAXIMO_PENDIENTES.
+"""
+import atexit
+import threading
+import time
+from collections import Counter, defaultdict
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from Proyecto_BuscoTecho.replicas import escritura_ajena
+
+from .models import Propiedad, VistaDiaria, VistaUsuario
+
+INTERVALO_VOLCADO = 30  # segundos
+MAXIMO_PENDIENTES = 500  # vistas acumuladas antes de forzar un volcado
+
+_pendientes = Counter()  # (propiedad_id, fecha) -> vistas
+_vistas_usuarios = {}  # (usuario_id, propiedad_id) -> última vista
+_lock = threading.Lock()
+_ultimo_volcado = time.monotonic()
+_hilo = None
+
+
+def _volcar_periodicamente():
+    while True:
+        time.sleep(INTERVALO_VOLCADO)
+        if time.monotonic() - _ultimo_volcado >= INTERVALO_VOLCADO:
+            # El hilo no pasa por request_finished: renovar la conexión si quedó inservible
+            close_old_connections()
+            volcar_vistas()
+
+
+def _iniciar_hilo():
+    """Hilo de volcado del proceso (se inicia con la primera vista, también tras un fork)"""
+    global _hilo
+    if _hilo is None or not _hilo.is_alive():
+        _hilo = threading.Thread(target=_volcar_periodicamente, name='volcar-vistas', daemon=True)
+        _hilo.start()
+
+
+def registrar_vista(propiedad_id, usuario_id=None):
+    """Suma una vista al buffer y vuelca si corresponde"""
+    with _lock:
+        _iniciar_hilo()
+        _pendientes[(propiedad_id, timezone.localdate())] += 1
+        if usuario_id is not None:
+            _vistas_usuarios[(usuario_id, propiedad_id)] = timezone.now()
+        volcar = (
+            time.monotonic() - _ultimo_volcado >= INTERVALO_VOLCADO
+            or sum(_pendientes.values()) >= MAXIMO_PENDIENTES
+        )
+    if volcar:
+        volcar_vistas()
+
+
+def volcar_vistas():
+    """
+    Escribe en la base de datos las vistas acumuladas.
+
+    Returns:
+        int: Cantidad de vistas volcadas
+    """
+    global _ultimo_volcado
+    with _lock:
+        lote = dict(_pendientes)
+        vistas_usuarios = dict(_vistas_usuarios)
+        _pendientes.clear()
+        _vistas_usuarios.clear()
+        _ultimo_volcado = time.monotonic()
+
+    if not lote and not vistas_usuarios:
+        return 0
+
+    try:
+        with escritura_ajena():
+            _escribir(lote, vistas_usuarios)
+    except DatabaseError:
+        # Se reintenta en el próximo volcado; contar vistas no debe romper la página
+        with _lock:
+            _pendientes.update(lote)
+            for clave, fecha in vistas_usuarios.items():
+                _vistas_usuarios[clave] = max(fecha, _vistas_usuarios.get(clave, fecha))
+        return 0
+    return sum(lote.values())
+
+
+def _escribir(lote, vistas_usuarios):
+    ids = {propiedad_id for propiedad_id, _ in lote} | {propiedad_id for _, propiedad_id in vistas_usuarios}
+    existentes = set(Propiedad.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+    por_propiedad = Counter()
+    por_incremento_dia = defaultdict(list)
+    for (propiedad_id, fecha), vistas in lote.items():
+        if propiedad_id in existentes:
+            por_propiedad[propiedad_id] += vistas
+            por_incremento_dia[(vistas, fecha)].append(propiedad_id)
+
+    por_incremento = defaultdict(list)
+    for propiedad_id, vistas in por_propiedad.items():
+        por_incremento[vistas].append(propiedad_id)
+
+    with transaction.atomic():
+        # Crear los buckets del día que falten; luego sumar con F() para no perder vistas
+        VistaDiaria.objects.bulk_create([
+            VistaDiaria(propiedad_id=propiedad_id, fecha=fecha, vistas=0)
+            for (propiedad_id, fecha) in lote if propiedad_id in existentes
+        ], ignore_conflicts=True)
+
+        for vistas, propiedades_ids in por_incremento.items():
+            Propiedad.objects.filter(pk__in=propiedades_ids).update(vistas=F('vistas') + vistas)
+
+        for (vistas, fecha), propiedades_ids in por_incremento_dia.items():
+            VistaDiaria.objects.filter(propiedad_id__in=propiedades_ids, fecha=fecha).update(vistas=F('vistas') + vistas)
+
+        VistaUsuario.objects.bulk_create([
+            VistaUsuario(usuario_id=usuario_id, propiedad_id=propiedad_id, fecha=fecha)
+            for (usuario_id, propiedad_id), fecha in vistas_usuarios.items() if propiedad_id in existentes
+        ], update_conflicts=True, unique_fields=['usuario', 'propiedad'], update_fields=['fecha'])
+
+
+# No perder el buffer al detener el proceso
+atexit.register(volcar_vistas)
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('suscripciones', '0003_plansuscripcion_destacados_incluidos_mes_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='suscripcion',
+            index=models.Index(fields=['usuario', 'estado'], name='suscripcion_usuario_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='suscripcion',
+            index=models.Index(fields=['estado', 'fecha_vencimiento'], name='suscripcion_vencimiento_idx'),
+        ),
+    ]
@@ -46,6 +46,10 @@ class Suscripcion(models.Model):
         verbose_name = 'Suscripción'
         verbose_name_plural = 'Suscripciones'
         ordering = ['-fecha_inicio']
+        indexes = [
+            models.Index(fields=['usuario', 'estado'], name='suscripcion_usuario_estado_idx'),
+            models.Index(fields=['estado', 'fecha_vencimiento'], name='suscripcion_vencimiento_idx'),
+        ]
         
     def __str__(self):
         return f'{self.usuario.username} - {self.plan.nombre}'
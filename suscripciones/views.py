@@ -10,10 +10,7 @@ def planes(request):
     # Obtener suscripción activa del usuario si está autenticado
     suscripcion_activa = None
     if request.user.is_authenticated:
-        suscripcion_activa = Suscripcion.objects.filter(
-            usuario=request.user,
-            estado='activa'
-        ).first()
+        suscripcion_activa = request.user.habilitaciones.suscripcion
     
     context = {
         'planes': planes,
@@ -50,9 +47,9 @@ def suscribirse(request, plan_id):
         suscripcion_existente.fecha_cancelacion = timezone.now()
         suscripcion_existente.save()
         
-        # Suspender propiedades excedentes
-        from propiedades.utils import gestionar_propiedades_por_suscripcion
-        resultado = gestionar_propiedades_por_suscripcion(request.user)
+        # Suspender propiedades excedentes (en segundo plano)
+        from propiedades.tareas import gestionar_propiedades
+        gestionar_propiedades.encolar(request.user.pk, clave=f'gestionar-propiedades:{suscripcion_existente.pk}:cancelada')
         
         messages.info(request, 'Has cambiado al plan Gratis. Solo tu primera publicación permanecerá activa.')
         return redirect('propiedades:mis_propiedades')
@@ -80,9 +77,9 @@ def suscribirse(request, plan_id):
                 estado='completado'
             )
             
-            # Gestionar propiedades según nuevo plan
-            from propiedades.utils import gestionar_propiedades_por_suscripcion
-            resultado = gestionar_propiedades_por_suscripcion(request.user)
+            # Gestionar propiedades según nuevo plan (en segundo plano)
+            from propiedades.tareas import gestionar_propiedades
+            gestionar_propiedades.encolar(request.user.pk, clave=f'gestionar-propiedades:{nueva_suscripcion.pk}:activa')
             
             messages.success(request, f'¡Plan cambiado a {plan.nombre}! Ahora puedes tener hasta {1 + plan.max_publicaciones} propiedades activas.')
             return redirect('propiedades:mis_propiedades')
@@ -113,15 +110,14 @@ def suscribirse(request, plan_id):
             estado='completado'  # En producción, esto dependerá del procesador de pagos
         )
         
-        # Reactivar propiedades suspendidas automáticamente usando utilidad
-        from propiedades.utils import gestionar_propiedades_por_suscripcion
-        
-        resultado = gestionar_propiedades_por_suscripcion(request.user)
+        # Reactivar propiedades suspendidas automáticamente (en segundo plano)
+        from propiedades.tareas import gestionar_propiedades
+        gestionar_propiedades.encolar(request.user.pk, clave=f'gestionar-propiedades:{suscripcion.pk}:activa')
         
-        if resultado['cambios']:
-            messages.success(request, f'¡Suscripción activada! Se reactivaron automáticamente {len(resultado["cambios"])} propiedad(es).')
+        if request.user.publicaciones.filter(estado='suspendida').exists():
+            messages.success(request, '¡Suscripción activada! Tus propiedades suspendidas se reactivarán automáticamente en unos instantes.')
         else:
-            limite_total = resultado['limite_total']
+            limite_total = 1 + plan.max_publicaciones
             messages.success(request, f'¡Suscripción activada! Ahora puedes publicar hasta {limite_total} propiedades en total (1 gratis + {plan.max_publicaciones} del plan)')
         
         return redirect('propiedades:mis_propiedades')
@@ -144,7 +140,7 @@ def mi_suscripcion(request):
         return redirect('suscripciones:planes')
     
     # Calcular publicaciones usadas
-    publicaciones_activas = request.user.publicaciones.filter(estado='activa').count()
+    publicaciones_activas = request.user.habilitaciones.activas
     
     context = {
         'suscripcion': suscripcion,
@@ -172,13 +168,12 @@ def cancelar_suscripcion(request):
         suscripcion.fecha_cancelacion = timezone.now()
         suscripcion.save()
         
-        # Suspender propiedades excedentes automáticamente
-        from propiedades.utils import gestionar_propiedades_por_suscripcion
-        
-        resultado = gestionar_propiedades_por_suscripcion(request.user)
+        # Suspender propiedades excedentes automáticamente (en segundo plano)
+        from propiedades.tareas import gestionar_propiedades
+        gestionar_propiedades.encolar(request.user.pk, clave=f'gestionar-propiedades:{suscripcion.pk}:cancelada')
         
-        if resultado['cambios']:
-            messages.warning(request, f'Suscripción cancelada. Se suspendieron {len(resultado["cambios"])} propiedad(es) que excedían el límite gratuito. Tu primera publicación permanece activa.')
+        if request.user.publicaciones.filter(estado='activa').count() > 1:
+            messages.warning(request, 'Suscripción cancelada. Las propiedades que excedan el límite gratuito se suspenderán en unos instantes. Tu primera publicación permanece activa.')
         else:
             messages.info(request, 'Suscripción cancelada correctamente. Tu primera publicación permanece activa.')
         
@@ -0,0 +1,17 @@
+from django.contrib import admin
+from .models import Tarea
+
+@admin.register(Tarea)
+class TareaAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'estado', 'intentos', 'ejecutar_desde', 'fecha_creacion', 'fecha_fin']
+    list_filter = ['estado', 'nombre']
+    search_fields = ['nombre', 'clave', 'error']
+    readonly_fields = ['fecha_creacion', 'fecha_fin', 'bloqueada_hasta']
+    actions = ['reintentar']
+    
+    @admin.action(description='Reintentar tareas seleccionadas')
+    def reintentar(self, request, queryset):
+        from django.utils import timezone
+        queryset.exclude(estado='en_proceso').update(
+            estado='pendiente', intentos=0, ejecutar_desde=timezone.now(), error=''
+        )
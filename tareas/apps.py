@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+
+
+class TareasConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'tareas'
+
+    def ready(self):
+        # Registrar las tareas definidas en el módulo tareas.py de cada app
+        autodiscover_modules('tareas')
+        from . import checks  # noqa: F401
@@ -0,0 +1,41 @@
+"""
+Verificación de la cache: las tareas y los comandos programados invalidan
+claves que lee el servidor web, así que fuera de desarrollo la cache tiene
+que ser compartida entre procesos (ver CACHES en settings).
+"""
+from django.conf import settings
+from django.core import checks
+
+BACKENDS_POR_PROCESO = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+MENSAJE_CACHE = (
+    'La cache por defecto es local a cada proceso: las invalidaciones de '
+    'procesar_tareas y de los comandos programados no llegan al servidor web.'
+)
+AYUDA_CACHE = 'Definir BUSCOTECHO_CACHE con una URL redis://... o memcached://... (ver settings.py).'
+
+
+def cache_por_proceso():
+    return settings.CACHES['default']['BACKEND'] in BACKENDS_POR_PROCESO
+
+
+@checks.register(checks.Tags.caches, deploy=True)
+def verificar_cache_compartida(app_configs, **kwargs):
+    if cache_por_proceso():
+        return [checks.Error(MENSAJE_CACHE, hint=AYUDA_CACHE, id='tareas.E001')]
+    return []
+
+
+def exigir_cache_compartida(comando):
+    """
+    Para los comandos que corren en su propio proceso: error fuera de
+    desarrollo, advertencia con DEBUG.
+    """
+    from django.core.management.base import CommandError
+    if not cache_por_proceso():
+        return
+    if not settings.DEBUG:
+        raise CommandError(f'{MENSAJE_CACHE} {AYUDA_CACHE}')
+    comando.stderr.write(comando.style.WARNING(f'{MENSAJE_CACHE} (aceptable solo en desarrollo)'))
@@ -0,0 +1,164 @@
+"""
+Cola de tareas en segundo plano respaldada por la base de datos.
+
+Las vistas encolan con encolar() dentro de su propia transacción: la fila
+de Tarea se confirma junto con la escritura principal y la respuesta no
+espera al trabajo lento. El comando procesar_tareas toma las pendientes,
+las ejecuta en un pool de hilos y reintenta con espera exponencial las que
+fallan. Varios procesos trabajadores pueden correr a la vez: cada tarea se
+reclama con un UPDATE condicional, por lo que solo uno la ejecuta.
+
+Con SQLite conviene un solo hilo: la base admite un único escritor y las
+tareas concurrentes fallan con "database is locked" hasta el reintento.
+Las tareas terminadas se borran pasados PURGAR_DIAS (procesar_tareas
+--purgar-dias), lo que también libera sus claves.
+"""
+import traceback
+from datetime import timedelta
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Tarea
+
+BLOQUEO_MAXIMO = timedelta(minutes=10)  # tiempo máximo de ejecución antes de liberar la tarea
+ESPERA_BASE = 30  # segundos; el reintento n espera ESPERA_BASE * 2^(n-1)
+PURGAR_DIAS = 30  # antigüedad de las tareas terminadas que se borran
+
+_registro = {}
+_agrupar_pendientes = set()  # tareas cuya clave solo agrupa las que aún no empezaron
+
+
+def tarea(funcion=None, *, max_intentos=5, agrupar_pendientes=False):
+    """
+    Registra una función como tarea. Se le agrega funcion.encolar(*args, clave=None, **kwargs).
+
+    Los argumentos deben ser serializables a JSON (ids, no instancias).
+
+    Por defecto una clave se completa una sola vez (si la tarea agotó sus
+    intentos, encolarla de nuevo la reinicia). Con agrupar_pendientes la
+    clave une los encolados que todavía esperan (varios cambios seguidos, una
+    ejecución) y se libera al reclamar la tarea, así que un encolado posterior
+    crea otra ejecución que verá los cambios nuevos.
+    """
+    def registrar(funcion):
+        nombre = f'{funcion.__module__}.{funcion.__name__}'
+        _registro[nombre] = funcion
+        if agrupar_pendientes:
+            _agrupar_pendientes.add(nombre)
+
+        def encolar_funcion(*args, clave=None, **kwargs):
+            return encolar(nombre, *args, clave=clave, max_intentos=max_intentos, **kwargs)
+
+        funcion.encolar = encolar_funcion
+        return funcion
+
+    if funcion is not None:
+        return registrar(funcion)
+    return registrar
+
+
+def encolar(nombre, *args, clave=None, max_intentos=5, **kwargs):
+    """
+    Crea la tarea (o retorna la existente si ya se encoló con la misma clave).
+
+    Returns:
+        Tarea
+    """
+    datos = {
+        'nombre': nombre,
+        'argumentos': {'args': list(args), 'kwargs': kwargs},
+        'max_intentos': max_intentos,
+    }
+    if clave is None:
+        return Tarea.objects.create(**datos)
+    try:
+        with transaction.atomic():
+            return Tarea.objects.create(clave=clave, **datos)
+    except IntegrityError:
+        # Una clave completada no se repite; una que agotó sus intentos se vuelve a encolar
+        Tarea.objects.filter(clave=clave, estado='fallida').update(
+            estado='pendiente', intentos=0, error='', ejecutar_desde=timezone.now(),
+            bloqueada_hasta=None, fecha_fin=None, **datos,
+        )
+        existente = Tarea.objects.filter(clave=clave).first()
+        if existente is not None:
+            return existente
+    # Un trabajador la reclamó y liberó la clave entretanto (agrupar_pendientes)
+    return Tarea.objects.create(clave=clave, **datos)
+
+
+def purgar_terminadas(dias):
+    """
+    Borra las tareas completadas o fallidas hace más de `dias` días (sus
+    claves quedan libres). Retorna la cantidad.
+    """
+    limite = timezone.now() - timedelta(days=dias)
+    borradas, _ = Tarea.objects.filter(estado__in=['completada', 'fallida'], fecha_fin__lt=limite).delete()
+    return borradas
+
+
+def liberar_vencidas():
+    """Devuelve a la cola las tareas de trabajadores que murieron a mitad de ejecución"""
+    return Tarea.objects.filter(
+        estado='en_proceso', bloqueada_hasta__lt=timezone.now()
+    ).update(estado='pendiente', bloqueada_hasta=None)
+
+
+def reclamar(limite):
+    """
+    Reclama hasta `limite` tareas listas para ejecutarse.
+
+    Returns:
+        list: Tareas reclamadas por este trabajador
+    """
+    ahora = timezone.now()
+    candidatas = list(
+        Tarea.objects.filter(estado='pendiente', ejecutar_desde__lte=ahora)
+        .order_by('ejecutar_desde', 'pk')
+        .values_list('pk', flat=True)[:limite]
+    )
+    reclamadas = []
+    for tarea_id in candidatas:
+        # Solo un trabajador gana el UPDATE condicional
+        tomada = Tarea.objects.filter(pk=tarea_id, estado='pendiente').update(
+            estado='en_proceso',
+            bloqueada_hasta=ahora + BLOQUEO_MAXIMO,
+        )
+        if tomada:
+            reclamadas.append(tarea_id)
+    if reclamadas and _agrupar_pendientes:
+        Tarea.objects.filter(pk__in=reclamadas, nombre__in=_agrupar_pendientes).update(clave=None)
+    return list(Tarea.objects.filter(pk__in=reclamadas).order_by('ejecutar_desde', 'pk'))
+
+
+def ejecutar(tarea):
+    """
+    Ejecuta una tarea reclamada y registra el resultado.
+
+    Returns:
+        bool: True si se completó
+    """
+    funcion = _registro.get(tarea.nombre)
+    tarea.intentos += 1
+    try:
+        if funcion is None:
+            raise LookupError(f'Tarea no registrada: {tarea.nombre}')
+        funcion(*tarea.argumentos.get('args', []), **tarea.argumentos.get('kwargs', {}))
+    except Exception:
+        tarea.error = traceback.format_exc()
+        if tarea.intentos >= tarea.max_intentos or funcion is None:
+            tarea.estado = 'fallida'
+            tarea.fecha_fin = timezone.now()
+        else:
+            tarea.estado = 'pendiente'
+            tarea.ejecutar_desde = timezone.now() + timedelta(seconds=ESPERA_BASE * 2 ** (tarea.intentos - 1))
+        tarea.bloqueada_hasta = None
+        tarea.save(update_fields=['estado', 'intentos', 'error', 'ejecutar_desde', 'bloqueada_hasta', 'fecha_fin'])
+        return False
+
+    tarea.estado = 'completada'
+    tarea.error = ''
+    tarea.bloqueada_hasta = None
+    tarea.fecha_fin = timezone.now()
+    tarea.save(update_fields=['estado', 'intentos', 'error', 'bloqueada_hasta', 'fecha_fin'])
+    return True
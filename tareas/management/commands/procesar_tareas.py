@@ -0,0 +1,67 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from tareas.checks import exigir_cache_compartida
+from tareas.cola import PURGAR_DIAS, ejecutar, liberar_vencidas, purgar_terminadas, reclamar
+
+INTERVALO_PURGA = 3600  # segundos entre purgas de tareas terminadas
+
+
+def _ejecutar_en_hilo(tarea):
+    try:
+        return ejecutar(tarea)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Trabajador de la cola de tareas: ejecuta las tareas pendientes en un pool de hilos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hilos', type=int, default=None,
+            help='Tareas ejecutadas en paralelo (por defecto 4, o 1 con SQLite, que admite un solo escritor)',
+        )
+        parser.add_argument(
+            '--purgar-dias', type=int, default=PURGAR_DIAS,
+            help='Borra las tareas terminadas hace más de estos días (0 = no borrar)',
+        )
+        parser.add_argument('--intervalo', type=float, default=2, help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--una-vez', action='store_true', help='Procesa lo pendiente y termina (para cron)')
+
+    def handle(self, *args, **options):
+        exigir_cache_compartida(self)
+        hilos = options['hilos']
+        if hilos is None:
+            hilos = 1 if connection.vendor == 'sqlite' else 4
+        hilos = max(1, hilos)
+        completadas, fallidas = 0, 0
+        proxima_purga = 0
+
+        with ThreadPoolExecutor(max_workers=hilos, thread_name_prefix='tareas') as pool:
+            while True:
+                close_old_connections()
+                liberar_vencidas()
+                if options['purgar_dias'] and time.monotonic() >= proxima_purga:
+                    borradas = purgar_terminadas(options['purgar_dias'])
+                    proxima_purga = time.monotonic() + INTERVALO_PURGA
+                    if borradas and options['verbosity'] >= 2:
+                        self.stdout.write(f'{borradas} tarea(s) terminadas borradas')
+                tareas = reclamar(limite=hilos * 2)
+
+                if not tareas:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                for resultado in pool.map(_ejecutar_en_hilo, tareas):
+                    if resultado:
+                        completadas += 1
+                    else:
+                        fallidas += 1
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f'{len(tareas)} tarea(s) procesadas')
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Tareas completadas: {completadas}, con error: {fallidas}'))
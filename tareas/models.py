@@ -0,0 +1,35 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Tarea(models.Model):
+    """Trabajo en segundo plano encolado por las vistas (ver cola.py)"""
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En proceso'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
+    
+    nombre = models.CharField(max_length=150, help_text='Nombre registrado de la función')
+    argumentos = models.JSONField(default=dict, help_text='{"args": [...], "kwargs": {...}}')
+    clave = models.CharField(max_length=200, unique=True, null=True, blank=True, help_text='Clave de idempotencia: una misma clave se ejecuta una sola vez')
+    estado = models.CharField(max_length=15, choices=ESTADO_CHOICES, default='pendiente')
+    intentos = models.IntegerField(default=0)
+    max_intentos = models.IntegerField(default=5)
+    ejecutar_desde = models.DateTimeField(default=timezone.now, help_text='No se ejecuta antes de esta fecha (reintentos con espera)')
+    bloqueada_hasta = models.DateTimeField(null=True, blank=True, help_text='Si el trabajador muere, la tarea vuelve a la cola pasada esta fecha')
+    error = models.TextField(blank=True)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Tarea'
+        verbose_name_plural = 'Tareas'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'ejecutar_desde'], name='tarea_estado_ejecutar_idx'),
+        ]
+        
+    def __str__(self):
+        return f'{self.nombre} ({self.get_estado_display()})'
@@ -0,0 +1,76 @@
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+
+from .cola import ESPERA_BASE, ejecutar, purgar_terminadas, reclamar, tarea
+from .models import Tarea
+
+
+@tarea(max_intentos=2)
+def fallar(motivo):
+    raise RuntimeError(motivo)
+
+
+@tarea
+def completar():
+    pass
+
+
+class ColaTests(TestCase):
+    """Claves de idempotencia, reintentos con espera y purga (ver cola.py)"""
+
+    def test_misma_clave_una_sola_tarea(self):
+        primera = completar.encolar(clave='completar:1')
+        segunda = completar.encolar(clave='completar:1')
+        self.assertEqual(primera.pk, segunda.pk)
+        self.assertEqual(Tarea.objects.filter(clave='completar:1').count(), 1)
+
+    def test_clave_completada_no_se_repite(self):
+        completar.encolar(clave='completar:1')
+        ejecutar(reclamar(1)[0])
+        tarea_existente = completar.encolar(clave='completar:1')
+        self.assertEqual(tarea_existente.estado, 'completada')
+        self.assertEqual(Tarea.objects.count(), 1)
+
+    def test_reintento_con_espera_exponencial(self):
+        fallar.encolar('primero', clave='fallar:1')
+        antes = timezone.now()
+        self.assertFalse(ejecutar(reclamar(1)[0]))
+
+        pendiente = Tarea.objects.get(clave='fallar:1')
+        self.assertEqual(pendiente.estado, 'pendiente')
+        self.assertEqual(pendiente.intentos, 1)
+        self.assertIn('RuntimeError: primero', pendiente.error)
+        self.assertGreaterEqual(pendiente.ejecutar_desde, antes + timedelta(seconds=ESPERA_BASE))
+        # Todavía en espera: no se reclama
+        self.assertEqual(reclamar(1), [])
+
+        Tarea.objects.filter(pk=pendiente.pk).update(ejecutar_desde=timezone.now())
+        self.assertFalse(ejecutar(reclamar(1)[0]))
+        fallida = Tarea.objects.get(pk=pendiente.pk)
+        self.assertEqual(fallida.estado, 'fallida')
+        self.assertEqual(fallida.intentos, 2)
+        self.assertIsNotNone(fallida.fecha_fin)
+
+    def test_clave_fallida_se_vuelve_a_encolar(self):
+        Tarea.objects.create(
+            nombre='tareas.tests.fallar', argumentos={'args': ['viejo'], 'kwargs': {}},
+            clave='fallar:1', estado='fallida', intentos=2, max_intentos=2,
+            error='RuntimeError', fecha_fin=timezone.now(),
+        )
+        reencolada = fallar.encolar('nuevo', clave='fallar:1')
+        self.assertEqual(reencolada.estado, 'pendiente')
+        self.assertEqual(reencolada.intentos, 0)
+        self.assertEqual(reencolada.error, '')
+        self.assertEqual(reencolada.argumentos['args'], ['nuevo'])
+        self.assertEqual(Tarea.objects.count(), 1)
+
+    def test_purgar_libera_la_clave(self):
+        completar.encolar(clave='completar:1')
+        ejecutar(reclamar(1)[0])
+        Tarea.objects.update(fecha_fin=timezone.now() - timedelta(days=31))
+        completar.encolar(clave='completar:2')
+
+        self.assertEqual(purgar_terminadas(30), 1)
+        self.assertEqual(list(Tarea.objects.values_list('clave', flat=True)), ['completar:2'])
+        self.assertEqual(completar.encolar(clave='completar:1').estado, 'pendiente')
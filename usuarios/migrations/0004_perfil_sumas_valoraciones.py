@@ -0,0 +1,28 @@
+# Generated by Django 4.2.27 on 2026-10-18 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0003_usuario_email_validado_usuario_telefono_validado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='perfil',
+            name='suma_confiabilidad',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='perfil',
+            name='suma_tiempo_respuesta',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='perfil',
+            name='suma_trato',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+    ]
@@ -1,5 +1,7 @@
+from decimal import Decimal
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils.functional import cached_property
 
 class Usuario(AbstractUser):
     """Modelo de usuario personalizado"""
@@ -49,9 +51,16 @@ class Usuario(AbstractUser):
                     fecha_inicio=timezone.now()
                 )
     
+    @cached_property
+    def habilitaciones(self):
+        """Suscripción, límites y cupos de propietario (cacheados; una vez por request)"""
+        from propiedades.habilitaciones import obtener_habilitaciones
+        return obtener_habilitaciones(self.pk)
+    
     def notificaciones_no_leidas(self):
-        """Retorna el número de notificaciones no leídas"""
-        return self.notificaciones.filter(leida=False).count()
+        """Retorna el número de notificaciones no leídas (cacheado)"""
+        from notificaciones.models import Notificacion
+        return Notificacion.contar_no_leidas(self.pk)
     
     def tiene_validaciones_completas(self):
         """Verifica si el usuario tiene teléfono y email validados"""
@@ -84,6 +93,10 @@ class Perfil(models.Model):
     verificado = models.BooleanField(default=False)
     puntuacion_promedio = models.DecimalField(max_digits=3, decimal_places=2, default=0)
     total_valoraciones = models.IntegerField(default=0)
+    # Sumas por dimensión de las valoraciones recibidas (ver propiedades/puntuaciones.py)
+    suma_tiempo_respuesta = models.IntegerField(default=0, editable=False)
+    suma_trato = models.IntegerField(default=0, editable=False)
+    suma_confiabilidad = models.IntegerField(default=0, editable=False)
     
     # Nuevos campos para perfil progresivo
     tipo_usuario = models.CharField(max_length=20, choices=TIPO_USUARIO_CHOICES, blank=True, null=True)
@@ -126,18 +139,25 @@ class Perfil(models.Model):
         self.save()
     
     def actualizar_puntuacion(self):
-        """Actualiza la puntuación promedio del propietario basado en todas sus valoraciones"""
+        """Recalcula los agregados de valoraciones del propietario con una sola consulta"""
+        from django.db.models import Count, Sum
         from propiedades.models import Valoracion
-        # Obtener todas las valoraciones de las propiedades del usuario
-        valoraciones = Valoracion.objects.filter(propiedad__propietario=self.usuario)
-        
-        if valoraciones.exists():
-            # Calcular promedio de valoraciones del propietario
-            total = sum(v.promedio_propietario() for v in valoraciones)
-            self.puntuacion_promedio = total / valoraciones.count()
-            self.total_valoraciones = valoraciones.count()
-        else:
-            self.puntuacion_promedio = 0
-            self.total_valoraciones = 0
-        
+        totales = Valoracion.objects.filter(propiedad__propietario=self.usuario).aggregate(
+            total=Count('pk'),
+            tiempo_respuesta=Sum('tiempo_respuesta'),
+            trato=Sum('trato'),
+            confiabilidad=Sum('confiabilidad'),
+        )
+        self.total_valoraciones = totales['total']
+        self.suma_tiempo_respuesta = totales['tiempo_respuesta'] or 0
+        self.suma_trato = totales['trato'] or 0
+        self.suma_confiabilidad = totales['confiabilidad'] or 0
+        self.puntuacion_promedio = self.calcular_promedio()
         self.save()
+    
+    def calcular_promedio(self):
+        """Promedio de promedio_propietario() a partir de las sumas guardadas"""
+        if not self.total_valoraciones:
+            return Decimal('0')
+        suma = self.suma_tiempo_respuesta + self.suma_trato + self.suma_confiabilidad
+        return (Decimal(suma) / (3 * self.total_valoraciones)).quantize(Decimal('0.01'))
@@ -9,6 +9,7 @@ from .models import Usuario, Perfil
 from .forms import (RegistroForm, LoginForm, PerfilForm, CompletarPerfilForm,
                     ValidarTelefonoForm, ValidarEmailForm, CambiarTelefonoForm, CambiarEmailForm)
 from notificaciones.models import Notificacion
+from Proyecto_BuscoTecho.replicas import lectura_en_replica
 
 def registro(request):
     """Vista para registro de nuevos usuarios"""
@@ -62,17 +63,20 @@ def logout_view(request):
 
 
 @login_required
+@lectura_en_replica
 def perfil_view(request, username):
     """Vista de perfil de usuario"""
     usuario = get_object_or_404(Usuario, username=username)
     
-    # Crear perfil si no existe
-    perfil, created = Perfil.objects.get_or_create(usuario=usuario)
+    # Crear perfil si no existe (get_or_create escribe en la primaria: solo si hace falta)
+    perfil = Perfil.objects.filter(usuario=usuario).first()
+    if perfil is None:
+        perfil, created = Perfil.objects.get_or_create(usuario=usuario)
     
     # Obtener publicaciones si es propietario
     publicaciones = None
     if usuario.es_propietario():
-        publicaciones = usuario.publicaciones.select_related('categoria').prefetch_related('imagenes').all()
+        publicaciones = usuario.publicaciones.select_related('categoria', 'imagen_portada').all()
     
     context = {
         'usuario': usuario,